@@ -2,8 +2,9 @@ import re
 from utils.range_optimizer import smart_range_display
 
 def _get_summary_data(controller):
-    formulas_to_summarize = [controller.view.result_tree.item(item, "values") for item in controller.view.result_tree.get_children()]
-    is_filtered = len(formulas_to_summarize) != len(controller.all_formulas) if controller.all_formulas else True
+    from core.worksheet_tree import get_filtered_formulas
+    formulas_to_summarize = get_filtered_formulas(controller, expand_regions=True)
+    is_filtered = len(controller.filtered_formulas) != len(controller.all_formulas) if controller.all_formulas else True
     return formulas_to_summarize, is_filtered
 
 def get_unique_external_links(formulas_to_summarize, tree_columns):
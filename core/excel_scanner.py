@@ -1,77 +1,219 @@
 import os
 import time
-import win32com.client
-from tkinter import messagebox
+from tkinter import messagebox, filedialog
 import psutil
-import win32gui
-import win32process
-import win32con
-from core.formula_classifier import classify_formula_type
-from core.worksheet_tree import apply_filter
+try:
+    import win32com.client
+    import win32gui
+    import win32process
+    import win32con
+except ImportError:  # 非 Windows 環境：仍可用假 COM 物件測試掃描邏輯
+    win32com = None
+    win32gui = None
+    win32process = None
+    win32con = None
+from core.formula_classifier import classify_formulas
+from core.formula_regions import cluster_formula_regions
+from utils.scan_block_cache import get_scan_block_cache, SheetScanState, DEFAULT_BLOCK_ROWS, block_hash
 import traceback
 
-def _get_formulas_from_excel(worksheet_com_obj, scan_range_com_obj, scan_mode, progress_update_callback):
-    all_formulas_local = []
-    formula_cells_found = 0
-    
+# 完整掃描時每批讀取 Text 的儲存格數（Text 沒有陣列形式，只能逐格讀取）
+TEXT_BATCH_SIZE = 500
+
+# Value2 以整數 HRESULT 返回錯誤值
+EXCEL_ERROR_CODES = {
+    -2146826288: '#NULL!',
+    -2146826281: '#DIV/0!',
+    -2146826273: '#VALUE!',
+    -2146826265: '#REF!',
+    -2146826259: '#NAME?',
+    -2146826252: '#NUM!',
+    -2146826246: '#N/A',
+}
+
+
+def _column_letters(col_num):
+    result = ''
+    while col_num > 0:
+        col_num -= 1
+        result = chr(ord('A') + (col_num % 26)) + result
+        col_num //= 26
+    return result
+
+
+def _as_2d(values, row_count, col_count):
+    """單一儲存格的 Formula/Value2 返回純量，多格返回 tuple of rows；統一為二維"""
+    if row_count == 1 and col_count == 1 and not isinstance(values, (tuple, list)):
+        return ((values,),)
+    return values
+
+
+def _value_to_display(value):
+    if value is None:
+        return "No Value"
+    if isinstance(value, int) and not isinstance(value, bool) and value in EXCEL_ERROR_CODES:
+        return EXCEL_ERROR_CODES[value]
+    return str(value)[:50]
+
+
+def _append_formula_row(formula_row, value_row, row_number, first_col, column_letters, scan_mode, output, pending_text):
+    """把一列 Formula/Value2 陣列中的公式儲存格轉為結果 tuple（類型稍後由 _classify_rows 批次填入）；返回找到的公式數"""
+    found = 0
+    for j, formula in enumerate(formula_row):
+        if not isinstance(formula, str) or not formula.startswith('='):
+            continue
+        found += 1
+        if scan_mode == 'quick':
+            cell_text = "N/A (Quick Scan)"
+        else:
+            cell_text = "Error"
+            pending_text.append((len(output), row_number, first_col + j))
+        output.append((None, f"{column_letters[j]}{row_number}", formula, _value_to_display(value_row[j]), cell_text))
+    return found
+
+
+def _classify_rows(output, start=0):
+    """批次分類 output[start:] 的公式（相同公式字串只分類一次）"""
+    rows = output[start:]
+    formula_types = classify_formulas([row[2] for row in rows])
+    output[start:] = [(formula_type,) + row[1:] for formula_type, row in zip(formula_types, rows)]
+
+
+def _read_pending_text(worksheet_com_obj, output, pending_text, on_batch=None):
+    """分批逐格讀取 Text（沒有陣列形式），填回 output 中對應的 tuple"""
+    for batch_start in range(0, len(pending_text), TEXT_BATCH_SIZE):
+        for index, row_number, col_number in pending_text[batch_start:batch_start + TEXT_BATCH_SIZE]:
+            formula_type, cell_address, formula, display_val, _ = output[index]
+            try:
+                cell_text = str(worksheet_com_obj.Cells(row_number, col_number).Text).strip()
+            except Exception as text_e:
+                cell_text = f"ERROR: {text_e}"
+            output[index] = (formula_type, cell_address, formula, display_val, cell_text)
+        if on_batch:
+            on_batch()
+
+
+def _is_no_formula_error(e):
+    """SpecialCells 在範圍內沒有公式時拋出的 COM 錯誤"""
+    return (
+        "(-2146827284, 'OLE error.', None, None)" in str(e)
+        or "0x800A03EC" in str(e)
+        or '找不到所要找的儲存格' in str(e)
+        or 'Unable to get the' in str(e)
+    )
+
+
+def _workbook_defined_names(workbook_com_obj):
+    """COM 工作簿的定義名稱；工作表範圍的名稱（Sheet1!Name）只保留名稱部分。讀取失敗時返回 None"""
+    try:
+        return {name.Name.split('!')[-1] for name in workbook_com_obj.Names}
+    except Exception as e:
+        print(f"[SCAN] Could not read defined names: {e}")
+        return None
+
+
+def _get_formulas_incremental(worksheet_com_obj, scan_range_com_obj, scan_mode, progress_update_callback,
+                              workbook_path, block_rows=DEFAULT_BLOCK_ROWS):
+    """
+    以陣列與區塊雜湊掃描公式：先以 SpecialCells 找出公式區域（空白與常數不讀取），
+    每個區域按 block_rows 列切塊，每塊讀一次 Formula/Value2 陣列並計算雜湊，地址由區塊位置推算。
+    區塊以其矩形為鍵，上次快照中同一矩形且雜湊相同的區塊直接沿用，只有改變的區塊才重新分類與讀取 Text。
+    沒有上次的快照時即為完整掃描（並建立快照）。
+
+    Returns:
+        (公式列表, 公式數, 公式區域儲存格總數, changes)
+        changes = {'incremental', 'scan_key'}；incremental 為 True 表示沿用了同一範圍上次的快照
+    """
+    xlCellTypeFormulas = -4123
     try:
-        xlCellTypeFormulas = -4123
         formula_range = scan_range_com_obj.SpecialCells(xlCellTypeFormulas)
-        
-        areas_to_process = []
-        if formula_range.Areas.Count > 1:
-            for area in formula_range.Areas:
-                areas_to_process.append(area)
-        else:
-            areas_to_process.append(formula_range)
-            
-        total_cells_to_process = sum(area.Cells.Count for area in areas_to_process)
-        current_cell_count = 0
-        
-        for area in areas_to_process:
-            for cell in area.Cells:
-                current_cell_count += 1
-                formula_cells_found += 1
-                
-                formula = ""
-                formula_type = "unknown"
-                cell_value = None
-                display_val = "Error"
-                cell_text = "Error"
-                cell_address = ""
-                
-                try:
-                    formula = cell.Formula
-                    formula_type = classify_formula_type(formula)
-                    cell_value = cell.Value
-                    display_val = str(cell_value)[:50] if cell_value is not None else "No Value"
-                    if scan_mode == 'quick':
-                        cell_text = "N/A (Quick Scan)"
-                    else:
-                        cell_text = str(cell.Text).strip()
-                    cell_address = cell.Address.replace('$', '')
-                    all_formulas_local.append((formula_type, cell_address, formula, display_val, cell_text))
-                except Exception as cell_processing_e:
-                    all_formulas_local.append((formula_type, cell_address if cell_address else "ERROR_ADDR", str(formula), str(display_val), f"ERROR: {cell_processing_e}"))
-                
-                if current_cell_count % 100 == 0 or current_cell_count == total_cells_to_process:
-                    progress_update_callback(current_cell_count, total_cells_to_process, formula_cells_found)
-                    
+        areas = list(formula_range.Areas) if formula_range.Areas.Count > 1 else [formula_range]
     except Exception as e:
-        no_formula_error = (
-            "(-2146827284, 'OLE error.', None, None)" in str(e)
-            or "0x800A03EC" in str(e)
-            or '找不到所要找的儲存格' in str(e)
-            or 'Unable to get the' in str(e)
-        )
-        if no_formula_error:
-            return [], 0, 0 # Return empty list if no formulas found
-        else:
-            raise # Re-raise other exceptions
+        if not _is_no_formula_error(e):
+            raise
+        areas = []
+    area_shapes = [(area.Row, area.Column, area.Rows.Count, area.Columns.Count) for area in areas]
+    total_cells_to_process = sum(row_count * col_count for _, _, row_count, col_count in area_shapes)
+
+    block_cache = get_scan_block_cache()
+    cache_key = block_cache.make_key(workbook_path, worksheet_com_obj.Name,
+                                     scan_range_com_obj.Address.replace('$', ''), scan_mode)
+    previous = block_cache.get(cache_key)
+    incremental = previous is not None and previous.block_rows == block_rows
+    if not incremental:
+        previous = None
+
+    all_formulas_local = []
+    block_spans = []  # (區塊矩形, 雜湊, all_formulas_local 中的起點, 終點)
+    pending_text = []  # (all_formulas_local 索引, 列, 欄)
+    changed_blocks = 0
+    current_cell_count = 0
+
+    for area, (first_row, first_col, row_count, col_count) in zip(areas, area_shapes):
+        last_col = first_col + col_count - 1
+        column_letters = [_column_letters(first_col + j) for j in range(col_count)]
+        for block_first in range(first_row, first_row + row_count, block_rows):
+            block_last = min(block_first + block_rows - 1, first_row + row_count - 1)
+            block_row_count = block_last - block_first + 1
+            bounds = (block_first, first_col, block_last, last_col)
+            block_start = len(all_formulas_local)
+            if block_row_count == row_count:
+                block_range = area
+            else:
+                block_range = worksheet_com_obj.Range(
+                    worksheet_com_obj.Cells(block_first, first_col),
+                    worksheet_com_obj.Cells(block_last, last_col)
+                )
+            try:
+                formulas = _as_2d(block_range.Formula, block_row_count, col_count)
+                values = _as_2d(block_range.Value2, block_row_count, col_count)
+            except Exception as block_e:
+                # 整個區塊讀取失敗：每格記錄錯誤（不保存雜湊，下次一定重讀）
+                changed_blocks += 1
+                digest = None
+                for i in range(block_row_count):
+                    for j in range(col_count):
+                        address = f"{column_letters[j]}{block_first + i}"
+                        all_formulas_local.append(("unknown", address, "", "Error", f"ERROR: {block_e}"))
+            else:
+                digest = block_hash(formulas, values)
+                old_digest, old_tuples = previous.block(bounds) if previous is not None else (None, [])
+                if digest == old_digest:
+                    all_formulas_local.extend(old_tuples)
+                else:
+                    changed_blocks += 1
+                    for i in range(block_row_count):
+                        _append_formula_row(formulas[i], values[i], block_first + i, first_col, column_letters,
+                                            scan_mode, all_formulas_local, pending_text)
+                    _classify_rows(all_formulas_local, block_start)
+
+            block_spans.append((bounds, digest, block_start, len(all_formulas_local)))
+            current_cell_count += block_row_count * col_count
+            progress_update_callback(current_cell_count, total_cells_to_process, len(all_formulas_local))
 
-    return all_formulas_local, formula_cells_found, total_cells_to_process
+    # 完整掃描：只為改變的區塊分批讀取 Text（每批之間更新進度）
+    formula_cells_found = len(all_formulas_local)
+    _read_pending_text(
+        worksheet_com_obj, all_formulas_local, pending_text,
+        lambda: progress_update_callback(current_cell_count, total_cells_to_process, formula_cells_found)
+    )
+
+    state = SheetScanState(block_rows)
+    for bounds, digest, block_start, block_end in block_spans:
+        if digest is not None:
+            state.blocks[bounds] = (digest, all_formulas_local[block_start:block_end])
+    block_count = len(block_spans)
+    block_cache.put(cache_key, state, reused_blocks=block_count - changed_blocks, rescanned_blocks=changed_blocks)
+    print(f"[SCAN] {'Incremental' if incremental else 'Full'} scan: {changed_blocks}/{block_count} blocks re-read "
+          f"in {len(areas)} formula area(s)")
+    return all_formulas_local, formula_cells_found, total_cells_to_process, {
+        'incremental': incremental,
+        'scan_key': cache_key
+    }
 
 def refresh_data(controller, btn, scan_mode='full'):
+    from core.worksheet_tree import apply_filter  # UI 模組，延遲匯入以便掃描函數可獨立測試
+
     if not controller.view.ui_initialized:
         return
 
@@ -97,11 +239,13 @@ def refresh_data(controller, btn, scan_mode='full'):
                 controller.view.progress_label.config(text="Please open your Excel file and try again.")
                 return
             except Exception as e2:
-                messagebox.showerror("Connection Error", f"Could not find an existing Excel instance or start a new one.\nPlease check for any leftover EXCEL.EXE processes and verify your permission.\n\nError: {e2}")
                 if btn is not None:
                     btn.config(state='normal')
                 controller.view.progress_bar['value'] = 0
                 controller.view.progress_label.config(text="Connection Failed.")
+                # 沒有可用的 Excel 時改為離線掃描已關閉的檔案
+                if messagebox.askyesno("Connection Error", f"Could not find an existing Excel instance or start a new one.\n\nError: {e2}\n\nScan a closed .xlsx/.xlsm file from disk instead (no Excel required)?"):
+                    scan_closed_workbook(controller, btn, scan_mode)
                 return
         try:
             controller.workbook = controller.xl.ActiveWorkbook
@@ -116,6 +260,7 @@ def refresh_data(controller, btn, scan_mode='full'):
 
         controller.last_workbook_path = controller.workbook.FullName
         controller.last_worksheet_name = controller.worksheet.Name
+        controller.defined_names = _workbook_defined_names(controller.workbook)
         controller.view.progress_bar['value'] = 10
         controller.view.progress_label.config(text="Reading workbook information...")
         controller.root.update_idletasks()
@@ -164,8 +309,8 @@ def refresh_data(controller, btn, scan_mode='full'):
                 controller.view.progress_label.config(text=f"Found {formula_cells_found} formulas. Processing {current_cell_count}/{total_cells_to_process} cells...")
                 controller.root.update_idletasks()
 
-            controller.all_formulas, formula_cells_found, total_cells_to_process = _get_formulas_from_excel(
-                controller.worksheet, scan_range, scan_mode, progress_callback
+            controller.all_formulas, formula_cells_found, total_cells_to_process, scan_changes = _get_formulas_incremental(
+                controller.worksheet, scan_range, scan_mode, progress_callback, file_path
             )
             
         except Exception as e:
@@ -206,8 +351,18 @@ def refresh_data(controller, btn, scan_mode='full'):
         controller.view.progress_label.config(text=f"Found {len(controller.all_formulas)} formulas. Loading... (Scan took {time_taken:.2f} seconds)")
         controller.root.update_idletasks()
 
+        # 只有同一範圍的增量掃描、且結果不再經過選取篩選時，才保持列表位置
+        update_incrementally = (
+            scan_changes['incremental'] and not is_selected_range_scan
+            and getattr(controller, '_last_scan_key', None) == scan_changes['scan_key']
+        )
+        controller._last_scan_key = None if is_selected_range_scan else scan_changes['scan_key']
         if hasattr(controller, 'original_user_selection') and controller.original_user_selection:
             controller._filter_results_to_original_selection()
+            update_incrementally = False
+            controller._last_scan_key = None
+        if getattr(controller, 'group_regions', None) is not None and controller.group_regions.get():
+            controller.all_formulas = cluster_formula_regions(controller.all_formulas)
         
         if hasattr(controller, 'scanning_selected_range'):
             controller.scanning_selected_range = False
@@ -220,7 +375,7 @@ def refresh_data(controller, btn, scan_mode='full'):
         if hasattr(controller, 'original_user_count'):
             controller.original_user_count = None
             
-        apply_filter(controller)
+        apply_filter(controller, keep_position=update_incrementally)
         controller.view.progress_bar['value'] = 100
         controller.view.progress_label.config(text=f"Completed: Found {len(controller.all_formulas)} formulas. (Total scan time: {time_taken:.2f} seconds)")
         if btn is not None:
@@ -246,4 +401,188 @@ def refresh_data(controller, btn, scan_mode='full'):
             btn.config(state='normal')
         controller.view.progress_bar['value'] = 0
         controller.view.progress_label.config(text="Connection Failed.")
-        return
\ No newline at end of file
+        return
+
+
+OFFLINE_FILE_TYPES = [("Excel Workbook", "*.xlsx *.xlsm *.xltx *.xltm"), ("All Files", "*.*")]
+
+
+def choose_from_list(controller, title, options):
+    """簡單的清單選擇對話框；返回選取的索引，取消時返回 None"""
+    import tkinter as tk
+    from tkinter import ttk
+
+    dialog = tk.Toplevel(controller.root)
+    dialog.title(title)
+    dialog.transient(controller.root)
+    listbox = tk.Listbox(dialog, width=60, height=min(max(len(options), 3), 15), font=("Consolas", 10))
+    listbox.pack(fill=tk.BOTH, expand=True, padx=10, pady=(10, 5))
+    for option in options:
+        listbox.insert(tk.END, option)
+    listbox.selection_set(0)
+    choice = {'index': None}
+
+    def accept(event=None):
+        selection = listbox.curselection()
+        if selection:
+            choice['index'] = selection[0]
+        dialog.destroy()
+
+    ttk.Button(dialog, text="OK", command=accept).pack(side=tk.RIGHT, padx=10, pady=(0, 10))
+    ttk.Button(dialog, text="Cancel", command=dialog.destroy).pack(side=tk.RIGHT, pady=(0, 10))
+    listbox.bind("<Double-Button-1>", accept)
+    listbox.bind("<Return>", accept)
+    dialog.grab_set()
+    listbox.focus_set()
+    controller.root.wait_window(dialog)
+    return choice['index']
+
+
+def load_offline_formulas(controller, file_path, sheet_name, formulas, time_taken):
+    """把離線掃描的結果載入面板（與 refresh_data 完成時相同的狀態更新）"""
+    from core.worksheet_tree import apply_filter
+    from core.offline_scanner import list_defined_names
+
+    controller.workbook = None
+    controller.worksheet = None
+    controller.last_workbook_path = file_path
+    controller.last_worksheet_name = sheet_name
+    controller._last_scan_key = None
+    try:
+        controller.defined_names = list_defined_names(file_path)
+    except Exception as e:
+        print(f"[SCAN] Could not read defined names: {e}")
+        controller.defined_names = None
+    display_path = os.path.dirname(file_path)
+    if len(display_path) > 60:
+        display_path = "..." + display_path[-57:]
+    controller.view.file_label.config(text=os.path.basename(file_path), foreground="black")
+    controller.view.path_label.config(text=display_path, foreground="black")
+    controller.view.sheet_label.config(text=sheet_name, foreground="black")
+    controller.view.range_label.config(text="Offline scan (values as last saved)", foreground="black")
+
+    controller.all_formulas = list(formulas)
+    if getattr(controller, 'group_regions', None) is not None and controller.group_regions.get():
+        controller.all_formulas = cluster_formula_regions(controller.all_formulas)
+    apply_filter(controller)
+    controller.view.progress_bar['value'] = 100
+    controller.view.progress_label.config(text=f"Completed (offline): Found {len(formulas)} formulas. (Total scan time: {time_taken:.2f} seconds)")
+    if not controller.all_formulas:
+        controller.view.formula_list_label.config(text="Formula List (No Formula Found)")
+
+
+def scan_closed_workbook(controller, btn, scan_mode='full', file_path=None, sheet_name=None):
+    """
+    離線掃描一張工作表：直接從磁碟讀取已關閉的 .xlsx/.xlsm，不需要 Excel
+    未指定檔案或工作表時以對話框選擇
+    """
+    from core.offline_scanner import get_formulas_from_file, list_sheet_names, is_offline_scannable
+
+    if not controller.view.ui_initialized:
+        return
+    if file_path is None:
+        file_path = filedialog.askopenfilename(title="Select Closed Workbook", filetypes=OFFLINE_FILE_TYPES)
+        if not file_path:
+            return
+    if not is_offline_scannable(file_path):
+        messagebox.showerror("Offline Scan", f"Offline scan supports .xlsx/.xlsm files only:\n{file_path}")
+        return
+
+    controller.clear_filter_inputs()
+    if btn is not None:
+        btn.config(state='disabled')
+    try:
+        if sheet_name is None:
+            sheet_names = list_sheet_names(file_path)
+            index = 0 if len(sheet_names) == 1 else choose_from_list(controller, "Select Worksheet", sheet_names)
+            if index is None:
+                return
+            sheet_name = sheet_names[index]
+
+        controller.view.progress_bar['value'] = 10
+        controller.view.progress_label.config(text=f"Reading '{os.path.basename(file_path)}' from disk...")
+        controller.root.update_idletasks()
+
+        def progress_callback(current_row, total_rows, formula_cells_found):
+            progress = 10 + (current_row / total_rows) * 80 if total_rows else 90
+            controller.view.progress_bar['value'] = min(int(progress), 90)
+            controller.view.progress_label.config(text=f"Found {formula_cells_found} formulas. Processing row {current_row}/{total_rows}...")
+            controller.root.update_idletasks()
+
+        start_time = time.time()
+        formulas, _, _ = get_formulas_from_file(file_path, sheet_name, scan_mode, progress_callback)
+        load_offline_formulas(controller, file_path, sheet_name, formulas, time.time() - start_time)
+    except Exception as e:
+        messagebox.showerror("Offline Scan Error", f"Could not scan {os.path.basename(file_path)}: {e}\n\nTraceback:\n{traceback.format_exc()}")
+        controller.view.progress_bar['value'] = 0
+        controller.view.progress_label.config(text="Offline scan failed.")
+    finally:
+        if btn is not None:
+            btn.config(state='normal')
+
+
+def scan_closed_workbooks(controller, btn, scan_mode='full', file_paths=None):
+    """
+    以 ScanOrchestrator 平行離線掃描一或多個已關閉工作簿的所有工作表
+    掃描在背景執行緒中進行，進度以 root.after 轉回主執行緒；完成後選擇要顯示的工作表，
+    全部結果保存在 controller.offline_scan_results
+    """
+    import threading
+    from core.scan_orchestrator import ScanOrchestrator
+
+    if not controller.view.ui_initialized:
+        return
+    if file_paths is None:
+        file_paths = filedialog.askopenfilenames(title="Select Closed Workbooks", filetypes=OFFLINE_FILE_TYPES)
+    file_paths = list(file_paths or ())
+    if not file_paths:
+        return
+
+    controller.clear_filter_inputs()
+    if btn is not None:
+        btn.config(state='disabled')
+    controller.view.progress_bar['value'] = 0
+    controller.view.progress_label.config(text=f"Scanning {len(file_paths)} workbook(s) offline...")
+    orchestrator = ScanOrchestrator(scan_mode=scan_mode)
+
+    def show_progress(completed, total, sheet_result):
+        controller.view.progress_bar['value'] = int(completed / total * 90) if total else 90
+        controller.view.progress_label.config(
+            text=f"Scanned {completed}/{total} sheets: {os.path.basename(sheet_result['file_path'])}!{sheet_result['sheet_name']} "
+                 f"({sheet_result['formula_count']} formulas)")
+
+    def show_results(scan_result):
+        if btn is not None:
+            btn.config(state='normal')
+        controller.offline_scan_results = scan_result
+        sheet_results = [sheet_result for sheets in scan_result['results'].values()
+                         for sheet_result in sheets.values() if sheet_result['success']]
+        if scan_result['errors']:
+            messagebox.showwarning("Offline Scan", "Some sheets could not be scanned:\n\n" + "\n".join(scan_result['errors'][:20]))
+        if not sheet_results:
+            controller.view.progress_bar['value'] = 0
+            controller.view.progress_label.config(text="Offline scan failed.")
+            return
+        print(f"[SCAN] Offline scan: {scan_result['sheet_count']} sheets, {scan_result['total_formulas']} formulas "
+              f"in {scan_result['elapsed']:.2f}s")
+        index = 0
+        if len(sheet_results) > 1:
+            options = [f"{os.path.basename(r['file_path'])}!{r['sheet_name']} ({r['formula_count']} formulas)" for r in sheet_results]
+            index = choose_from_list(controller, "Select Worksheet to Display", options)
+            if index is None:
+                index = 0
+        chosen = sheet_results[index]
+        load_offline_formulas(controller, chosen['file_path'], chosen['sheet_name'], chosen['formulas'], scan_result['elapsed'])
+
+    def scan_in_thread():
+        try:
+            scan_result = orchestrator.scan(
+                file_paths,
+                lambda completed, total, sheet_result: controller.root.after(0, show_progress, completed, total, sheet_result)
+            )
+        except Exception as e:
+            scan_result = {'success': False, 'results': {}, 'errors': [str(e)], 'sheet_count': 0,
+                           'failed_sheets': 0, 'total_formulas': 0, 'elapsed': 0.0}
+        controller.root.after(0, show_results, scan_result)
+
+    threading.Thread(target=scan_in_thread, daemon=True).start()
@@ -1,17 +1,119 @@
 
+import re
+from functools import lru_cache
+
 from .link_analyzer import is_external_link_regex_match
 
+# Richer categories used by the filter UI (a formula can belong to several)
+FORMULA_CATEGORIES = ('lookup', 'indirect', 'array', 'named')
+
+_LOOKUP_PATTERN = re.compile(
+    r'(?<![A-Za-z0-9_.])(?:_xlfn\.)?(?:VLOOKUP|HLOOKUP|XLOOKUP|LOOKUP|INDEX|MATCH|XMATCH)\s*\(', re.IGNORECASE)
+_INDIRECT_PATTERN = re.compile(r'(?<![A-Za-z0-9_.])INDIRECT\s*\(', re.IGNORECASE)
+_DYNAMIC_ARRAY_PATTERN = re.compile(
+    r'(?<![A-Za-z0-9_.])(?:_xlfn\.(?:_xlws\.)?)?(?:FILTER|SORT|SORTBY|UNIQUE|SEQUENCE|RANDARRAY)\s*\(', re.IGNORECASE)
+_QUOTED_PATTERN = re.compile(r'"[^"]*"|\'[^\']*\'|\[[^\]]*\]')
+# Sheet1! and 3-D Sheet1:Sheet3! prefixes (quoted sheet names are already removed with the strings)
+_SHEET_PREFIX_PATTERN = re.compile(r'(?<![A-Za-z0-9_.\\])(?:[A-Za-z_\\][A-Za-z0-9_.\\]*:)?[A-Za-z_\\][A-Za-z0-9_.\\]*!')
+# Identifiers may carry $ anchors (A$1, $A1); they are stripped before the cell/column checks
+_IDENTIFIER_PATTERN = re.compile(r'(?<![A-Za-z0-9_.$\\])(\$?[A-Za-z_\\][A-Za-z0-9_.$\\]*)(?![A-Za-z0-9_.$\\]*\s*\()')
+_CELL_REFERENCE_PATTERN = re.compile(r'^[A-Za-z]{1,3}[0-9]+$')
+_COLUMN_PATTERN = re.compile(r'^[A-Za-z]{1,3}$')
+_R1C1_PATTERN = re.compile(r'^R[0-9]*C[0-9]*$', re.IGNORECASE)
+_LITERAL_NAMES = frozenset(('TRUE', 'FALSE'))
+
+
 def classify_formula_type(formula):
     formula_str = str(formula)
-    
+
     # Use the more comprehensive external link detection
     if is_external_link_regex_match(formula_str):
         return 'external link'
-    
+
     if '!' in formula_str:
         return 'local link'
-    
+
     if formula_str.startswith('='):
         return 'formula'
-    
-    return 'formula'
\ No newline at end of file
+
+    return 'formula'
+
+
+def classify_formulas(formulas):
+    """
+    Batch version of classify_formula_type for a whole scanned formula array.
+    Identical formula strings (fill-down copies differ, but repeated constants
+    and absolute references are common) are classified only once.
+    """
+    types = {}
+    result = []
+    for formula in formulas:
+        formula_type = types.get(formula)
+        if formula_type is None:
+            formula_type = types[formula] = classify_formula_type(formula)
+        result.append(formula_type)
+    return result
+
+
+def _referenced_names(formula_str):
+    """Identifiers that are neither functions, sheet names, cell/column references nor literals"""
+    stripped = _SHEET_PREFIX_PATTERN.sub(' ', _QUOTED_PATTERN.sub(' ', formula_str))
+    names = set()
+    for match in _IDENTIFIER_PATTERN.finditer(stripped):
+        token = match.group(1).replace('$', '')
+        if token.upper() in _LITERAL_NAMES or _CELL_REFERENCE_PATTERN.match(token) or _R1C1_PATTERN.match(token):
+            continue
+        if _COLUMN_PATTERN.match(token):
+            before = stripped[:match.start()]
+            after = stripped[match.end():]
+            if before.endswith(':') or after.startswith(':'):
+                continue  # whole-column reference such as A:C
+        names.add(token)
+    return names
+
+
+@lru_cache(maxsize=65536)
+def _formula_categories(formula_str, defined_names):
+    categories = set()
+    if '(' in formula_str:
+        if _LOOKUP_PATTERN.search(formula_str):
+            categories.add('lookup')
+        if _INDIRECT_PATTERN.search(formula_str):
+            categories.add('indirect')
+        if _DYNAMIC_ARRAY_PATTERN.search(formula_str):
+            categories.add('array')
+    if '{' in formula_str:
+        categories.add('array')
+    names = _referenced_names(formula_str)
+    if defined_names is not None:
+        names = {name for name in names if name.upper() in defined_names}
+    if names:
+        categories.add('named')
+    return frozenset(categories)
+
+
+def normalize_defined_names(defined_names):
+    """Upper-cased frozenset of workbook names, as formula_categories expects (None stays None)"""
+    if defined_names is None:
+        return None
+    return frozenset(name.upper() for name in defined_names)
+
+
+def formula_categories(formula, defined_names=None):
+    """
+    Richer categories of a formula: 'lookup', 'indirect', 'array' (array
+    constants and dynamic-array functions) and 'named' (defined names).
+    Without defined_names every unrecognised identifier counts as a name.
+    Callers classifying many formulas should pass normalize_defined_names(...)
+    once; a frozenset is taken as already normalized.
+    """
+    if defined_names is not None and not isinstance(defined_names, frozenset):
+        defined_names = normalize_defined_names(defined_names)
+    return _formula_categories(str(formula), defined_names)
+
+
+def classify_formulas_detailed(formulas, defined_names=None):
+    """Batch classification returning (formula_type, categories) per formula"""
+    types = classify_formulas(formulas)
+    defined_names = normalize_defined_names(defined_names)
+    return [(formula_type, formula_categories(formula, defined_names)) for formula_type, formula in zip(types, formulas)]
@@ -12,7 +12,7 @@ import re
 
 from ui.worksheet.controller import WorksheetController
 from ui.worksheet.view import WorksheetView
-from core.excel_scanner import refresh_data
+from core.excel_scanner import refresh_data, scan_closed_workbooks
 import time
 from core.worksheet_tree import apply_filter
 
@@ -68,6 +68,8 @@ class ExcelFormulaComparator:
         self.scan_full_button.pack(side=tk.LEFT, padx=2)
         self.scan_selected_button = ttk.Button(first_row, text="Selected Range", command=self.scan_worksheet_selected, style="Large.TButton")
         self.scan_selected_button.pack(side=tk.LEFT, padx=2)
+        self.scan_offline_button = ttk.Button(first_row, text="Closed Workbooks...", command=self.scan_closed_files, style="Large.TButton")
+        self.scan_offline_button.pack(side=tk.LEFT, padx=2)
         
         # Remove second row with Selection info
         
@@ -108,6 +110,11 @@ class ExcelFormulaComparator:
         self.update_selection_info(controller)
         refresh_data(controller, self.scan_full_button, scan_mode=mode)
 
+    def scan_closed_files(self):
+        """Scan every sheet of one or more closed .xlsx/.xlsm files in parallel, without Excel"""
+        controller = self._get_active_controller()
+        scan_closed_workbooks(controller, self.scan_offline_button, scan_mode=self.current_mode)
+
     def scan_worksheet_selected(self):
         mode = self.current_mode  # Use current_mode instead of mode_var
         controller = self._get_active_controller()
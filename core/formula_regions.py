@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+Formula Regions - 把往下/往右複製的公式合併為矩形區域
+- 以 R1C1 形式比較公式：=B2*C2 與 =B3*C3 都是 =RC[-2]*RC[-1]
+- 同一 R1C1 公式的儲存格合併為矩形區域（例如 D2:D50001），在結果列表中是一列
+- 區域只保存左上角公式與每格的值/顯示文字，展開時才建立每格的結果 tuple
+"""
+
+import re
+from collections import OrderedDict
+
+from openpyxl.utils import get_column_letter, column_index_from_string
+
+# 引號內的字串、工作表名稱與結構化參照（Table1[@Col1]）不做轉換
+_QUOTED_PATTERN = re.compile(r'"[^"]*"|\'[^\']*\'|\[[^\]]*\]')
+
+# 儲存格引用 / 整欄 / 整列；前後不能是名稱的一部分，後面不能是 ( 或 !（函數名稱、工作表名稱）
+_REFERENCE_PATTERN = re.compile(
+    r'(?<![A-Za-z0-9_.\]])'
+    r'(?:'
+    r'(?P<cabs>\$?)(?P<col>[A-Za-z]{1,3})(?P<rabs>\$?)(?P<row>[0-9]{1,7})'
+    r'|(?P<c1abs>\$?)(?P<col1>[A-Za-z]{1,3}):(?P<c2abs>\$?)(?P<col2>[A-Za-z]{1,3})'
+    r'|(?P<r1abs>\$?)(?P<row1>[0-9]{1,7}):(?P<r2abs>\$?)(?P<row2>[0-9]{1,7})'
+    r')'
+    r'(?![A-Za-z0-9_(!])'
+)
+
+_CELL_ADDRESS_PATTERN = re.compile(r'^([A-Z]{1,3})([0-9]+)$')
+
+REGION_DISPLAY_TEXT = "Region (double-click to expand)"
+
+
+def _transform_references(formula, transform):
+    """對引號外的每個引用呼叫 transform(match)，以其返回值取代"""
+    parts = []
+    last = 0
+    for quoted in _QUOTED_PATTERN.finditer(formula):
+        parts.append(_REFERENCE_PATTERN.sub(transform, formula[last:quoted.start()]))
+        parts.append(quoted.group(0))
+        last = quoted.end()
+    parts.append(_REFERENCE_PATTERN.sub(transform, formula[last:]))
+    return ''.join(parts)
+
+
+def _r1c1_part(axis, absolute, number, origin):
+    if absolute:
+        return f"{axis}{number}"
+    offset = number - origin
+    return axis if offset == 0 else f"{axis}[{offset}]"
+
+
+def to_r1c1(formula, row, col):
+    """A1 公式 -> 以 (row, col) 為基準的 R1C1 公式；無法辨識的部分保持原樣"""
+    def transform(match):
+        if match.group('col'):
+            return (_r1c1_part('R', match.group('rabs'), int(match.group('row')), row) +
+                    _r1c1_part('C', match.group('cabs'), column_index_from_string(match.group('col').upper()), col))
+        if match.group('col1'):
+            return (_r1c1_part('C', match.group('c1abs'), column_index_from_string(match.group('col1').upper()), col) + ':' +
+                    _r1c1_part('C', match.group('c2abs'), column_index_from_string(match.group('col2').upper()), col))
+        return (_r1c1_part('R', match.group('r1abs'), int(match.group('row1')), row) + ':' +
+                _r1c1_part('R', match.group('r2abs'), int(match.group('row2')), row))
+    return _transform_references(formula, transform)
+
+
+def shift_formula(formula, row_offset, col_offset):
+    """把 A1 公式的相對引用平移（等同 Excel 的複製貼上），絕對引用不變"""
+    def shift_col(absolute, letters):
+        return f"${letters}" if absolute else get_column_letter(column_index_from_string(letters.upper()) + col_offset)
+
+    def shift_row(absolute, number):
+        return f"${number}" if absolute else str(int(number) + row_offset)
+
+    def transform(match):
+        if match.group('col'):
+            return shift_col(match.group('cabs'), match.group('col')) + shift_row(match.group('rabs'), match.group('row'))
+        if match.group('col1'):
+            return shift_col(match.group('c1abs'), match.group('col1')) + ':' + shift_col(match.group('c2abs'), match.group('col2'))
+        return shift_row(match.group('r1abs'), match.group('row1')) + ':' + shift_row(match.group('r2abs'), match.group('row2'))
+    return _transform_references(formula, transform)
+
+
+class FormulaRegion(tuple):
+    """
+    結果列表中的區域列，本身是 (formula_type, address, r1c1_formula, result, display_value) tuple，
+    所以篩選、排序、匯出都照常運作；cells() 按需還原每格的結果 tuple
+    """
+
+    def __new__(cls, formula_type, min_row, min_col, max_row, max_col, anchor_formula, r1c1_formula, values, texts):
+        address = f"{get_column_letter(min_col)}{min_row}:{get_column_letter(max_col)}{max_row}"
+        self = super().__new__(cls, (formula_type, address, r1c1_formula, f"{len(values)} cells", REGION_DISPLAY_TEXT))
+        self.bounds = (min_row, min_col, max_row, max_col)
+        self.anchor_formula = anchor_formula
+        self.values = values  # 按列優先順序的結果
+        self.texts = texts
+        return self
+
+    @property
+    def cell_count(self):
+        return len(self.values)
+
+    def cells(self):
+        """展開為每格的 (formula_type, address, formula, result, display_value)"""
+        min_row, min_col, max_row, max_col = self.bounds
+        formula_type = self[0]
+        width = max_col - min_col + 1
+        result = []
+        for index, (value, text) in enumerate(zip(self.values, self.texts)):
+            row_offset, col_offset = divmod(index, width)
+            result.append((
+                formula_type,
+                f"{get_column_letter(min_col + col_offset)}{min_row + row_offset}",
+                shift_formula(self.anchor_formula, row_offset, col_offset),
+                value,
+                text
+            ))
+        return result
+
+
+def _rectangles(cells):
+    """同一公式的儲存格 {(row, col): tuple} -> 矩形 [(min_row, min_col, max_row, max_col)]"""
+    runs_by_column = {}
+    for row, col in sorted(cells, key=lambda position: (position[1], position[0])):
+        runs = runs_by_column.setdefault(col, [])
+        if runs and runs[-1][1] == row - 1:
+            runs[-1][1] = row
+        else:
+            runs.append([row, row])
+
+    # 相鄰欄中起訖列相同的區段合併為矩形
+    columns_by_run = {}
+    for col, runs in runs_by_column.items():
+        for start, end in runs:
+            columns_by_run.setdefault((start, end), []).append(col)
+    rectangles = []
+    for (start, end), columns in columns_by_run.items():
+        columns.sort()
+        first = previous = columns[0]
+        for col in columns[1:]:
+            if col != previous + 1:
+                rectangles.append((start, first, end, previous))
+                first = col
+            previous = col
+        rectangles.append((start, first, end, previous))
+    return rectangles
+
+
+def cluster_formula_regions(formulas, min_region_cells=2):
+    """
+    把結果列表中相同 R1C1 公式的相鄰儲存格合併為 FormulaRegion
+
+    Args:
+        formulas: (formula_type, address, formula, result, display_value) 列表
+        min_region_cells: 少於此數的矩形保持為個別儲存格
+
+    Returns:
+        新的結果列表（按左上角位置排序），區域列為 FormulaRegion
+    """
+    groups = OrderedDict()
+    passthrough = []
+    for formula_data in expand_formula_regions(formulas):
+        match = _CELL_ADDRESS_PATTERN.match(str(formula_data[1]).replace('$', '').upper())
+        if len(formula_data) < 5 or not match or not str(formula_data[2]).startswith('='):
+            passthrough.append(formula_data)
+            continue
+        row = int(match.group(2))
+        col = column_index_from_string(match.group(1))
+        key = (formula_data[0], to_r1c1(formula_data[2], row, col))
+        groups.setdefault(key, {})[(row, col)] = formula_data
+
+    positioned = []
+    for (formula_type, r1c1_formula), cells in groups.items():
+        for min_row, min_col, max_row, max_col in _rectangles(cells):
+            positions = [(row, col) for row in range(min_row, max_row + 1) for col in range(min_col, max_col + 1)]
+            members = [cells[position] for position in positions]
+            if len(members) < min_region_cells:
+                positioned.extend(zip(positions, members))
+                continue
+            region = FormulaRegion(
+                formula_type, min_row, min_col, max_row, max_col,
+                members[0][2], r1c1_formula,
+                [member[3] for member in members], [member[4] for member in members]
+            )
+            positioned.append(((min_row, min_col), region))
+
+    positioned.sort(key=lambda item: item[0])
+    return [item for _, item in positioned] + passthrough
+
+
+def expand_formula_regions(formulas):
+    """把列表中的 FormulaRegion 還原為個別儲存格"""
+    if not any(isinstance(formula_data, FormulaRegion) for formula_data in formulas):
+        return list(formulas)
+    result = []
+    for formula_data in formulas:
+        if isinstance(formula_data, FormulaRegion):
+            result.extend(formula_data.cells())
+        else:
+            result.append(formula_data)
+    return result
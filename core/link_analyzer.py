@@ -10,6 +10,9 @@ import re
 import os
 
 
+EXTERNAL_LINK_PATTERN = re.compile(r"\[([^\]]+?\.(?:xlsx|xls|xlsm|xlsb))\]", re.IGNORECASE)
+
+
 def is_external_link_regex_match(formula_str):
     """
     Check if a formula string contains external link references.
@@ -20,8 +23,10 @@ def is_external_link_regex_match(formula_str):
     Returns:
         bool: True if external link pattern is found, False otherwise
     """
-    external_link_pattern = re.compile(r"\[([^\]]+?\.(?:xlsx|xls|xlsm|xlsb))\]", re.IGNORECASE)
-    return bool(external_link_pattern.search(formula_str))
+    # Cheap prefilter: every external reference contains a '[' bracket
+    if '[' not in formula_str:
+        return False
+    return bool(EXTERNAL_LINK_PATTERN.search(formula_str))
 
 
 def get_referenced_cell_values(
@@ -29,7 +34,8 @@ def get_referenced_cell_values(
     current_sheet_com_obj, 
     current_workbook_path,
     read_external_cell_value_func,
-    find_matching_sheet_func
+    find_matching_sheet_func,
+    read_external_cell_values_func=None
 ):
     """
     Extract and retrieve values from all cell references in a formula.
@@ -40,12 +46,16 @@ def get_referenced_cell_values(
         current_workbook_path (str): Path to the current workbook
         read_external_cell_value_func: Function to read external cell values
         find_matching_sheet_func: Function to find matching worksheets
+        read_external_cell_values_func: Optional batch reader taking
+            (file, sheet, cell) tuples; when given, all external references
+            are read in one call grouped by file instead of one call each
         
     Returns:
         dict: Dictionary mapping reference addresses to their values
     """
     referenced_data = {}
     processed_spans = []
+    pending_external_reads = {}
 
     def is_span_processed(start, end):
         for p_start, p_end in processed_spans:
@@ -125,6 +135,12 @@ def get_referenced_cell_values(
 
                 if ':' in cell_ref:
                     value = "(Range Reference)"
+                elif read_external_cell_values_func is not None:
+                    value = None
+                    if display_ref_with_path not in referenced_data:
+                        pending_external_reads[display_ref_with_path] = (
+                            full_file_path, sheet_name, cell_ref.replace('$', '')
+                        )
                 else:
                     value = read_external_cell_value_func(
                         current_workbook_path, full_file_path, sheet_name, cell_ref.replace('$', '')
@@ -171,6 +187,16 @@ def get_referenced_cell_values(
         except Exception as e:
             print(f"ERROR: Could not process reference from match '{match.group(0)}': {e}")
 
+    if pending_external_reads:
+        try:
+            batch_values = read_external_cell_values_func(list(pending_external_reads.values()))
+            for display_ref_with_path, request in pending_external_reads.items():
+                referenced_data[display_ref_with_path] = batch_values.get(request, "External (Not Read)")
+        except Exception as e:
+            print(f"ERROR: Could not batch read external references: {e}")
+            for display_ref_with_path in pending_external_reads:
+                referenced_data[display_ref_with_path] = f"External (Batch Read Error: {str(e)[:100]})"
+
     return referenced_data
 
 
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Offline Scanner - 不啟動 Excel，直接從磁碟串流掃描已關閉的 .xlsx/.xlsm
+- 公式經由共用的已解析讀取器 (utils.openpyxl_resolver) 讀取，外部連結與 COM 一樣顯示完整路徑
+- 計算值來自共用的工作表值快取 (utils.sheet_value_cache)，即 Excel 上次儲存時的結果
+- 產生與 excel_scanner._get_formulas_incremental 相同的 (formula_type, address, formula, value, text) tuple
+"""
+
+import os
+import re
+import datetime
+
+from openpyxl.utils import get_column_letter, range_boundaries
+
+from core.formula_classifier import classify_formulas
+from utils.openpyxl_resolver import load_resolved_workbook
+from utils.sheet_value_cache import get_sheet_values
+
+OFFLINE_EXTENSIONS = ('.xlsx', '.xlsm', '.xltx', '.xltm')
+
+# 每處理這麼多列回報一次進度
+PROGRESS_ROW_INTERVAL = 500
+
+_DECIMALS_PATTERN = re.compile(r'\.(0+)')
+
+
+def is_offline_scannable(file_path):
+    return os.path.splitext(file_path)[1].lower() in OFFLINE_EXTENSIONS
+
+
+def list_sheet_names(file_path):
+    """返回工作簿的工作表名稱（不載入儲存格）"""
+    return list(load_resolved_workbook(file_path).sheetnames)
+
+
+def list_defined_names(file_path):
+    """返回工作簿的定義名稱（活頁簿與工作表範圍），供公式類別篩選使用"""
+    workbook = load_resolved_workbook(file_path)
+    names = set(workbook.defined_names)
+    for sheet_name in workbook.sheetnames:
+        names.update(getattr(workbook[sheet_name], 'defined_names', None) or ())
+    return names
+
+
+def format_cell_text(value, number_format=None):
+    """
+    近似 Excel 的 Range.Text：支援 General、固定小數、千分位、百分比與日期
+    其他自訂格式以 General 顯示
+    """
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        if isinstance(value, datetime.datetime) and value.time() == datetime.time(0):
+            return value.strftime('%Y-%m-%d')
+        return str(value)
+    if not isinstance(value, (int, float)):
+        return str(value)
+
+    section = (number_format or 'General').split(';')[0]
+    if section == 'General' or not any(ch in section for ch in '0#'):
+        if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+            return str(int(value))
+        return f"{value:.10g}" if isinstance(value, float) else str(value)
+
+    match = _DECIMALS_PATTERN.search(section)
+    decimals = len(match.group(1)) if match else 0
+    if section.endswith('%'):
+        return f"{value * 100:.{decimals}f}%"
+    if ',' in section:
+        return f"{value:,.{decimals}f}"
+    return f"{value:.{decimals}f}"
+
+
+def get_formulas_from_file(file_path, sheet_name, scan_mode='full', progress_update_callback=None, scan_range=None):
+    """
+    掃描已關閉工作簿中一張工作表的公式
+
+    Args:
+        file_path: .xlsx/.xlsm 檔案路徑
+        sheet_name: 工作表名稱（不分大小寫）
+        scan_mode: 'full' 依儲存格格式產生 text；'quick' 與 COM 快速掃描一樣不讀格式
+        progress_update_callback: callback(已處理列數, 總列數, 已找到公式數)
+        scan_range: 可選的 A1 範圍（例如 "A1:D100"），預設為整張工作表
+
+    Returns:
+        (all_formulas, formula_cells_found, total_cells_to_process)，與 excel_scanner._get_formulas_incremental 返回的前三項相同
+
+    Raises:
+        FileNotFoundError: 檔案不存在
+        ValueError: 不支援的檔案類型或工作表不存在
+    """
+    if not is_offline_scannable(file_path):
+        raise ValueError(f"Offline scan supports {', '.join(OFFLINE_EXTENSIONS)} only: {file_path}")
+
+    workbook = load_resolved_workbook(file_path)
+    found_sheet = next((name for name in workbook.sheetnames if name.lower() == sheet_name.lower()), None)
+    if found_sheet is None:
+        raise ValueError(f"Sheet not found: {sheet_name}")
+    sheet = workbook[found_sheet]
+    values = get_sheet_values(file_path, found_sheet)
+
+    min_row = min_col = max_row = max_col = None
+    if scan_range:
+        min_col, min_row, max_col, max_row = range_boundaries(scan_range.replace('$', ''))
+    total_rows = (max_row or sheet.max_row or 0) - (min_row or 1) + 1
+    total_cols = (max_col or sheet.max_column or 0) - (min_col or 1) + 1
+    total_cells_to_process = max(total_rows, 0) * max(total_cols, 0)
+
+    all_formulas_local = []
+    with_format = scan_mode != 'quick'
+    column_letters = {}
+    last_reported_row = min_row or 1
+
+    for row, col, formula, number_format in sheet.iter_formula_cells(min_row, max_row, min_col, max_col,
+                                                                      with_format=with_format):
+        letters = column_letters.get(col)
+        if letters is None:
+            letters = column_letters[col] = get_column_letter(col)
+        value = values.get(row, col) if values is not None else None
+        display_val = str(value)[:50] if value is not None else "No Value"
+        cell_text = format_cell_text(value, number_format) if with_format else "N/A (Quick Scan)"
+        all_formulas_local.append((f"{letters}{row}", formula, display_val, cell_text))
+
+        if progress_update_callback and row - last_reported_row >= PROGRESS_ROW_INTERVAL:
+            last_reported_row = row
+            progress_update_callback(row - (min_row or 1) + 1, total_rows, len(all_formulas_local))
+
+    # 批次分類：相同公式字串只分類一次
+    formula_types = classify_formulas([item[1] for item in all_formulas_local])
+    all_formulas_local = [(formula_type,) + item for formula_type, item in zip(formula_types, all_formulas_local)]
+
+    if progress_update_callback:
+        progress_update_callback(total_rows, total_rows, len(all_formulas_local))
+
+    formula_cells_found = len(all_formulas_local)
+    return all_formulas_local, formula_cells_found, total_cells_to_process
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+Scan Orchestrator - 多工作表 / 多工作簿的平行離線掃描
+- 每張工作表是一個工作單元，分派到 process pool（使用所有核心）
+- 每個工作程序使用離線掃描器 (core.offline_scanner)，不需要 Excel
+- 每完成一張工作表就回報一次進度，結果按 工作簿 -> 工作表 合併
+- 單一工作表失敗只記錄錯誤，其他工作表的結果照常保留
+"""
+
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from core.offline_scanner import get_formulas_from_file, list_sheet_names, is_offline_scannable
+
+
+def _scan_sheet_worker(file_path, sheet_name, scan_mode):
+    """在工作程序中掃描一張工作表；永遠返回結果 dict，不拋出例外"""
+    start_time = time.time()
+    try:
+        formulas, formula_count, _ = get_formulas_from_file(file_path, sheet_name, scan_mode)
+        return {
+            'success': True,
+            'file_path': file_path,
+            'sheet_name': sheet_name,
+            'formulas': formulas,
+            'formula_count': formula_count,
+            'elapsed': time.time() - start_time,
+            'error': None
+        }
+    except Exception as e:
+        return {
+            'success': False,
+            'file_path': file_path,
+            'sheet_name': sheet_name,
+            'formulas': [],
+            'formula_count': 0,
+            'elapsed': time.time() - start_time,
+            'error': f"{e}\n{traceback.format_exc()}"
+        }
+
+
+class ScanOrchestrator:
+    """
+    平行掃描協調器
+
+    progress_callback(completed, total, sheet_result) 在呼叫 scan() 的執行緒中被呼叫；
+    UI 應在背景執行緒中呼叫 scan()，並以 root.after 把進度轉回主執行緒
+    """
+
+    def __init__(self, max_workers=None, scan_mode='full'):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.scan_mode = scan_mode
+        self._cancelled = False
+
+    def cancel(self):
+        """停止分派尚未開始的工作表；已完成的結果仍會返回"""
+        self._cancelled = True
+
+    def scan(self, targets, progress_callback=None):
+        """
+        掃描多個工作簿 / 工作表
+
+        Args:
+            targets: 檔案路徑列表，或 {file_path: [sheet_name, ...] 或 None(全部工作表)}
+
+        Returns dict:
+            {
+                'success': bool,            # 至少一張工作表掃描成功
+                'results': {file_path: {sheet_name: sheet_result}},
+                'errors': list[str],
+                'sheet_count': int,
+                'failed_sheets': int,
+                'total_formulas': int,
+                'elapsed': float
+            }
+        """
+        start_time = time.time()
+        self._cancelled = False
+        if not isinstance(targets, dict):
+            targets = {file_path: None for file_path in targets}
+
+        results = {}
+        errors = []
+        tasks = []
+        for file_path, sheet_names in targets.items():
+            results[file_path] = {}
+            if not is_offline_scannable(file_path):
+                errors.append(f"{os.path.basename(file_path)}: 不支援離線掃描的檔案類型")
+                continue
+            if sheet_names is None:
+                try:
+                    sheet_names = list_sheet_names(file_path)
+                except Exception as e:
+                    errors.append(f"{os.path.basename(file_path)}: 無法讀取工作表列表: {e}")
+                    continue
+            tasks.extend((file_path, sheet_name) for sheet_name in sheet_names)
+
+        total = len(tasks)
+        completed = 0
+
+        def collect(sheet_result):
+            nonlocal completed
+            completed += 1
+            results[sheet_result['file_path']][sheet_result['sheet_name']] = sheet_result
+            if not sheet_result['success']:
+                errors.append(f"{os.path.basename(sheet_result['file_path'])}!{sheet_result['sheet_name']}: "
+                              f"{sheet_result['error'].splitlines()[0]}")
+            if progress_callback:
+                progress_callback(completed, total, sheet_result)
+
+        workers = min(self.max_workers, total)
+        pending = list(tasks)
+        if workers > 1:
+            try:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    futures = {executor.submit(_scan_sheet_worker, file_path, sheet_name, self.scan_mode): (file_path, sheet_name)
+                               for file_path, sheet_name in tasks}
+                    for future in as_completed(futures):
+                        pending.remove(futures[future])
+                        if self._cancelled:
+                            for other in futures:
+                                other.cancel()
+                        try:
+                            collect(future.result())
+                        except Exception:
+                            # 被取消或工作程序異常終止：留給下面的循序處理或標記為失敗
+                            pending.append(futures[future])
+            except (BrokenProcessPool, OSError) as e:
+                print(f"[SCAN] Process pool unavailable, continuing sequentially: {e}")
+
+        # 單一工作表、單核心或 process pool 失敗時在本程序中循序掃描
+        for file_path, sheet_name in pending:
+            if self._cancelled:
+                break
+            collect(_scan_sheet_worker(file_path, sheet_name, self.scan_mode))
+
+        sheet_results = [sheet_result for sheets in results.values() for sheet_result in sheets.values()]
+        return {
+            'success': any(sheet_result['success'] for sheet_result in sheet_results),
+            'results': results,
+            'errors': errors,
+            'sheet_count': len(sheet_results),
+            'failed_sheets': sum(1 for sheet_result in sheet_results if not sheet_result['success']),
+            'total_formulas': sum(sheet_result['formula_count'] for sheet_result in sheet_results),
+            'elapsed': time.time() - start_time
+        }
+
+
+def scan_workbooks(targets, scan_mode='full', max_workers=None, progress_callback=None):
+    """
+    便捷函數：平行掃描多個已關閉的工作簿
+
+    Returns:
+        與 ScanOrchestrator.scan 相同的結果 dict
+    """
+    return ScanOrchestrator(max_workers=max_workers, scan_mode=scan_mode).scan(targets, progress_callback)
@@ -13,10 +13,13 @@ from openpyxl.utils import get_column_letter
 import re
 from core.excel_connector import activate_excel_window
 from core.excel_scanner import refresh_data
+from core.worksheet_tree import get_filtered_formulas
 import time
 
 def export_formulas_to_excel(controller):
-    if not controller.view.result_tree.get_children():
+    # Export the whole filtered list (not just the rendered rows); regions are expanded so import can write back per cell
+    formulas_to_export = get_filtered_formulas(controller, expand_regions=True)
+    if not formulas_to_export:
         messagebox.showinfo("No Data", "There is no data to export in the list.")
         return
     file_path = filedialog.asksaveasfilename(
@@ -37,8 +40,7 @@ def export_formulas_to_excel(controller):
     sheet.column_dimensions[get_column_letter(2)].number_format = '@'
     address_idx = controller.view.tree_columns.index("address")
     formula_idx = controller.view.tree_columns.index("formula")
-    for i, item_id in enumerate(controller.view.result_tree.get_children()):
-        values = controller.view.result_tree.item(item_id, "values")
+    for i, values in enumerate(formulas_to_export):
         if len(values) > max(address_idx, formula_idx):
             sheet.cell(row=i + 2, column=1, value=values[address_idx])
             sheet.cell(row=i + 2, column=2, value="'" + values[formula_idx])
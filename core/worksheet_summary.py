@@ -6,7 +6,7 @@ from core.data_processor import _get_summary_data
 
 
 def summarize_external_links(controller):
-    if not controller.view.result_tree.get_children():
+    if not getattr(controller, 'filtered_formulas', None):
         messagebox.showinfo("No Data", "There are no formulas in the list to summarize.\nPlease scan a worksheet first, or adjust filters.")
         return
 
@@ -19,85 +19,175 @@ from core.graph_generator import GraphGenerator
 
 # Import functions from their new locations
 from core.link_analyzer import get_referenced_cell_values
-from utils.excel_io import find_matching_sheet, read_external_cell_value
+from utils.excel_io import find_matching_sheet, read_external_cell_value, read_external_cell_values
 from utils.range_optimizer import parse_excel_address
 from core.excel_connector import activate_excel_window, find_external_workbook_path
 from openpyxl.utils import get_column_letter, column_index_from_string
+from core.formula_regions import FormulaRegion, cluster_formula_regions, expand_formula_regions, shift_formula
+from core.formula_classifier import formula_categories, normalize_defined_names
 
 
 _last_range_threshold = 5
 _last_max_depth = 10
 
-def apply_filter(controller, event=None):
-    controller.view.result_tree.delete(*controller.view.result_tree.get_children())
-    controller.cell_addresses.clear()
+_MAX_ROW = 1048576
+_MAX_COL = 16384
+
+
+def _address_filter_bounds(f_type, f_val):
+    """把 parse_excel_address 的結果轉為 (min_row, min_col, max_row, max_col) 矩形"""
+    if f_type == 'row_range':
+        start_r, end_r = map(int, f_val.split(':'))
+        return start_r, 1, end_r, _MAX_COL
+    if f_type == 'col_range':
+        start_c, end_c = f_val.split(':')
+        return 1, column_index_from_string(start_c), _MAX_ROW, column_index_from_string(end_c)
+    corners = []
+    for cell in f_val.split(':'):
+        col_str, row_str = re.match(r"([A-Z]+)([0-9]+)", cell).groups()
+        corners.append((int(row_str), column_index_from_string(col_str)))
+    (r1, c1), (r2, c2) = corners[0], corners[-1]
+    return min(r1, r2), min(c1, c2), max(r1, r2), max(c1, c2)
+
+
+def _row_bounds(formula_data):
+    """結果列佔用的矩形：區域列為其範圍，一般列為單一儲存格；地址無法解析時返回 None"""
+    if isinstance(formula_data, FormulaRegion):
+        return formula_data.bounds
+    current_cell_match = re.match(r"([A-Z]+)([0-9]+)", formula_data[1].replace("$", "").upper())
+    if not current_cell_match:
+        return None
+    cell_col_str, cell_row_str = current_cell_match.groups()
+    cell_row_idx, cell_col_idx = int(cell_row_str), column_index_from_string(cell_col_str)
+    return cell_row_idx, cell_col_idx, cell_row_idx, cell_col_idx
+
+
+def _region_formulas(region):
+    """區域內每格的 A1 公式（左上角公式按位移還原），按需產生"""
+    width = region.bounds[3] - region.bounds[1] + 1
+    for index in range(region.cell_count):
+        row_offset, col_offset = divmod(index, width)
+        yield shift_formula(region.anchor_formula, row_offset, col_offset)
+
+
+def _build_formula_filter(controller):
+    """
+    根據 UI 篩選條件建立判斷函數；地址篩選無效時顯示錯誤並返回 None
+    區域列只要其中任何一格符合即顯示：地址以矩形相交判斷，結果/顯示值比對每格的值，
+    公式比對 R1C1 公式、左上角公式及各格還原後的公式
+    """
     address_filter_str = controller.view.filter_entries['address'].get().strip()
-    parsed_address_filters = []
+    address_filter_bounds = []
     if address_filter_str and address_filter_str != controller.placeholder_text:
         address_tokens = [token.strip() for token in address_filter_str.split(',') if token.strip()]
         if address_tokens:
             try:
                 for token in address_tokens:
-                    parsed_address_filters.append(parse_excel_address(token))
+                    address_filter_bounds.append(_address_filter_bounds(*parse_excel_address(token)))
             except Exception as e:
                 messagebox.showerror("Invalid Excel Address", str(e))
-                return
+                return None
     other_filters = {
         'type': (controller.show_formula.get(), controller.show_local_link.get(), controller.show_external_link.get()),
         'formula': controller.view.filter_entries['formula'].get().lower(),
         'result': controller.view.filter_entries['result'].get().lower(),
         'display_value': controller.view.filter_entries['display_value'].get().lower()
     }
-    filtered_formulas = []
-    for formula_data in controller.all_formulas:
-        if len(formula_data) < 5: continue
+    type_map = {'formula': other_filters['type'][0], 'local link': other_filters['type'][1], 'external link': other_filters['type'][2]}
+    category_var = getattr(controller, 'formula_category', None)
+    category = category_var.get().lower() if category_var is not None else 'all'
+    defined_names = normalize_defined_names(getattr(controller, 'defined_names', None))
+
+    def contains(needle, values):
+        return any(needle in str(value).lower() for value in values)
+
+    def matches(formula_data):
+        if len(formula_data) < 5: return False
         formula_type, address, formula_content, result_val, display_val = formula_data
-        type_map = {'formula': other_filters['type'][0], 'local link': other_filters['type'][1], 'external link': other_filters['type'][2]}
-        if not type_map.get(formula_type, True): continue
-        if other_filters['formula'] and other_filters['formula'] not in str(formula_content).lower(): continue
-        if other_filters['result'] and other_filters['result'] not in str(result_val).lower(): continue
-        if other_filters['display_value'] and other_filters['display_value'] not in str(display_val).lower(): continue
-        if parsed_address_filters:
-            addr_upper = address.replace("$", "").upper()
-            current_cell_match = re.match(r"([A-Z]+)([0-9]+)", addr_upper)
-            if not current_cell_match: continue
-            cell_col_str, cell_row_str = current_cell_match.groups()
-            cell_col_idx = column_index_from_string(cell_col_str)
-            cell_row_idx = int(cell_row_str)
-            is_match = False
-            for f_type, f_val in parsed_address_filters:
-                if f_type == 'cell' and addr_upper == f_val:
-                    is_match = True; break
-                elif f_type == 'row_range':
-                    start_r, end_r = map(int, f_val.split(':'))
-                    if start_r <= cell_row_idx <= end_r:
-                        is_match = True; break
-                elif f_type == 'col_range':
-                    start_c, end_c = f_val.split(':')
-                    if column_index_from_string(start_c) <= cell_col_idx <= column_index_from_string(end_c):
-                        is_match = True; break
-                elif f_type == 'range':
-                    start_cell, end_cell = f_val.split(':')
-                    sc_str, sr_str = re.match(r"([A-Z]+)([0-9]+)", start_cell).groups()
-                    ec_str, er_str = re.match(r"([A-Z]+)([0-9]+)", end_cell).groups()
-                    if (column_index_from_string(sc_str) <= cell_col_idx <= column_index_from_string(ec_str) and
-                        int(sr_str) <= cell_row_idx <= int(er_str)):
-                        is_match = True; break
-            if not is_match: continue
-        filtered_formulas.append(formula_data)
+        if not type_map.get(formula_type, True): return False
+        is_region = isinstance(formula_data, FormulaRegion)
+        if other_filters['formula']:
+            if is_region:
+                if not contains(other_filters['formula'], (formula_content, formula_data.anchor_formula)) and \
+                        not contains(other_filters['formula'], _region_formulas(formula_data)):
+                    return False
+            elif other_filters['formula'] not in str(formula_content).lower():
+                return False
+        if other_filters['result']:
+            if not contains(other_filters['result'], formula_data.values if is_region else (result_val,)): return False
+        if other_filters['display_value']:
+            if not contains(other_filters['display_value'], formula_data.texts if is_region else (display_val,)): return False
+        if category != 'all':
+            # 區域列以左上角的 A1 公式判斷類別
+            anchor = formula_data.anchor_formula if is_region else formula_content
+            if category not in formula_categories(anchor, defined_names): return False
+        if address_filter_bounds:
+            row_bounds = _row_bounds(formula_data)
+            if row_bounds is None: return False
+            min_row, min_col, max_row, max_col = row_bounds
+            if not any(f_min_row <= max_row and min_row <= f_max_row and f_min_col <= max_col and min_col <= f_max_col
+                       for f_min_row, f_min_col, f_max_row, f_max_col in address_filter_bounds):
+                return False
+        return True
+
+    return matches
+
+def apply_filter(controller, event=None, keep_position=False):
+    """
+    篩選與排序只處理 all_formulas 的索引陣列，結果交給虛擬列表；
+    樹狀檢視只建立可見的列，成本與 Tk 項目數無關
+    """
+    matches = _build_formula_filter(controller)
+    if matches is None:
+        return
+    all_formulas = controller.all_formulas
+    indices = [i for i, formula_data in enumerate(all_formulas) if matches(formula_data)]
     if controller.current_sort_column:
         col_index = controller.view.tree_columns.index(controller.current_sort_column)
         sort_dir = controller.sort_directions[controller.current_sort_column]
-        filtered_formulas.sort(key=lambda x: str(x[col_index]), reverse=(sort_dir == -1))
-    count = len(filtered_formulas)
+        indices.sort(key=lambda i: str(all_formulas[i][col_index]), reverse=(sort_dir == -1))
+    controller.view_indices = indices
+    controller.filtered_formulas = [all_formulas[i] for i in indices]
+    count = len(indices)
     controller.view.formula_list_label.config(text=f"Formula List ({count} records):")
-    for i, data in enumerate(filtered_formulas):
-        tag = "evenrow" if i % 2 == 0 else "oddrow"
-        item_id = controller.view.result_tree.insert("", "end", values=data, tags=(tag,))
-        address_index = controller.view.tree_columns.index("address")
+    controller.view.result_list.set_rows(controller.filtered_formulas, keep_position=keep_position)
+
+def sync_cell_addresses(controller, rendered_items):
+    """虛擬列表重繪後的回呼：cell_addresses 只對應目前可見的樹狀檢視項目"""
+    address_index = controller.view.tree_columns.index("address")
+    controller.cell_addresses.clear()
+    for item_id, data in rendered_items:
         if address_index < len(data):
             controller.cell_addresses[item_id] = data[address_index]
 
+def get_filtered_formulas(controller, expand_regions=False):
+    """
+    目前篩選/排序後的結果列表（即虛擬列表的完整內容，不只是可見的列）
+    expand_regions=True 時區域列還原為個別儲存格，供匯出與逐格處理使用
+    """
+    formulas = getattr(controller, 'filtered_formulas', None)
+    if formulas is None:
+        formulas = controller.all_formulas
+    return expand_formula_regions(formulas) if expand_regions else list(formulas)
+
+def toggle_region_grouping(controller):
+    """切換是否把複製的公式合併為區域列"""
+    if controller.group_regions.get():
+        controller.all_formulas = cluster_formula_regions(controller.all_formulas)
+    else:
+        controller.all_formulas = expand_formula_regions(controller.all_formulas)
+    apply_filter(controller)
+
+def expand_region_row(controller, item_id):
+    """把區域列原地展開為個別儲存格，保持目前的捲動位置"""
+    region = controller.view.result_list.row_for_item(item_id)
+    if not isinstance(region, FormulaRegion):
+        return False
+    position = controller.all_formulas.index(region)
+    controller.all_formulas[position:position + 1] = region.cells()
+    apply_filter(controller, keep_position=True)
+    return True
+
 def sort_column(controller, col_id):
     controller.current_sort_column = col_id
     controller.sort_directions[col_id] *= -1
@@ -345,7 +435,8 @@ def go_to_reference_new_tab(controller, workbook_path, sheet_name, cell_address,
                             target_worksheet,
                             target_workbook.FullName,
                             read_func,
-                            lambda name, obj: find_matching_sheet(controller.workbook, name)
+                            lambda name, obj: find_matching_sheet(controller.workbook, name),
+                            read_external_cell_values_func=read_external_cell_values
                         )
                         
                         if referenced_values:
@@ -435,6 +526,14 @@ def on_select(controller, event):
     formula_type, cell_address, formula, result, display_value = values
     
     current_detail_text.delete(1.0, 'end')
+    region = controller.view.result_list.row_for_item(item_id)
+    if isinstance(region, FormulaRegion):
+        # 區域列：顯示區域資訊，其餘詳細資料以左上角儲存格為準
+        current_detail_text.insert('end', "Region: ", "label")
+        current_detail_text.insert('end', f"{cell_address} ({region.cell_count} cells) = {region[2]}\n", "value")
+        formula_type, cell_address, formula, result, display_value = (
+            region[0], cell_address.split(':')[0], region.anchor_formula, region.values[0], region.texts[0]
+        )
     current_detail_text.insert('end', "Type: ", "label")
     current_detail_text.insert('end', f"{formula_type} / ", "value")
     current_detail_text.insert('end', "Cell Address: ", "label")
@@ -459,7 +558,7 @@ def on_select(controller, event):
                     selected_item = controller.view.result_tree.selection()
                     if selected_item:
                         item_id = selected_item[0]
-                        current_cell_address = controller.cell_addresses.get(item_id, "A1")
+                        current_cell_address = controller.cell_addresses.get(item_id, "A1").split(':')[0]
                         explode_dependencies_popup(controller, current_workbook_path, current_sheet_name, current_cell_address, f"{current_sheet_name}!{current_cell_address}")
                     else:
                         from tkinter import messagebox
@@ -488,7 +587,8 @@ def on_select(controller, event):
                 controller.worksheet,
                 controller.workbook.FullName,
                 read_func,
-                lambda name, obj: find_matching_sheet(controller.workbook, name)
+                lambda name, obj: find_matching_sheet(controller.workbook, name),
+                read_external_cell_values_func=read_external_cell_values
             )
         except Exception as e:
             print(f"Warning: Could not get referenced values: {e}")
@@ -703,6 +803,8 @@ def on_double_click(controller, event):
     if not selected_item:
         return
     item_id = selected_item[0]
+    if expand_region_row(controller, item_id):
+        return
     cell_address = controller.cell_addresses.get(item_id)
     if cell_address:
         try:
@@ -1257,7 +1359,9 @@ def explode_dependencies_popup(controller, workbook_path, sheet_name, cell_addre
     彈出視窗顯示公式依賴關係爆炸圖 - 增強版包含進度顯示和日誌累積
     """
     try:
-        from utils.progress_enhanced_exploder import explode_cell_dependencies_with_progress, ProgressCallback
+        from utils.progress_enhanced_exploder import (
+            explode_cell_dependencies_with_progress, expand_collapsed_node_with_progress, ProgressCallback
+        )
         import tkinter as tk
         from tkinter import ttk, messagebox
         
@@ -1389,6 +1493,19 @@ def explode_dependencies_popup(controller, workbook_path, sheet_name, cell_addre
         
         ttk.Label(params_frame, text="levels deep").pack(side=tk.LEFT, padx=2)
         
+        # 分隔符
+        ttk.Separator(params_frame, orient='vertical').pack(side=tk.LEFT, fill='y', padx=10)
+        
+        # 現行分支模式：IF/IFS/CHOOSE/SWITCH 只展開現行分支，休眠分支雙擊後才展開
+        saved_live_branch = getattr(controller, '_saved_live_branch', False)
+        live_branch_var = tk.BooleanVar(value=saved_live_branch)
+        live_branch_cb = ttk.Checkbutton(
+            params_frame,
+            text="Live Branches Only (IF/IFS/CHOOSE/SWITCH)",
+            variable=live_branch_var
+        )
+        live_branch_cb.pack(side=tk.LEFT, padx=5)
+        
 
         def update_params_preview():
             """更新參數預覽"""
@@ -1563,6 +1680,7 @@ def explode_dependencies_popup(controller, workbook_path, sheet_name, cell_addre
                 # 清空樹狀視圖和日誌
                 for item in dependency_tree.get_children():
                     dependency_tree.delete(item)
+                populate_tree.collapsed_nodes.clear()
                 clear_log()
                 
                 # === 創建進度回調 ===
@@ -1613,13 +1731,18 @@ def explode_dependencies_popup(controller, workbook_path, sheet_name, cell_addre
                 # 保存用戶設定供下次使用
                 controller._saved_range_threshold = range_threshold_var.get()
                 controller._saved_max_depth = max_depth_var.get()
+                controller._saved_live_branch = live_branch_var.get()
+                
+                # 保存進度回調，供之後展開休眠分支使用
+                start_analysis.progress_callback = progress_callback
                 
                 # 執行爆炸分析 - 使用用戶設定的參數
                 dependency_tree_data, summary = explode_cell_dependencies_with_progress(
                     workbook_path, sheet_name, cell_address, 
                     max_depth=max_depth_var.get(), 
                     range_expand_threshold=range_threshold_var.get(),
-                    progress_callback=progress_callback
+                    progress_callback=progress_callback,
+                    live_branch=live_branch_var.get()
                 )
                 
                 # 檢查是否被取消
@@ -1702,8 +1825,11 @@ def explode_dependencies_popup(controller, workbook_path, sheet_name, cell_addre
                 # === 修復：處理所有動態函數的resolved formula ===
                 resolved_formula = ""
                 # 檢查是否有任何動態函數解析
-                if (node.get('has_indirect', False) or 
-                    node.get('has_index', False)):  # 添加INDEX檢查
+                if (node.get('has_live_branch', False) or
+                    node.get('has_indirect', False) or 
+                    node.get('has_index', False) or  # 添加INDEX檢查
+                    node.get('has_offset', False) or
+                    node.get('has_xlookup', False)):
                     raw_resolved = node.get('resolved_formula', '')
                     # 不要截短resolved formula，完整顯示
                     resolved_formula = format_formula_display(raw_resolved)
@@ -1728,6 +1854,10 @@ def explode_dependencies_popup(controller, workbook_path, sheet_name, cell_addre
                     icon = "⚠️"
                 elif node_type == 'range':
                     icon = "📋"  # 範圍使用表格圖標
+                elif node_type == 'dormant_branch':
+                    icon = "💤"  # 休眠分支（雙擊展開）
+                elif node_type == 'criteria_rows':
+                    icon = "🎯"  # 條件彙總的參與列（雙擊展開）
                 else:
                     icon = "📄"
                 
@@ -1738,6 +1868,10 @@ def explode_dependencies_popup(controller, workbook_path, sheet_name, cell_addre
                     values=(formula, resolved_formula, value, node_type, depth)
                 )
                 
+                # 收合節點（休眠分支 / 條件列）需要原始節點才能按需展開
+                if node.get('is_collapsed'):
+                    populate_tree.collapsed_nodes[item_id] = node
+                
                 # 儲存完整的節點詳細信息到 tags 中，供雙擊導航使用
                 node_details = {
                     'workbook_path': node.get('workbook_path', workbook_path),
@@ -1775,6 +1909,43 @@ def explode_dependencies_popup(controller, workbook_path, sheet_name, cell_addre
             except Exception as e:
                 print(f"Error populating tree node: {e}")
         
+        populate_tree.collapsed_nodes = {}
+        
+        def expand_collapsed_node(item):
+            """展開收合節點（休眠分支 / 條件列），並把新的子節點填入樹狀視圖"""
+            collapsed_node = populate_tree.collapsed_nodes.get(item)
+            if not collapsed_node or not collapsed_node.get('is_collapsed'):
+                return
+            try:
+                progress_var.set("Expanding collapsed node...")
+                progress_bar.start(10)
+                popup.update()
+                
+                expand_collapsed_node_with_progress(
+                    collapsed_node,
+                    max_depth=max_depth_var.get(),
+                    range_expand_threshold=range_threshold_var.get(),
+                    progress_callback=getattr(start_analysis, 'progress_callback', None),
+                    live_branch=live_branch_var.get()
+                )
+                
+                parent = dependency_tree.parent(item)
+                index = dependency_tree.index(item)
+                dependency_tree.delete(item)
+                del populate_tree.collapsed_nodes[item]
+                populate_tree(collapsed_node, parent)
+                new_item = dependency_tree.get_children(parent)[-1]
+                dependency_tree.move(new_item, parent, index)
+                dependency_tree.item(new_item, open=True)
+                dependency_tree.selection_set(new_item)
+                
+                progress_var.set(f"Node expanded: {len(collapsed_node.get('children', []))} children")
+            except Exception as e:
+                messagebox.showerror("Expand Error", f"Could not expand node:\n{str(e)}")
+                progress_var.set(f"Node expansion failed: {str(e)}")
+            finally:
+                progress_bar.stop()
+        
         def show_summary(summary):
             """顯示分析摘要"""
             summary_text.delete(1.0, tk.END)
@@ -1792,7 +1963,23 @@ Node Type Distribution:
                 summary_content += f"\nCircular References Found:\n"
                 for ref in summary['circular_ref_list']:
                     summary_content += f"  {ref}\n"
-            
+
+            memo_stats = summary.get('calculation_memo_stats')
+            if memo_stats:
+                summary_content += (f"\nCalculation Memo: {memo_stats['stats']['hits']} hits / "
+                                    f"{memo_stats['stats']['misses']} misses "
+                                    f"({memo_stats['hit_rate_percent']}%), {memo_stats['memo_size']} entries\n")
+
+            dynamic_stats = summary.get('dynamic_function_stats', {})
+            if dynamic_stats.get('live_branch_nodes'):
+                summary_content += (f"Live Branches: {dynamic_stats['live_branch_nodes']} pruned formulas, "
+                                    f"{dynamic_stats['dormant_branches']} dormant branches "
+                                    f"(double-click to expand)\n")
+            if dynamic_stats.get('criteria_row_sets'):
+                summary_content += (f"Criteria Rows: {dynamic_stats['criteria_row_sets']} row sets, "
+                                    f"{dynamic_stats['criteria_contributing_rows']} contributing rows "
+                                    f"(double-click to expand)\n")
+
             summary_text.insert(1.0, summary_content)
         
         def refresh_tree_display():
@@ -1814,6 +2001,7 @@ Node Type Distribution:
                     # 清空現有內容
                     for item in dependency_tree.get_children():
                         dependency_tree.delete(item)
+                    populate_tree.collapsed_nodes.clear()
                     
                     # 重新填充
                     populate_tree(refresh_tree_display.tree_data)
@@ -1842,6 +2030,12 @@ Node Type Distribution:
                     return
                     
                 item = dependency_tree.selection()[0]
+                
+                # 收合節點：雙擊展開而不是導航
+                if item in populate_tree.collapsed_nodes and populate_tree.collapsed_nodes[item].get('is_collapsed'):
+                    expand_collapsed_node(item)
+                    return
+                
                 item_text = dependency_tree.item(item, "text")
                 tags = dependency_tree.item(item, "tags")
                 
@@ -22,15 +22,20 @@ class WorksheetController:
         self.workbook = None
         self.worksheet = None
         self.all_formulas = []
+        self.filtered_formulas = []
+        self.view_indices = []
         self.cell_addresses = {}
         self.use_openpyxl = tk.BooleanVar(value=True)
         self.show_formula = tk.BooleanVar(value=True)
         self.show_local_link = tk.BooleanVar(value=True)
         self.show_external_link = tk.BooleanVar(value=True)
+        self.group_regions = tk.BooleanVar(value=True)
+        self.formula_category = tk.StringVar(value='All')
         self.sort_directions = {col: 1 for col in ("type", "address", "formula", "result", "display_value")}
         self.current_sort_column = None
         self.last_workbook_path = None
         self.last_worksheet_name = None
+        self.defined_names = None  # Workbook defined names read at scan time, used by the 'named' category filter
 
         # Scan-related attributes
         self.scanning_selected_range = False
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+Virtual List Module
+
+This module contains the VirtualTreeview class, which shows a backing array
+of rows in a ttk.Treeview while only ever creating as many Tk items as fit on
+screen. Scrolling re-fills the same items from a different window of the
+array, so filter/sort cost no longer depends on the widget item count.
+"""
+
+from tkinter import ttk
+
+# Rows scrolled per mouse wheel notch
+WHEEL_SCROLL_ROWS = 3
+
+
+class VirtualTreeview:
+    """Renders the visible window of a backing row list into an existing Treeview."""
+
+    def __init__(self, tree, scrollbar, on_render=None):
+        """
+        Args:
+            tree: ttk.Treeview (show="headings") used for display only
+            scrollbar: vertical ttk.Scrollbar driving the window offset
+            on_render: callback([(item_id, row), ...]) called after every re-render
+        """
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.on_render = on_render
+        self.rows = []
+        self.offset = 0
+        self.selected_index = None
+        self._item_ids = []
+        self._item_rows = {}
+        self._visible_rows = max(1, int(tree.cget('height')))
+
+        self.scrollbar.configure(command=self.yview)
+        self.tree.configure(yscrollcommand=lambda first, last: None)
+        self.tree.bind('<Configure>', self._on_configure, add='+')
+        self.tree.bind('<MouseWheel>', self._on_mouse_wheel)
+        self.tree.bind('<Button-4>', lambda event: self._scroll_by(-WHEEL_SCROLL_ROWS))
+        self.tree.bind('<Button-5>', lambda event: self._scroll_by(WHEEL_SCROLL_ROWS))
+        for key, step in (('<Up>', -1), ('<Down>', 1), ('<Prior>', 'page_up'), ('<Next>', 'page_down'),
+                          ('<Home>', 'home'), ('<End>', 'end')):
+            self.tree.bind(key, lambda event, s=step: self._on_key(s))
+
+    # --- Backing data ---------------------------------------------------
+
+    def set_rows(self, rows, keep_position=False):
+        """
+        Replace the backing rows. With keep_position the scroll offset (and the
+        selection, if it is still in range) is kept, e.g. after a rescan.
+        """
+        self.rows = rows
+        if not keep_position:
+            self.offset = 0
+            self.selected_index = None
+        elif self.selected_index is not None and self.selected_index >= len(rows):
+            self.selected_index = None
+        self.render()
+
+    def row_for_item(self, item_id):
+        """Backing row currently shown by a Treeview item (None if not rendered)"""
+        return self._item_rows.get(item_id)
+
+    def index_for_item(self, item_id):
+        if item_id not in self._item_rows:
+            return None
+        return self.offset + self._item_ids.index(item_id)
+
+    def select_index(self, index):
+        """Select a backing row, scrolling it into view; fires <<TreeviewSelect>>"""
+        if not self.rows:
+            return
+        index = min(max(index, 0), len(self.rows) - 1)
+        if index < self.offset:
+            self.offset = index
+        elif index >= self.offset + self._visible_rows:
+            self.offset = index - self._visible_rows + 1
+        self.render()
+        item_id = self._item_ids[index - self.offset]
+        self.tree.selection_set(item_id)
+        self.tree.focus(item_id)
+
+    def bind_select(self, callback):
+        """
+        Bind <<TreeviewSelect>> so callback only sees real selection changes.
+        Re-selecting the same backing row after a scroll, or losing the selection
+        because its row scrolled out of the window, is not reported.
+        """
+        def handler(event):
+            selection = self.tree.selection()
+            if selection:
+                index = self.index_for_item(selection[0])
+                if index is None or index == self.selected_index:
+                    return
+                self.selected_index = index
+            elif self.selected_index is not None:
+                return
+            callback(event)
+        self.tree.bind('<<TreeviewSelect>>', handler)
+
+    # --- Scrolling ------------------------------------------------------
+
+    def yview(self, *args):
+        """Scrollbar command: ('moveto', fraction) or ('scroll', n, 'units'|'pages')"""
+        if not args:
+            return
+        if args[0] == 'moveto':
+            self._scroll_to(int(float(args[1]) * len(self.rows)))
+        elif args[0] == 'scroll':
+            step = int(args[1])
+            if len(args) > 2 and args[2] == 'pages':
+                step *= self._visible_rows
+            self._scroll_by(step)
+
+    def _scroll_to(self, offset):
+        offset = min(max(offset, 0), max(len(self.rows) - self._visible_rows, 0))
+        if offset != self.offset:
+            self.offset = offset
+            self.render()
+        return 'break'
+
+    def _scroll_by(self, step):
+        return self._scroll_to(self.offset + step)
+
+    def _on_mouse_wheel(self, event):
+        return self._scroll_by(-int(event.delta / 120) * WHEEL_SCROLL_ROWS if event.delta else 0)
+
+    def _on_key(self, step):
+        if not self.rows:
+            return 'break'
+        current = self.selected_index if self.selected_index is not None else self.offset - 1
+        if step == 'page_up':
+            target = current - self._visible_rows
+        elif step == 'page_down':
+            target = current + self._visible_rows
+        elif step == 'home':
+            target = 0
+        elif step == 'end':
+            target = len(self.rows) - 1
+        else:
+            target = current + step
+        self.select_index(target)
+        return 'break'
+
+    def _on_configure(self, event):
+        style = ttk.Style()
+        row_height = int(style.lookup('Treeview', 'rowheight') or 20)
+        heading_height = row_height + 5
+        visible_rows = max(1, (event.height - heading_height) // row_height)
+        if visible_rows != self._visible_rows:
+            self._visible_rows = visible_rows
+            self.offset = min(self.offset, max(len(self.rows) - visible_rows, 0))
+            self.render()
+
+    # --- Rendering ------------------------------------------------------
+
+    def render(self):
+        """Fill the reused Treeview items from rows[offset:offset + visible_rows]"""
+        self.offset = min(self.offset, max(len(self.rows) - self._visible_rows, 0))
+        window = self.rows[self.offset:self.offset + self._visible_rows]
+
+        while len(self._item_ids) > len(window):
+            self.tree.delete(self._item_ids.pop())
+        while len(self._item_ids) < len(window):
+            self._item_ids.append(self.tree.insert("", "end"))
+
+        self._item_rows = {}
+        for position, (item_id, row) in enumerate(zip(self._item_ids, window)):
+            tag = "evenrow" if (self.offset + position) % 2 == 0 else "oddrow"
+            self.tree.item(item_id, values=row, tags=(tag,))
+            self._item_rows[item_id] = row
+
+        # Keep the selection on the same backing row; drop it while that row is scrolled out
+        selected = self.selected_index
+        if selected is not None and self.offset <= selected < self.offset + len(window):
+            item_id = self._item_ids[selected - self.offset]
+            if self.tree.selection() != (item_id,):
+                self.tree.selection_set(item_id)
+        elif self.tree.selection():
+            self.tree.selection_remove(*self.tree.selection())
+
+        total = len(self.rows)
+        if total:
+            self.scrollbar.set(self.offset / total, min(self.offset + len(window), total) / total)
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+        if self.on_render:
+            self.on_render(list(self._item_rows.items()))
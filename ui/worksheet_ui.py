@@ -14,7 +14,8 @@ from tkinter import ttk
 from core.excel_connector import reconnect_to_excel
 from core.worksheet_export import export_formulas_to_excel, import_and_update_formulas
 from core.worksheet_summary import summarize_external_links
-from core.worksheet_tree import apply_filter, sort_column, on_select, on_double_click
+from core.worksheet_tree import apply_filter, sort_column, on_select, on_double_click, toggle_region_grouping, sync_cell_addresses
+from ui.worksheet.virtual_list import VirtualTreeview
 
 def create_ui_widgets(self):
     """Creates and places all UI widgets without binding commands."""
@@ -67,6 +68,12 @@ def create_ui_widgets(self):
     self.show_local_link_check.pack(side=tk.LEFT, padx=5)
     self.show_external_link_check = ttk.Checkbutton(filter_checkbox_frame, text="External Link", variable=self.controller.show_external_link)
     self.show_external_link_check.pack(side=tk.LEFT, padx=5)
+    self.group_regions_check = ttk.Checkbutton(filter_checkbox_frame, text="Group Copied Formulas", variable=self.controller.group_regions)
+    self.group_regions_check.pack(side=tk.LEFT, padx=5)
+    ttk.Label(filter_checkbox_frame, text="Category:", font=filter_label_font).pack(side=tk.LEFT, padx=(10, 5))
+    self.category_combo = ttk.Combobox(filter_checkbox_frame, textvariable=self.controller.formula_category,
+                                       values=("All", "Lookup", "INDIRECT", "Array", "Named"), state="readonly", width=10)
+    self.category_combo.pack(side=tk.LEFT, padx=5)
     self.openpyxl_check = ttk.Checkbutton(filter_checkbox_frame, text="Enable Non-GUI File Reading for Cell Results", variable=self.controller.use_openpyxl)
     self.openpyxl_check.pack(side=tk.LEFT, padx=15)
 
@@ -124,8 +131,9 @@ def create_ui_widgets(self):
     self.result_tree.grid(row=0, column=0, sticky="nsew")
     scrollbar = ttk.Scrollbar(tree_frame, orient="vertical")
     scrollbar.grid(row=0, column=1, sticky="ns")
-    self.result_tree.configure(yscrollcommand=scrollbar.set)
-    scrollbar.configure(command=self.result_tree.yview)
+    # Only the visible window of the filtered list is rendered as Treeview items
+    self.result_list = VirtualTreeview(self.result_tree, scrollbar,
+                                       on_render=lambda items: sync_cell_addresses(self.controller, items))
 
     detail_header_frame = ttk.Frame(self)
     detail_header_frame.grid(row=6, column=0, sticky=(tk.W, tk.E), pady=(10, 0))
@@ -147,6 +155,8 @@ def bind_ui_commands(self):
     self.show_formula_check.config(command=lambda: apply_filter(self.controller))
     self.show_local_link_check.config(command=lambda: apply_filter(self.controller))
     self.show_external_link_check.config(command=lambda: apply_filter(self.controller))
+    self.group_regions_check.config(command=lambda: toggle_region_grouping(self.controller))
+    self.category_combo.bind("<<ComboboxSelected>>", lambda event, s=self.controller: apply_filter(s, event))
     self.openpyxl_check.config(command=lambda: on_select(self.controller, event=None))
 
     for col_id, entry in self.filter_entries.items():
@@ -165,7 +175,7 @@ def bind_ui_commands(self):
         self.result_tree.heading(col_id, command=lambda c=col_id, s=self.controller: sort_column(s, c))
     
     self.result_tree.bind("<Double-Button-1>", lambda event, s=self.controller: on_double_click(s, event))
-    self.result_tree.bind("<<TreeviewSelect>>", lambda event, s=self.controller: on_select(s, event))
+    self.result_list.bind_select(lambda event, s=self.controller: on_select(s, event))
 
     self.close_tabs_button.config(command=self.controller.tab_manager.close_all_tabs_except_main)
 
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""
+Live Branch Solver - IF / IFS / CHOOSE / SWITCH 的現行分支剪枝
+設計與 OffsetSolver/XLookupSolver 一致：
+- 條件 / 選擇值以原生計算器從快取的儲存格值計算，不啟動 Excel
+- 只保留現行分支，休眠分支的參數在公式中留空（IF(A1,,B1)），之後照常解析引用
+- 休眠分支另外返回，由爆炸分析器建立可按需展開的收合節點
+- 條件無法計算（不支援的函數、錯誤值）時保留整個函數，不做任何剪枝
+"""
+
+import re
+
+from utils.formula_evaluator import UnsupportedExpression, ExcelError, to_bool, to_number, compare_values
+
+# 分支函數（新版函數在檔案中以 _xlfn. 前綴保存）；前一個字元不能是名稱的一部分（避免 COUNTIF( 等）
+BRANCH_FUNCTION_PATTERN = re.compile(r'(?<![A-Za-z0-9_.])(?:_xlfn\.)?(IFS|IF|CHOOSE|SWITCH)\s*\(', re.IGNORECASE)
+
+# 剪枝後至少保留的參數數目：結尾的空參數只刪到這裡，避免產生 IF(cond) 這類無效公式
+MIN_ARGUMENTS = {'IF': 2, 'IFS': 2, 'CHOOSE': 2, 'SWITCH': 3}
+
+
+class LiveBranchSolver:
+    """IF/IFS/CHOOSE/SWITCH 現行分支解析器"""
+
+    def __init__(self, excel_manager, progress_callback, main_analyzer=None):
+        self.excel_manager = excel_manager
+        self.progress_callback = progress_callback
+        self.main_analyzer = main_analyzer
+
+    def resolve_live_branches(self, formula, workbook_path, sheet_name, cell_address):
+        """
+        只保留公式中現行的分支
+
+        Returns dict:
+            {
+                'success': bool,                # 至少剪除了一個分支
+                'live_formula': str,            # 休眠參數留空後的公式
+                'dormant_branches': list[dict], # {'function', 'label', 'formula', 'selector'}
+                'decisions': list[dict],        # 每個已決定的分支函數
+                'original_formula': str,
+                'errors': list[str]
+            }
+        """
+        if not formula or not formula.startswith('='):
+            return {'success': False, 'error': 'Not a formula', 'original_formula': formula}
+
+        evaluator = self.excel_manager.native_evaluator
+        live_formula = formula
+        dormant_branches = []
+        decisions = []
+        errors = []
+
+        search_pos = 1
+        while True:
+            call = self._find_next_call(live_formula, search_pos)
+            if call is None:
+                break
+
+            arguments = [live_formula[start:end] for start, end in call['arguments']]
+            try:
+                selection = self._select_branch(call['name'], arguments, evaluator, workbook_path, sheet_name, cell_address)
+            except UnsupportedExpression as e:
+                selection = None
+                errors.append(f"{call['name']} 條件無法以原生方式計算: {e}")
+            except Exception as e:
+                selection = None
+                errors.append(f"{call['name']} 條件計算失敗: {e}")
+
+            if selection is None:
+                # 無法決定：保留整個函數，繼續檢查參數內的巢狀分支函數
+                search_pos = call['open'] + 1
+                continue
+
+            live_indices, selector, dormant = selection
+            kept = [argument if i in live_indices else '' for i, argument in enumerate(arguments)]
+            while len(kept) > MIN_ARGUMENTS[call['name']] and kept[-1] == '':
+                kept.pop()
+            replacement = live_formula[call['start']:call['open'] + 1] + ','.join(kept) + ')'
+
+            decisions.append({
+                'function': call['name'],
+                'original_function': live_formula[call['start']:call['end']],
+                'live_function': replacement,
+                'selector': selector
+            })
+            for index, label in dormant:
+                if arguments[index].strip():
+                    dormant_branches.append({
+                        'function': call['name'],
+                        'label': label,
+                        'formula': '=' + arguments[index].strip(),
+                        'selector': selector
+                    })
+
+            live_formula = live_formula[:call['start']] + replacement + live_formula[call['end']:]
+            # 現行分支內可能還有巢狀的分支函數
+            search_pos = call['open'] + 1
+
+        if decisions:
+            self.progress_callback.update_progress(
+                f"[BRANCH] 保留現行分支，剪除 {len(dormant_branches)} 個休眠分支: {live_formula}"
+            )
+
+        return {
+            'success': len(decisions) > 0,
+            'live_formula': live_formula,
+            'dormant_branches': dormant_branches,
+            'decisions': decisions,
+            'original_formula': formula,
+            'errors': errors
+        }
+
+    # ---- branch selection ----
+
+    def _select_branch(self, name, arguments, evaluator, workbook_path, sheet_name, cell_address):
+        """
+        Returns:
+            (現行參數索引 set, 選擇值說明, [(休眠參數索引, 標籤)])；無法決定時返回 None
+        """
+        def evaluate(index):
+            if not arguments[index].strip():
+                return None
+            return evaluator.evaluate(arguments[index], workbook_path, sheet_name, cell_address)
+
+        if name == 'IF':
+            if len(arguments) < 2:
+                return None
+            condition = to_bool(evaluate(0))
+            if isinstance(condition, ExcelError):
+                return None
+            if condition:
+                return {0, 1}, 'TRUE', [(2, 'IF value_if_false')] if len(arguments) > 2 else []
+            return {0, 2}, 'FALSE', [(1, 'IF value_if_true')]
+
+        if name == 'CHOOSE':
+            index = to_number(evaluate(0))
+            if isinstance(index, ExcelError) or not 1 <= int(index) < len(arguments):
+                return None
+            chosen = int(index)
+            dormant = [(i, f'CHOOSE 選項 {i}') for i in range(1, len(arguments)) if i != chosen]
+            return {0, chosen}, str(chosen), dormant
+
+        if name == 'IFS':
+            pairs = len(arguments) // 2
+            for pair in range(pairs):
+                condition = to_bool(evaluate(pair * 2))
+                if isinstance(condition, ExcelError):
+                    return None
+                if condition:
+                    live = {i * 2 for i in range(pair + 1)} | {pair * 2 + 1}
+                    dormant = [(i * 2 + 1, f'IFS 條件 {i + 1}') for i in range(pairs) if i != pair]
+                    return live, f'條件 {pair + 1}', dormant
+            return None
+
+        if name == 'SWITCH':
+            if len(arguments) < 3:
+                return None
+            expression = evaluate(0)
+            if isinstance(expression, ExcelError):
+                return None
+            pairs = (len(arguments) - 1) // 2
+            default_index = len(arguments) - 1 if (len(arguments) - 1) % 2 else None
+            results = [(i * 2 + 2, f'SWITCH 結果 {i + 1}') for i in range(pairs)]
+            if default_index is not None:
+                results.append((default_index, 'SWITCH 預設值'))
+            for pair in range(pairs):
+                candidate = evaluate(pair * 2 + 1)
+                if isinstance(candidate, ExcelError):
+                    return None
+                if compare_values(expression, candidate) == 0:
+                    chosen = pair * 2 + 2
+                    live = {0, chosen} | {i * 2 + 1 for i in range(pair + 1)}
+                    return live, f'結果 {pair + 1}', [item for item in results if item[0] != chosen]
+            if default_index is None:
+                return None
+            live = {0, default_index} | {i * 2 + 1 for i in range(pairs)}
+            return live, '預設值', [item for item in results if item[0] != default_index]
+
+        return None
+
+    # ---- formula scanning ----
+
+    def _find_next_call(self, formula, start_pos):
+        """找出 start_pos 之後第一個（引號外的）分支函數及其參數範圍"""
+        in_string = False
+        in_sheet = False
+        pos = start_pos
+        # 從開頭判斷引號狀態，start_pos 可能位於函數參數內
+        for ch in formula[:start_pos]:
+            if ch == '"' and not in_sheet:
+                in_string = not in_string
+            elif ch == "'" and not in_string:
+                in_sheet = not in_sheet
+
+        while pos < len(formula):
+            ch = formula[pos]
+            if ch == '"' and not in_sheet:
+                in_string = not in_string
+            elif ch == "'" and not in_string:
+                in_sheet = not in_sheet
+            elif not in_string and not in_sheet and (ch.isalpha() or ch == '_'):
+                match = BRANCH_FUNCTION_PATTERN.match(formula, pos)
+                if match:
+                    arguments, end = self._split_arguments(formula, match.end())
+                    if arguments is not None:
+                        return {
+                            'name': match.group(1).upper(),
+                            'start': pos,
+                            'open': match.end() - 1,
+                            'end': end,
+                            'arguments': arguments
+                        }
+            pos += 1
+        return None
+
+    def _split_arguments(self, formula, content_start):
+        """切分頂層參數，返回 ([(start, end)], 右括號之後的位置)；括號不成對時返回 (None, None)"""
+        arguments = []
+        depth = 0
+        in_string = False
+        in_sheet = False
+        arg_start = content_start
+        pos = content_start
+        while pos < len(formula):
+            ch = formula[pos]
+            if ch == '"' and not in_sheet:
+                in_string = not in_string
+            elif ch == "'" and not in_string:
+                in_sheet = not in_sheet
+            elif not in_string and not in_sheet:
+                if ch in '({':
+                    depth += 1
+                elif ch in ')}':
+                    if depth == 0:
+                        arguments.append((arg_start, pos))
+                        return arguments, pos + 1
+                    depth -= 1
+                elif ch == ',' and depth == 0:
+                    arguments.append((arg_start, pos))
+                    arg_start = pos + 1
+            pos += 1
+        return None, None
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+Calculation Memo - calculate_safely 的結果記憶
+複製的公式與共用的前置儲存格常讓同一個 MATCH / INDIRECT 參數在一次爆炸分析中被計算很多次：
+- 鍵為 (命名空間, 檔案內容指紋, 工作表, 情境儲存格, 正規化運算式)
+- 只有位置相關的運算式（ROW()/COLUMN() 無參數、R1C1 相對引用）才把情境儲存格放進鍵，
+  其他運算式在同一工作表的所有儲存格之間共用
+- 易變函數（NOW/TODAY/RAND...）與外部檔案引用不記憶
+- 全域共用：所有解析器都經由 ExcelComManager 計算，因此共用同一份記憶
+"""
+
+import re
+import threading
+from collections import OrderedDict
+
+from utils.file_fingerprint import get_fingerprint_service
+
+# 無參數的 ROW()/COLUMN() 取決於公式所在的儲存格
+POSITION_DEPENDENT_PATTERN = re.compile(r'\b(?:ROW|COLUMN)\s*\(\s*\)', re.IGNORECASE)
+
+# R1C1 相對引用（INDIRECT("RC[-1]", FALSE) 等）
+RELATIVE_R1C1_PATTERN = re.compile(r'(?<![A-Z0-9_])R(?:\[-?\d+\])?C(?:\[-?\d+\])?(?![A-Z0-9_(])', re.IGNORECASE)
+
+# 每次計算結果都可能不同的函數
+VOLATILE_PATTERN = re.compile(r'\b(?:NOW|TODAY|RAND|RANDBETWEEN|RANDARRAY)\s*\(', re.IGNORECASE)
+
+# 兩側空白沒有意義的字元（單一空白在兩個引用之間是交集運算子，必須保留）
+_SPACE_INSENSITIVE = set('(),+-*/&=<>^:;!%{}')
+
+
+def normalize_expression(expression):
+    """
+    正規化運算式：引號外轉大寫、移除運算子兩側的空白、連續空白合併為一個
+    雙引號字串與單引號工作表名稱保持原樣
+    """
+    out = []
+    i = 0
+    n = len(expression)
+    pending_space = False
+    while i < n:
+        ch = expression[i]
+        if ch in '"\'':
+            end = i + 1
+            while end < n:
+                if expression[end] == ch:
+                    if end + 1 < n and expression[end + 1] == ch:
+                        end += 2
+                        continue
+                    break
+                end += 1
+            token = expression[i:end + 1]
+        elif ch.isspace():
+            pending_space = True
+            i += 1
+            continue
+        else:
+            end = i
+            token = ch.upper()
+        if pending_space and out and out[-1][-1] not in _SPACE_INSENSITIVE and token[0] not in _SPACE_INSENSITIVE:
+            out.append(' ')
+        pending_space = False
+        out.append(token)
+        i = end + 1
+    return ''.join(out)
+
+
+def is_position_dependent(expression):
+    """運算式的結果是否取決於公式所在的儲存格"""
+    return bool(POSITION_DEPENDENT_PATTERN.search(expression) or RELATIVE_R1C1_PATTERN.search(expression))
+
+
+class CalculationMemo:
+    """
+    執行緒安全的計算結果 LRU 記憶
+    """
+
+    def __init__(self, max_size=20000):
+        self.max_size = max_size
+        self.memo = OrderedDict()
+        self.lock = threading.RLock()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'stores': 0,
+            'evictions': 0,
+            'uncacheable': 0,
+            'position_dependent': 0
+        }
+
+    def make_key(self, expression, workbook_path, sheet_name, cell_address, namespace='value'):
+        """
+        建立記憶鍵；無法記憶時返回 None
+
+        Args:
+            expression: 要計算的運算式（不含開頭的 '='）
+            workbook_path: 公式所在的工作簿
+            sheet_name: 公式所在的工作表
+            cell_address: 公式所在的儲存格（位置相關的運算式才使用）
+            namespace: 結果格式不同的呼叫端（例如 INDIRECT 引擎）使用各自的命名空間
+        """
+        if not expression or '[' in expression or VOLATILE_PATTERN.search(expression):
+            with self.lock:
+                self._stats['uncacheable'] += 1
+            return None
+        fingerprint = get_fingerprint_service().fingerprint(workbook_path)
+        if fingerprint is None:
+            return None
+
+        cell_key = ''
+        if is_position_dependent(expression):
+            cell_key = (cell_address or '').replace('$', '').upper()
+            with self.lock:
+                self._stats['position_dependent'] += 1
+        return (namespace, fingerprint.content_id, (sheet_name or '').lower(), cell_key,
+                normalize_expression(expression.strip()))
+
+    def get(self, key):
+        """取得記憶的結果（返回副本）；沒有時返回 None"""
+        if key is None:
+            return None
+        with self.lock:
+            result = self.memo.get(key)
+            if result is None:
+                self._stats['misses'] += 1
+                return None
+            self.memo.move_to_end(key)
+            self._stats['hits'] += 1
+            return dict(result)
+
+    def put(self, key, result):
+        """記憶結果；只記憶確定性的結果（成功，或原生 / Excel 回報的計算錯誤）"""
+        if key is None or not self._is_deterministic(result):
+            return
+        with self.lock:
+            self.memo[key] = dict(result)
+            self.memo.move_to_end(key)
+            self._stats['stores'] += 1
+            while len(self.memo) > self.max_size:
+                self.memo.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def _is_deterministic(self, result):
+        if not isinstance(result, dict):
+            return False
+        if result.get('success') or result.get('engine') == 'native':
+            return True
+        # COM 失敗（Excel 無法啟動、工作表無法定位等）不記憶，只記憶公式本身的錯誤值
+        return str(result.get('error', '')).startswith('Excel計算錯誤')
+
+    def clear(self):
+        with self.lock:
+            self.memo.clear()
+
+    def get_stats(self):
+        with self.lock:
+            total_requests = self._stats['hits'] + self._stats['misses']
+            hit_rate = (self._stats['hits'] / total_requests * 100) if total_requests > 0 else 0
+            return {
+                'memo_size': len(self.memo),
+                'max_size': self.max_size,
+                'hit_rate_percent': round(hit_rate, 2),
+                'stats': self._stats.copy()
+            }
+
+
+# 全域實例
+_global_memo = None
+_memo_lock = threading.Lock()
+
+
+def get_calculation_memo():
+    """獲取全域計算結果記憶實例"""
+    global _global_memo
+
+    if _global_memo is None:
+        with _memo_lock:
+            if _global_memo is None:
+                _global_memo = CalculationMemo(max_size=20000)
+
+    return _global_memo
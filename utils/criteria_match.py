@@ -0,0 +1,424 @@
+# -*- coding: utf-8 -*-
+"""
+Criteria Match - 多條件 MATCH 的向量化計算
+報表中常見的 INDEX(C:C, MATCH(1, (A:A=x)*(B:B=y), 0)) 不必交給 Excel：
+- 條件欄只從共用的工作表值快取讀取一次，轉為 NumPy 陣列後快取
+- 全部是等號條件時建立「多欄組合鍵 -> 第一個位置」的索引，整欄同類公式每次查找 O(1)
+- 其他比較運算子 (<, >, <=, >=, <>) 以向量化遮罩計算，結果另外快取
+- SUMIFS/COUNTIFS 的條件（">=2025"、"East*" 等）以相同的條件欄計算，返回所有符合的位置
+- 沒有安裝 NumPy 時以純 Python 逐格比較（結果相同，只是較慢）
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+try:
+    import numpy as np
+except ImportError:  # NumPy 為選用依賴
+    np = None
+
+from utils.file_fingerprint import get_fingerprint_service
+from utils.sheet_value_cache import get_sheet_values
+from utils.lookup_index import lookup_key
+from utils.formula_evaluator import (
+    ExcelError, normalize_cell_value, compare_values, to_number, wildcard_to_regex, has_wildcards
+)
+
+# 比較結果 (-1/0/1) -> 運算子結果
+_OPERATOR_TESTS = {
+    '=': lambda cmp: cmp == 0,
+    '<>': lambda cmp: cmp != 0,
+    '<': lambda cmp: cmp < 0,
+    '>': lambda cmp: cmp > 0,
+    '<=': lambda cmp: cmp <= 0,
+    '>=': lambda cmp: cmp >= 0,
+}
+
+# 範圍在運算子右側時交換方向
+FLIPPED_OPERATORS = {'=': '=', '<>': '<>', '<': '>', '>': '<', '<=': '>=', '>=': '<='}
+
+# 儲存格型別（與 formula_evaluator 的比較順序一致：數字 < 文字 < 邏輯值）
+_BLANK, _NUMBER, _TEXT, _BOOL, _ERROR = 0, 1, 2, 3, -1
+
+
+def _is_blank_equivalent(value):
+    """空白儲存格在等號比較時等於 0、"" 與 FALSE"""
+    return value is None or value == '' or (not isinstance(value, str) and value == 0)
+
+
+def _value_kind(value):
+    if isinstance(value, bool):
+        return _BOOL
+    if isinstance(value, float):
+        return _NUMBER
+    return _TEXT
+
+
+def parse_criterion(criterion):
+    """
+    COUNTIF/SUMIFS 的條件參數 -> (運算子, 值)
+    "<>East" -> ('<>', 'East')；">=2025" -> ('>=', 2025.0)；空白儲存格視為 0
+    """
+    if criterion is None:
+        return '=', 0.0
+    if not isinstance(criterion, str):
+        return '=', criterion
+
+    operator, text = '=', criterion
+    for candidate in ('<=', '>=', '<>', '<', '>', '='):
+        if criterion.startswith(candidate):
+            operator, text = candidate, criterion[len(candidate):]
+            break
+    number = to_number(text) if text.strip() else None
+    if number is not None and not isinstance(number, ExcelError):
+        return operator, number
+    if text.upper() in ('TRUE', 'FALSE'):
+        return operator, text.upper() == 'TRUE'
+    return operator, text
+
+
+def to_runs(positions, base=0):
+    """已排序的位置 -> 連續區段 [(起, 迄)]（加上 base，例如範圍的起始列）"""
+    runs = []
+    for position in positions:
+        position += base
+        if runs and runs[-1][1] == position - 1:
+            runs[-1][1] = position
+        else:
+            runs.append([position, position])
+    return [tuple(run) for run in runs]
+
+
+class CriteriaColumn:
+    """一個條件欄（或列）的值，依型別拆成平行陣列"""
+
+    __slots__ = ('values', 'keys', 'kinds', 'numbers', 'texts', 'length')
+
+    def __init__(self, values):
+        self.values = values
+        self.length = len(values)
+        self.keys = [lookup_key(value) for value in values]
+        kinds = []
+        for value in values:
+            if value is None:
+                kinds.append(_BLANK)
+            elif isinstance(value, ExcelError):
+                kinds.append(_ERROR)
+            elif isinstance(value, bool):
+                kinds.append(_BOOL)
+            elif isinstance(value, float):
+                kinds.append(_NUMBER)
+            else:
+                kinds.append(_TEXT)
+        if np is not None:
+            self.kinds = np.array(kinds, dtype=np.int8)
+            self.numbers = np.array([value if kind == _NUMBER else (float(value) if kind == _BOOL else 0.0)
+                                     for value, kind in zip(values, kinds)], dtype=np.float64)
+            self.texts = np.array([value.lower() if kind == _TEXT else '' for value, kind in zip(values, kinds)],
+                                  dtype=object)
+        else:
+            self.kinds = kinds
+            self.numbers = None
+            self.texts = None
+
+    def compare(self, operator, value):
+        """
+        逐格計算 (儲存格 operator value)，返回布林遮罩
+        錯誤值儲存格永遠為 False（MATCH 會略過陣列中的錯誤）
+        """
+        if np is None or value is None:
+            test = _OPERATOR_TESTS[operator]
+            return [kind != _ERROR and test(compare_values(cell, value))
+                    for cell, kind in zip(self.values, self.kinds)]
+
+        if isinstance(value, bool):
+            value_kind, same = _BOOL, self.numbers - float(value)
+        elif isinstance(value, float):
+            value_kind, same = _NUMBER, self.numbers - value
+        else:
+            text = value.lower()
+            value_kind = _TEXT
+            same = (self.texts > text).astype(np.int8) - (self.texts < text).astype(np.int8)
+
+        kinds = self.kinds
+        # 空白儲存格視為與比較值同型別的空值（0 / "" / FALSE）
+        effective = np.where(kinds == _BLANK, value_kind, kinds)
+        cmp = np.where(effective == value_kind, np.sign(same),
+                       np.where(effective < value_kind, -1, 1)).astype(np.int8)
+        if value_kind == _NUMBER:
+            cmp = np.where(kinds == _BLANK, np.sign(0.0 - value), cmp).astype(np.int8)
+        elif value_kind == _TEXT:
+            cmp = np.where(kinds == _BLANK, 0 if text == '' else -1, cmp).astype(np.int8)
+        else:
+            cmp = np.where(kinds == _BLANK, -1 if value else 0, cmp).astype(np.int8)
+        return _OPERATOR_TESTS[operator](cmp) & (kinds != _ERROR)
+
+    def criteria_mask(self, operator, value):
+        """
+        COUNTIFS/SUMIFS 條件語意的遮罩（與一般比較不同）：
+        - 等號 / 不等號的文字條件支援萬用字元 (* ? ~)
+        - "" 只符合空白（與空字串）；其他等號條件不符合空白儲存格
+        - 大小比較只在相同型別之間成立（">5" 不符合文字）
+        """
+        if isinstance(value, str) and (value == '' or (operator in ('=', '<>') and has_wildcards(value))):
+            if value == '':
+                flags = [kind == _BLANK or (kind == _TEXT and cell == '') for cell, kind in zip(self.values, self.kinds)]
+            else:
+                pattern = wildcard_to_regex(value)
+                flags = [kind == _TEXT and bool(pattern.match(cell)) for cell, kind in zip(self.values, self.kinds)]
+            if operator == '<>':
+                flags = [not flag for flag in flags]
+            elif operator != '=':
+                return self.compare(operator, value)
+            return np.array(flags, dtype=bool) if np is not None else flags
+
+        base = self.compare(operator, value)
+        if operator == '<>':
+            return base
+        value_kind = _value_kind(value)
+        if np is not None:
+            return base & ((self.kinds != _BLANK) if operator == '=' else (self.kinds == value_kind))
+        if operator == '=':
+            return [flag and kind != _BLANK for flag, kind in zip(base, self.kinds)]
+        return [flag and kind == value_kind for flag, kind in zip(base, self.kinds)]
+
+
+class CriteriaMatchCache:
+    """
+    執行緒安全的條件欄 / 組合索引 / 結果 LRU 快取
+    條件欄鍵為 (檔案內容指紋, 工作表, 方向, 欄/列號, 起點, 終點)
+    """
+
+    def __init__(self, max_columns=64, max_results=4096):
+        self.max_columns = max_columns
+        self.max_results = max_results
+        self.columns = OrderedDict()
+        self.indexes = OrderedDict()
+        self.results = OrderedDict()
+        self.lock = threading.RLock()
+        self._stats = {
+            'column_hits': 0,
+            'column_misses': 0,
+            'index_builds': 0,
+            'index_lookups': 0,
+            'mask_evaluations': 0,
+            'result_hits': 0
+        }
+
+    def find_first(self, criteria, target=True):
+        """
+        找出第一個「所有條件的乘積 == target」的位置
+
+        Args:
+            criteria: list[(CellRange, operator, value)]，範圍必須同為單欄或同為單列
+            target: True 對應 MATCH(1, ...)，False 對應 MATCH(0, ...)
+
+        Returns:
+            0-based 位置；找不到時返回 None
+        """
+        column_keys = []
+        columns = []
+        for cell_range, operator, value in criteria:
+            key, column = self.get_column(cell_range)
+            column_keys.append(key)
+            columns.append(column)
+
+        if target and all(operator == '=' and not _is_blank_equivalent(value) for _, operator, value in criteria):
+            return self._find_with_index(tuple(column_keys), columns, [value for _, _, value in criteria])
+
+        result_key = (tuple(column_keys), tuple((operator, lookup_key(value)) for _, operator, value in criteria), target)
+        with self.lock:
+            if result_key in self.results:
+                self.results.move_to_end(result_key)
+                self._stats['result_hits'] += 1
+                return self.results[result_key]
+            self._stats['mask_evaluations'] += 1
+
+        position = self._find_with_masks(columns, criteria, target)
+
+        with self.lock:
+            self.results[result_key] = position
+            while len(self.results) > self.max_results:
+                self.results.popitem(last=False)
+        return position
+
+    def find_all(self, criteria, excel_criteria=False):
+        """
+        找出所有「全部條件成立」的位置
+
+        Args:
+            criteria: list[(CellRange, operator, value)]，範圍必須同為單欄或同為單列
+            excel_criteria: True 使用 COUNTIFS/SUMIFS 的條件語意（萬用字元、空白規則），
+                            False 使用一般比較（SUMPRODUCT((A:A="x")*...)）
+
+        Returns:
+            tuple: 已排序的 0-based 位置
+        """
+        column_keys = []
+        columns = []
+        for cell_range, operator, value in criteria:
+            key, column = self.get_column(cell_range)
+            column_keys.append(key)
+            columns.append(column)
+
+        result_key = ('all', excel_criteria, tuple(column_keys),
+                      tuple((operator, lookup_key(value), isinstance(value, str) and value == '') for _, operator, value in criteria))
+        with self.lock:
+            if result_key in self.results:
+                self.results.move_to_end(result_key)
+                self._stats['result_hits'] += 1
+                return self.results[result_key]
+            self._stats['mask_evaluations'] += 1
+
+        combined = self._combined_mask(columns, criteria, excel_criteria)
+        if np is not None:
+            positions = tuple(np.flatnonzero(combined).tolist()) if combined is not None else ()
+        else:
+            positions = tuple(i for i, flag in enumerate(combined or []) if flag)
+
+        with self.lock:
+            self.results[result_key] = positions
+            while len(self.results) > self.max_results:
+                self.results.popitem(last=False)
+        return positions
+
+    def get_column(self, cell_range):
+        """載入（或從快取取得）單欄 / 單列範圍的 CriteriaColumn"""
+        service = get_fingerprint_service()
+        normalized_path = os.path.normpath(os.path.abspath(cell_range.workbook_path))
+        fingerprint = service.fingerprint(normalized_path)
+        if fingerprint is None:
+            raise FileNotFoundError(f"File not found: {cell_range.workbook_path}")
+
+        if cell_range.columns == 1:
+            key = (fingerprint.content_id, cell_range.sheet_name.lower(), 'column',
+                   cell_range.min_col, cell_range.min_row, cell_range.max_row)
+        else:
+            key = (fingerprint.content_id, cell_range.sheet_name.lower(), 'row',
+                   cell_range.min_row, cell_range.min_col, cell_range.max_col)
+
+        with self.lock:
+            column = self.columns.get(key)
+            if column is not None:
+                self.columns.move_to_end(key)
+                self._stats['column_hits'] += 1
+                return key, column
+
+            self._stats['column_misses'] += 1
+            sheet = get_sheet_values(normalized_path, cell_range.sheet_name)
+            if sheet is None:
+                values = []
+            elif key[2] == 'column':
+                values = sheet.column(cell_range.min_col, cell_range.min_row, cell_range.max_row)
+            else:
+                values = sheet.row(cell_range.min_row, cell_range.min_col, cell_range.max_col)
+            column = CriteriaColumn([normalize_cell_value(value) for value in values])
+
+            self.columns[key] = column
+            while len(self.columns) > self.max_columns:
+                evicted_key, _ = self.columns.popitem(last=False)
+                for index_key in [k for k in self.indexes if evicted_key in k]:
+                    del self.indexes[index_key]
+            return key, column
+
+    def _find_with_index(self, column_keys, columns, values):
+        """全部為等號條件：組合鍵索引，每個條件組合只建立一次"""
+        with self.lock:
+            index = self.indexes.get(column_keys)
+            if index is None:
+                self._stats['index_builds'] += 1
+                index = {}
+                for position, keys in enumerate(zip(*[column.keys for column in columns])):
+                    if None in keys:
+                        continue
+                    index.setdefault(keys, position)
+                self.indexes[column_keys] = index
+                while len(self.indexes) > self.max_columns:
+                    self.indexes.popitem(last=False)
+            else:
+                self.indexes.move_to_end(column_keys)
+            self._stats['index_lookups'] += 1
+        lookup = tuple(lookup_key(value) for value in values)
+        return None if None in lookup else index.get(lookup)
+
+    def _find_with_masks(self, columns, criteria, target):
+        """一般比較運算子：各條件的布林遮罩相乘後找第一個符合的位置"""
+        combined = self._combined_mask(columns, criteria, False)
+        if combined is None:
+            return None
+
+        if np is not None:
+            hits = np.flatnonzero(combined if target else ~combined)
+            return int(hits[0]) if len(hits) else None
+
+        for i, flag in enumerate(combined):
+            if flag == target:
+                return i
+        return None
+
+    def _combined_mask(self, columns, criteria, excel_criteria):
+        """各條件遮罩相乘；範圍長度為 0 時返回 None"""
+        length = max((column.length for column in columns), default=0)
+        if length == 0:
+            return None
+
+        def mask_of(column, operator, value):
+            if excel_criteria:
+                return column.criteria_mask(operator, value)
+            return column.compare(operator, value)
+
+        if np is not None:
+            combined = np.ones(length, dtype=bool)
+            for column, (_, operator, value) in zip(columns, criteria):
+                mask = np.asarray(mask_of(column, operator, value), dtype=bool)
+                if len(mask) < length:
+                    # 較短的範圍（裁切到資料範圍）其餘為空白
+                    tail = mask_of(CriteriaColumn([None]), operator, value)[0]
+                    mask = np.concatenate([mask, np.full(length - len(mask), bool(tail))])
+                combined &= mask
+            return combined
+
+        combined = [True] * length
+        for column, (_, operator, value) in zip(columns, criteria):
+            mask = mask_of(column, operator, value)
+            tail = mask_of(CriteriaColumn([None]), operator, value)[0]
+            for i in range(length):
+                combined[i] = combined[i] and (mask[i] if i < len(mask) else tail)
+        return combined
+
+    def clear(self):
+        with self.lock:
+            self.columns.clear()
+            self.indexes.clear()
+            self.results.clear()
+
+    def get_stats(self):
+        with self.lock:
+            total_requests = self._stats['column_hits'] + self._stats['column_misses']
+            hit_rate = (self._stats['column_hits'] / total_requests * 100) if total_requests > 0 else 0
+            return {
+                'column_cache_size': len(self.columns),
+                'index_count': len(self.indexes),
+                'result_cache_size': len(self.results),
+                'column_hit_rate_percent': round(hit_rate, 2),
+                'numpy': np is not None,
+                'stats': self._stats.copy()
+            }
+
+
+# 全域實例
+_global_criteria_cache = None
+_criteria_cache_lock = threading.Lock()
+
+
+def get_criteria_match_cache():
+    """獲取全域多條件 MATCH 快取實例"""
+    global _global_criteria_cache
+
+    if _global_criteria_cache is None:
+        with _criteria_cache_lock:
+            if _global_criteria_cache is None:
+                _global_criteria_cache = CriteriaMatchCache(max_columns=64, max_results=4096)
+
+    return _global_criteria_cache
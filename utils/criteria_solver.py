@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""
+Criteria Solver - SUMIFS / COUNTIFS / SUMPRODUCT 的條件化前置儲存格
+設計與 OffsetSolver/XLookupSolver 一致：
+- 條件欄經由共用的多條件快取 (utils.criteria_match) 以陣列載入，條件以向量化計算
+- 返回真正參與計算的列（壓縮為連續區段），而不是整個範圍的摘要
+- 公式本身不改寫；爆炸分析器把結果建立為可按需展開的收合節點
+"""
+
+import re
+
+from utils.formula_evaluator import (
+    UnsupportedExpression, ExcelError, CellRange, EvaluationContext, parse_expression, col_num_to_letters
+)
+from utils.criteria_match import get_criteria_match_cache, parse_criterion, to_runs, FLIPPED_OPERATORS
+
+# 條件彙總函數；前一個字元不能是名稱的一部分
+CRITERIA_FUNCTION_PATTERN = re.compile(
+    r'(?<![A-Za-z0-9_.])(?:_xlfn\.)?(SUMIFS|COUNTIFS|AVERAGEIFS|MAXIFS|MINIFS|SUMIF|COUNTIF|AVERAGEIF|SUMPRODUCT)\s*\(',
+    re.IGNORECASE
+)
+
+# 函數 -> (值範圍參數索引, 第一個條件範圍參數索引)
+_IFS_LAYOUT = {
+    'SUMIFS': (0, 1),
+    'AVERAGEIFS': (0, 1),
+    'MAXIFS': (0, 1),
+    'MINIFS': (0, 1),
+    'COUNTIFS': (None, 0),
+}
+
+_COMPARISON_OPERATORS = ('=', '<>', '<', '>', '<=', '>=')
+
+
+class CriteriaSolver:
+    """條件彙總函數的參與列解析器"""
+
+    def __init__(self, excel_manager, progress_callback, main_analyzer=None):
+        self.excel_manager = excel_manager
+        self.progress_callback = progress_callback
+        self.main_analyzer = main_analyzer
+
+    def resolve_criteria(self, formula, workbook_path, sheet_name, cell_address):
+        """
+        找出公式中每個條件彙總函數實際參與計算的列
+
+        Returns dict:
+            {
+                'success': bool,
+                'criteria_details': list[dict],  # 每個函數：條件、值範圍、參與列區段
+                'original_formula': str,
+                'errors': list[str]
+            }
+        """
+        items = self._extract_all_criteria_functions(formula or '')
+        if not items:
+            return {'success': False, 'error': 'No criteria functions found', 'original_formula': formula}
+
+        self.progress_callback.update_progress(f"[CRITERIA] 開始分析條件: {formula}")
+        context = EvaluationContext(workbook_path, sheet_name, cell_address)
+        criteria_details = []
+        errors = []
+
+        for info in items:
+            try:
+                detail = self._analyze_function(info, context)
+                criteria_details.append(detail)
+                self.progress_callback.update_progress(
+                    f"[CRITERIA] {info['name']} 符合 {detail['match_count']}/{detail['total_count']} 列: {detail['row_set']}"
+                )
+            except UnsupportedExpression as e:
+                errors.append(f"{info['name']} 無法以原生方式分析: {e}")
+            except Exception as e:
+                errors.append(f"{info['name']} 條件分析失敗: {e}")
+
+        return {
+            'success': len(criteria_details) > 0,
+            'criteria_details': criteria_details,
+            'original_formula': formula,
+            'errors': errors
+        }
+
+    # ---- analysis ----
+
+    def _analyze_function(self, info, context):
+        evaluator = self.excel_manager.native_evaluator
+        node = parse_expression(info['full_function'])
+        if node[0] != 'func':
+            raise UnsupportedExpression("不是函數呼叫")
+        name = info['name']
+        arg_nodes = node[2]
+
+        if name == 'SUMPRODUCT':
+            criteria, value_ranges = self._sumproduct_parts(arg_nodes, context, evaluator)
+            excel_criteria = False
+        else:
+            criteria, value_ranges = self._ifs_parts(name, arg_nodes, context, evaluator)
+            excel_criteria = True
+
+        ranges = [cell_range for cell_range, _, _ in criteria] + value_ranges
+        shape = (ranges[0].rows, ranges[0].columns)
+        if any((cell_range.rows, cell_range.columns) != shape for cell_range in ranges):
+            raise UnsupportedExpression("條件範圍與值範圍的大小不一致")
+        if shape[1] != 1 and shape[0] != 1:
+            raise UnsupportedExpression("條件範圍必須是單欄或單列")
+        orientation = 'column' if shape[1] == 1 else 'row'
+        for cell_range in ranges:
+            if evaluator.sheet_values(cell_range) is None:
+                raise UnsupportedExpression(f"無法讀取工作表: {cell_range.sheet_name}")
+
+        cache = get_criteria_match_cache()
+        positions = cache.find_all(criteria, excel_criteria=excel_criteria)
+        total_count = max(cache.get_column(cell_range)[1].length for cell_range, _, _ in criteria)
+
+        # 展開時使用的範圍：有值範圍時為值範圍，COUNTIFS 則為條件範圍
+        expand_ranges = value_ranges or [cell_range for cell_range, _, _ in criteria]
+        first = expand_ranges[0]
+        base = first.min_row if orientation == 'column' else first.min_col
+        return {
+            'function': name,
+            'full_function': info['full_function'],
+            'orientation': orientation,
+            'criteria': [
+                {'range': cell_range.reference_text(context.workbook_path, context.sheet_name),
+                 'operator': operator, 'value': value}
+                for cell_range, operator, value in criteria
+            ],
+            'value_ranges': [r.reference_text(context.workbook_path, context.sheet_name) for r in value_ranges],
+            'expand_ranges': [
+                {'workbook_path': r.workbook_path, 'sheet_name': r.sheet_name,
+                 'min_row': r.min_row, 'min_col': r.min_col, 'max_row': r.max_row, 'max_col': r.max_col}
+                for r in expand_ranges
+            ],
+            'position_runs': to_runs(positions),
+            'row_runs': to_runs(positions, base),
+            'row_set': format_runs(to_runs(positions, base), orientation),
+            'match_count': len(positions),
+            'total_count': total_count
+        }
+
+    def _ifs_parts(self, name, arg_nodes, context, evaluator):
+        """SUMIFS/COUNTIFS/...IFS 與 SUMIF/COUNTIF/AVERAGEIF 的 (條件, 值範圍)"""
+        if name in _IFS_LAYOUT:
+            value_index, first_pair = _IFS_LAYOUT[name]
+            pairs = [(i, i + 1) for i in range(first_pair, len(arg_nodes) - 1, 2)]
+        else:
+            pairs = [(0, 1)]
+            if name == 'COUNTIF':
+                value_index = None
+            elif len(arg_nodes) > 2 and arg_nodes[2][0] != 'missing':
+                value_index = 2
+            else:
+                value_index = 0  # SUMIF(range, criteria)：加總條件範圍本身
+        if not pairs or len(arg_nodes) < pairs[-1][1] + 1:
+            raise UnsupportedExpression(f"{name} 參數不足")
+
+        criteria = []
+        for range_index, criterion_index in pairs:
+            cell_range = self._range_arg(arg_nodes[range_index], context, evaluator)
+            criterion = evaluator.to_scalar(evaluator.evaluate_node(arg_nodes[criterion_index], context))
+            if isinstance(criterion, ExcelError):
+                raise UnsupportedExpression(f"條件為錯誤值: {criterion}")
+            operator, value = parse_criterion(criterion)
+            criteria.append((cell_range, operator, value))
+
+        value_ranges = []
+        if value_index is not None:
+            value_range = self._range_arg(arg_nodes[value_index], context, evaluator)
+            if name in ('SUMIF', 'AVERAGEIF') and value_index == 2:
+                # sum_range 只看左上角，大小與條件範圍相同
+                first = criteria[0][0]
+                value_range = CellRange(value_range.workbook_path, value_range.sheet_name,
+                                        value_range.min_row, value_range.min_col,
+                                        value_range.min_row + first.rows - 1, value_range.min_col + first.columns - 1)
+            value_ranges.append(value_range)
+        return criteria, value_ranges
+
+    def _sumproduct_parts(self, arg_nodes, context, evaluator):
+        """SUMPRODUCT((A:A="x")*(B:B>1)*C:C) / SUMPRODUCT(--(A:A="x"), C:C) 的 (條件, 值範圍)"""
+        criteria = []
+        value_ranges = []
+        for arg_node in arg_nodes:
+            for factor in self._product_factors(arg_node):
+                if factor[0] == 'value':
+                    continue
+                if factor[0] == 'binop' and factor[1] in _COMPARISON_OPERATORS:
+                    operator = factor[1]
+                    left = evaluator.evaluate_node(factor[2], context)
+                    right = evaluator.evaluate_node(factor[3], context)
+                    left_is_range = isinstance(left, CellRange) and not left.is_cell
+                    right_is_range = isinstance(right, CellRange) and not right.is_cell
+                    if left_is_range == right_is_range:
+                        raise UnsupportedExpression("每個條件必須是一個範圍與一個值的比較")
+                    if right_is_range:
+                        left, right, operator = right, left, FLIPPED_OPERATORS[operator]
+                    value = evaluator.to_scalar(right)
+                    if isinstance(value, ExcelError):
+                        raise UnsupportedExpression(f"條件為錯誤值: {value}")
+                    criteria.append((left, operator, value))
+                    continue
+                value_ranges.append(self._range_arg(factor, context, evaluator))
+        if not criteria:
+            raise UnsupportedExpression("SUMPRODUCT 沒有條件")
+        return criteria, value_ranges
+
+    def _product_factors(self, node):
+        """把 a*b*--(c) 拆成因子列表"""
+        while node[0] == 'neg' and node[1][0] == 'neg':
+            node = node[1][1]
+        if node[0] == 'binop' and node[1] == '*':
+            return self._product_factors(node[2]) + self._product_factors(node[3])
+        return [node]
+
+    def _range_arg(self, node, context, evaluator):
+        value = evaluator.evaluate_node(node, context)
+        if not isinstance(value, CellRange):
+            raise UnsupportedExpression("參數必須是儲存格範圍")
+        return value
+
+    # ---- formula scanning ----
+
+    def _extract_all_criteria_functions(self, formula):
+        """提取所有條件彙總函數片段（含 _xlfn. 前綴），返回 list[{name, full_function}]"""
+        items = []
+        in_string = False
+        pos = 0
+        while pos < len(formula):
+            ch = formula[pos]
+            if ch == '"':
+                in_string = not in_string
+            elif not in_string:
+                match = CRITERIA_FUNCTION_PATTERN.match(formula, pos)
+                if match:
+                    end = self._find_closing_bracket(formula, match.end())
+                    if end is not None:
+                        items.append({'name': match.group(1).upper(), 'full_function': formula[pos:end]})
+                        pos = end
+                        continue
+            pos += 1
+        return items
+
+    def _find_closing_bracket(self, formula, content_start):
+        depth = 1
+        in_string = False
+        for pos in range(content_start, len(formula)):
+            ch = formula[pos]
+            if ch == '"':
+                in_string = not in_string
+            elif not in_string:
+                if ch == '(':
+                    depth += 1
+                elif ch == ')':
+                    depth -= 1
+                    if depth == 0:
+                        return pos + 1
+        return None
+
+
+def format_runs(runs, orientation='column', max_runs=12):
+    """連續區段 -> 精簡文字，例如 "rows 2:5, 9, 12:40"（欄方向以欄字母顯示）"""
+    def label(number):
+        return str(number) if orientation == 'column' else col_num_to_letters(number)
+
+    parts = [label(start) if start == end else f"{label(start)}:{label(end)}" for start, end in runs[:max_runs]]
+    if len(runs) > max_runs:
+        parts.append(f"... (+{len(runs) - max_runs})")
+    prefix = 'rows' if orientation == 'column' else 'columns'
+    return f"{prefix} {', '.join(parts)}" if parts else f"{prefix} (none)"
@@ -8,8 +8,12 @@ Last Updated: 2025-01-16
 
 import re
 import os
-import win32com.client
-import pythoncom
+try:
+    import win32com.client
+    import pythoncom
+except ImportError:  # 非 Windows 環境：只能使用原生計算器
+    win32com = None
+    pythoncom = None
 import time
 import psutil
 import datetime
@@ -19,15 +23,46 @@ import hashlib
 import uuid
 import tempfile
 import shutil
+import threading
+from collections import OrderedDict
+
+from utils.formula_evaluator import get_native_evaluator, UnsupportedExpression, col_num_to_letters
+from utils.sheet_value_cache import EXCEL_MAX_COLUMNS
+from utils.calculation_memo import get_calculation_memo, is_position_dependent
 
 class ExcelComManager:
     """超安全版Excel COM管理器 - 完全避免檔案鎖定問題"""
     
-    def __init__(self, progress_callback=None):
+    def __init__(self, progress_callback=None, dispatch_factory=None, max_pool_size=2, idle_timeout=120):
+        """
+        Args:
+            progress_callback: 進度回報物件
+            dispatch_factory: 可選，建立 Excel.Application 的函數（預設為 DispatchEx，測試時可換成假 COM）
+            max_pool_size: 同時保留的暖實例數量上限（每個工作簿一個）
+            idle_timeout: 暖實例閒置多少秒後關閉
+        """
         # 記錄創建的 Excel 實例和 PID
         self.our_excel_instances = {}
         self.excel_process_pids = set()  # 記錄我們創建的 Excel 程序 PID
         self.progress_callback = progress_callback
+        self.native_evaluator = get_native_evaluator()
+        self.calculation_stats = {'native': 0, 'com': 0, 'com_batches': 0, 'com_batched_expressions': 0}
+        self.prefetched_results = {}  # 目前節點批次預先計算的結果
+        self.calculation_memo = get_calculation_memo()  # 所有解析器共用的計算結果記憶
+        
+        # 暖實例池：正規化的工作簿路徑 -> instance_key（LRU 順序）
+        self.dispatch_factory = dispatch_factory
+        self.max_pool_size = max_pool_size
+        self.idle_timeout = idle_timeout
+        self.instance_pool = OrderedDict()
+        self.pool_lock = threading.RLock()
+        self.pool_stats = {
+            'created': 0,
+            'reused': 0,
+            'evicted': 0,
+            'expired': 0,
+            'discarded': 0
+        }
         
         # 初始化 COM
         try:
@@ -79,7 +114,9 @@ class ExcelComManager:
         if self.progress_callback:
             self.progress_callback.update_progress("[ULTRA-SAFE] 開始超安全清理...")
         
-        # 第一階段：正常清理 COM 物件
+        # 第一階段：正常清理 COM 物件（包含暖實例池）
+        with self.pool_lock:
+            self.instance_pool.clear()
         instance_keys = list(self.our_excel_instances.keys())
         for instance_key in instance_keys:
             try:
@@ -259,7 +296,7 @@ class ExcelComManager:
             temp_path = workbook_path
             
             # 使用 DispatchEx 創建完全獨立的實例
-            excel_app = win32com.client.DispatchEx("Excel.Application")
+            excel_app = self._create_excel_application()
             
             # 記錄新創建的 Excel 程序
             time.sleep(0.5)  # 給程序啟動一點時間
@@ -327,6 +364,8 @@ class ExcelComManager:
                 'instance_id': instance_key,
                 'workbook_name': wb.Name,
                 'created_time': time.time(),
+                'last_used_time': time.time(),
+                'use_count': 0,
                 'file_path': workbook_path,
                 'process_pids': new_pids.copy(),
                 'temp_dir': temp_dir,
@@ -369,6 +408,110 @@ class ExcelComManager:
             
             raise e
     
+    def _create_excel_application(self):
+        """創建新的 Excel.Application（可注入 dispatch_factory 以便用假 COM 測試）"""
+        if self.dispatch_factory is not None:
+            return self.dispatch_factory()
+        if win32com is None:
+            raise RuntimeError('目前環境沒有 pywin32，無法啟動 Excel')
+        return win32com.client.DispatchEx("Excel.Application")
+    
+    def _pool_key(self, workbook_path):
+        return os.path.normcase(os.path.normpath(os.path.abspath(workbook_path)))
+    
+    def _is_instance_alive(self, instance_info):
+        """檢查暖實例是否仍可使用（Excel 被關閉或當機時 COM 呼叫會失敗）"""
+        try:
+            instance_info['workbook'].Name
+            instance_info['app'].Workbooks.Count
+            return True
+        except Exception:
+            return False
+    
+    def acquire_instance(self, workbook_path):
+        """
+        取得工作簿的暖實例 - 同一個工作簿在整個爆炸分析期間只啟動一次 Excel
+        池已滿時關閉最久未使用的實例；閒置超過 idle_timeout 的實例會先被關閉
+        """
+        pool_key = self._pool_key(workbook_path)
+        
+        with self.pool_lock:
+            self._expire_idle_instances()
+            
+            instance_key = self.instance_pool.get(pool_key)
+            if instance_key is not None:
+                instance_info = self.our_excel_instances.get(instance_key)
+                if instance_info is not None and self._is_instance_alive(instance_info):
+                    self.instance_pool.move_to_end(pool_key)
+                    instance_info['last_used_time'] = time.time()
+                    instance_info['use_count'] += 1
+                    self.pool_stats['reused'] += 1
+                    if self.progress_callback:
+                        self.progress_callback.update_progress(f"[EXCEL-POOL] 重用暖實例: {os.path.basename(workbook_path)}")
+                    return instance_info
+                # 實例已失效：丟棄後重新建立
+                self.instance_pool.pop(pool_key, None)
+                self.pool_stats['discarded'] += 1
+                if instance_info is not None:
+                    self.close_specific_instance(instance_key)
+            
+            # 先騰出空間，避免同時存在超過上限的 Excel 程序
+            while len(self.instance_pool) >= max(self.max_pool_size, 1):
+                _, oldest_key = self.instance_pool.popitem(last=False)
+                self.pool_stats['evicted'] += 1
+                self.close_specific_instance(oldest_key)
+            
+            instance_info = self.open_workbook_for_calculation(workbook_path)
+            instance_info['use_count'] += 1
+            self.instance_pool[pool_key] = instance_info['instance_id']
+            self.pool_stats['created'] += 1
+            return instance_info
+    
+    def release_instance(self, instance_info, discard=False):
+        """
+        歸還暖實例；discard=True 時（例如計算中 COM 失敗）直接關閉，下次重新建立
+        """
+        if not instance_info:
+            return
+        with self.pool_lock:
+            instance_info['last_used_time'] = time.time()
+            if not discard:
+                return
+            pool_key = self._pool_key(instance_info['file_path'])
+            if self.instance_pool.get(pool_key) == instance_info['instance_id']:
+                del self.instance_pool[pool_key]
+            self.pool_stats['discarded'] += 1
+            self.close_specific_instance(instance_info['instance_id'])
+    
+    def _expire_idle_instances(self):
+        """關閉閒置超過 idle_timeout 的暖實例"""
+        if self.idle_timeout is None:
+            return
+        now = time.time()
+        with self.pool_lock:
+            for pool_key, instance_key in list(self.instance_pool.items()):
+                instance_info = self.our_excel_instances.get(instance_key)
+                if instance_info is None:
+                    del self.instance_pool[pool_key]
+                    continue
+                if now - instance_info.get('last_used_time', 0) > self.idle_timeout:
+                    del self.instance_pool[pool_key]
+                    self.pool_stats['expired'] += 1
+                    if self.progress_callback:
+                        self.progress_callback.update_progress(f"[EXCEL-POOL] 關閉閒置實例: {os.path.basename(instance_info['file_path'])}")
+                    self.close_specific_instance(instance_key)
+    
+    def get_pool_stats(self):
+        """暖實例池統計"""
+        with self.pool_lock:
+            return {
+                'pool_size': len(self.instance_pool),
+                'max_pool_size': self.max_pool_size,
+                'idle_timeout': self.idle_timeout,
+                'tracked_pids': len(self.excel_process_pids),
+                'stats': self.pool_stats.copy()
+            }
+    
     def close_specific_instance(self, instance_key):
         """關閉特定實例 - 超安全版本"""
         if instance_key not in self.our_excel_instances:
@@ -391,8 +534,252 @@ class ExcelComManager:
                 self.progress_callback.update_progress(f"[ULTRA-SAFE] 關閉實例失敗: {e}")
     
     def calculate_safely(self, indirect_content, workbook_path, sheet_name, cell_address):
-        """安全計算 INDIRECT - 使用完全隔離的實例"""
+        """
+        安全計算運算式 - 先用原生計算器（快取的儲存格值），
+        不支援的運算式才開啟完全隔離的 Excel 實例
+        """
+        prefetched = self.prefetched_results.get(
+            self._prefetch_key(indirect_content, workbook_path, sheet_name, cell_address)
+        )
+        if prefetched is not None:
+            return prefetched
+        
+        memo_key = self.calculation_memo.make_key(indirect_content, workbook_path, sheet_name, cell_address)
+        cached = self.calculation_memo.get(memo_key)
+        if cached is not None:
+            if self.progress_callback:
+                self.progress_callback.update_progress(f"[CALC-MEMO] 使用記憶結果: {indirect_content}")
+            return cached
+        
+        result = self._calculate_uncached(indirect_content, workbook_path, sheet_name, cell_address)
+        self.calculation_memo.put(memo_key, result)
+        return result
+    
+    def _calculate_uncached(self, indirect_content, workbook_path, sheet_name, cell_address):
+        """原生計算，不支援時改用 Excel COM"""
+        if os.path.exists(workbook_path):
+            try:
+                result = self.native_evaluator.calculate(indirect_content, workbook_path, sheet_name, cell_address)
+                self.calculation_stats['native'] += 1
+                if self.progress_callback:
+                    if result['success']:
+                        self.progress_callback.update_progress(f"[NATIVE-CALC] ✓ 計算成功: '{result['static_reference']}'")
+                    else:
+                        self.progress_callback.update_progress(f"[NATIVE-CALC] {result['error']}")
+                return result
+            except UnsupportedExpression as e:
+                if self.progress_callback:
+                    self.progress_callback.update_progress(f"[NATIVE-CALC] 改用 Excel 計算: {e}")
+            except Exception as e:
+                if self.progress_callback:
+                    self.progress_callback.update_progress(f"[NATIVE-CALC] 原生計算異常，改用 Excel 計算: {e}")
+
+        return self._calculate_with_com(indirect_content, workbook_path, sheet_name, cell_address)
+
+    def calculate_batch(self, expressions, workbook_path, sheet_name, cell_address):
+        """
+        批次計算同一工作簿、同一工作表情境下的多個運算式
+        原生計算器先處理；其餘運算式一次寫入暫存範圍、重算一次、一次讀回（一次 COM 往返）
+        
+        Returns:
+            list[dict]: 順序與 expressions 相同，格式同 calculate_safely
+        """
+        results = [None] * len(expressions)
+        memo_keys = [self.calculation_memo.make_key(e, workbook_path, sheet_name, cell_address) for e in expressions]
+        pending = OrderedDict()  # 運算式 -> 位置列表（相同運算式只計算一次）
+        
+        for i, expression in enumerate(expressions):
+            cached = self.calculation_memo.get(memo_keys[i])
+            if cached is not None:
+                results[i] = cached
+                continue
+            if os.path.exists(workbook_path):
+                try:
+                    results[i] = self.native_evaluator.calculate(expression, workbook_path, sheet_name, cell_address)
+                    self.calculation_stats['native'] += 1
+                    self.calculation_memo.put(memo_keys[i], results[i])
+                    continue
+                except UnsupportedExpression:
+                    pass
+                except Exception as e:
+                    if self.progress_callback:
+                        self.progress_callback.update_progress(f"[NATIVE-CALC] 原生計算異常，改用 Excel 計算: {e}")
+            pending.setdefault(expression.strip(), []).append(i)
+        
+        if not pending:
+            return results
+        
+        def store(positions, result):
+            for i in positions:
+                results[i] = result
+            self.calculation_memo.put(memo_keys[positions[0]], result)
+        
+        # ROW()/COLUMN()、R1C1 相對引用等位置相關的運算式必須在原儲存格計算
+        batchable = []
+        for expression, positions in pending.items():
+            if is_position_dependent(expression):
+                store(positions, self._calculate_with_com(expression, workbook_path, sheet_name, cell_address))
+            else:
+                batchable.append(expression)
+        
+        if len(batchable) == 1:
+            batch_results = [self._calculate_with_com(batchable[0], workbook_path, sheet_name, cell_address)]
+        elif batchable:
+            batch_results = self._calculate_batch_with_com(batchable, workbook_path, sheet_name)
+        else:
+            batch_results = []
+        
+        for expression, result in zip(batchable, batch_results):
+            store(pending[expression], result)
+        return results
+    
+    def prefetch_expressions(self, expressions, workbook_path, sheet_name, cell_address):
+        """
+        節點層級的運算式佇列：解析器先把同一節點需要的運算式一次送出批次計算，
+        之後的 calculate_safely 直接取用結果（每次呼叫會取代上一個節點的結果）
+        """
+        unique_expressions = list(OrderedDict.fromkeys(e.strip() for e in expressions if e and e.strip()))
+        self.prefetched_results = {}
+        if not unique_expressions:
+            return
+        results = self.calculate_batch(unique_expressions, workbook_path, sheet_name, cell_address)
+        for expression, result in zip(unique_expressions, results):
+            self.prefetched_results[self._prefetch_key(expression, workbook_path, sheet_name, cell_address)] = result
+    
+    def _prefetch_key(self, expression, workbook_path, sheet_name, cell_address):
+        return (self._pool_key(workbook_path), (sheet_name or '').lower(),
+                (cell_address or '').replace('$', '').upper(), (expression or '').strip())
+    
+    def _calculate_batch_with_com(self, expressions, workbook_path, sheet_name):
+        """
+        一次 COM 往返計算多個運算式：寫入已使用範圍右側的暫存欄（Range.Formula 陣列指派），
+        重算一次，以陣列讀回結果，最後還原暫存欄原本的內容
+        """
+        def fail_all(error):
+            return [{'success': False, 'error': error, 'indirect_content': e} for e in expressions]
+        
+        if win32com is None and self.dispatch_factory is None:
+            return fail_all('此運算式需要 Excel COM 計算，但目前環境沒有 pywin32')
+        if not os.path.exists(workbook_path):
+            return fail_all(f'文件不存在: {workbook_path}')
+        
+        self.calculation_stats['com'] += 1
+        self.calculation_stats['com_batches'] += 1
+        self.calculation_stats['com_batched_expressions'] += len(expressions)
+        
+        instance = None
+        instance_failed = False
+        try:
+            if self.progress_callback:
+                self.progress_callback.update_progress(f"[ULTRA-SAFE-CALC] 批次計算 {len(expressions)} 個運算式")
+            
+            instance = self.acquire_instance(workbook_path)
+            excel_app = instance['app']
+            try:
+                ws = instance['workbook'].Worksheets(sheet_name)
+                used = ws.UsedRange
+                scratch_col = min(used.Column + used.Columns.Count, EXCEL_MAX_COLUMNS)
+            except Exception as e:
+                return fail_all(f'無法定位工作表: {e}')
+            
+            col_letters = col_num_to_letters(scratch_col)
+            scratch = ws.Range(f"{col_letters}1:{col_letters}{len(expressions)}")
+            original_formulas = scratch.Formula
+            old_calculation = None
+            try:
+                try:
+                    old_calculation = excel_app.Calculation
+                    excel_app.Calculation = -4105  # xlCalculationAutomatic
+                except:
+                    pass
+                scratch.Formula = tuple((f"={expression}",) for expression in expressions)
+                scratch.Calculate()
+                values = scratch.Value
+            except Exception as calc_error:
+                return fail_all(f'計算失敗: {calc_error}')
+            finally:
+                if old_calculation is not None:
+                    try:
+                        excel_app.Calculation = old_calculation
+                    except:
+                        pass
+                try:
+                    scratch.Formula = original_formulas
+                except:
+                    pass
+            
+            results = []
+            for expression, row in zip(expressions, values):
+                calculation_result = row[0] if isinstance(row, (tuple, list)) else row
+                if calculation_result is None:
+                    results.append({'success': False, 'error': '計算結果為空', 'indirect_content': expression})
+                elif self._is_excel_error(calculation_result):
+                    results.append({'success': False, 'error': f'Excel計算錯誤: {calculation_result}', 'indirect_content': expression})
+                else:
+                    results.append({
+                        'success': True,
+                        'static_reference': str(calculation_result).strip(),
+                        'calculation_result': calculation_result,
+                        'indirect_content': expression
+                    })
+            if self.progress_callback:
+                ok = sum(1 for r in results if r['success'])
+                self.progress_callback.update_progress(f"[ULTRA-SAFE-CALC] ✓ 批次計算完成: {ok}/{len(expressions)} 成功")
+            return results
+        
+        except Exception as e:
+            instance_failed = True
+            if self.progress_callback:
+                self.progress_callback.update_progress(f"[ULTRA-SAFE-CALC] 批次計算異常: {e}")
+            return fail_all(str(e))
+        
+        finally:
+            if instance:
+                try:
+                    self.release_instance(instance, discard=instance_failed)
+                except Exception as cleanup_error:
+                    if self.progress_callback:
+                        self.progress_callback.update_progress(f"[ULTRA-SAFE-CALC] 歸還實例失敗: {cleanup_error}")
+    
+    def calculate_match(self, lookup_value, search_range, workbook_path, sheet_name, cell_address, match_type=0):
+        """
+        計算 MATCH(lookup_value, search_range, match_type) 的位置
+        精確匹配使用共用查找索引；不支援時改用 calculate_safely
+        """
+        match_content = f"MATCH({lookup_value}, {search_range}, {match_type})"
+        memo_key = self.calculation_memo.make_key(match_content, workbook_path, sheet_name, cell_address)
+        cached = self.calculation_memo.get(memo_key)
+        if cached is not None:
+            return cached
+        
+        if os.path.exists(workbook_path):
+            try:
+                result = self.native_evaluator.match_position(
+                    lookup_value, search_range, workbook_path, sheet_name, cell_address, match_type
+                )
+                self.calculation_stats['native'] += 1
+                self.calculation_memo.put(memo_key, result)
+                return result
+            except UnsupportedExpression as e:
+                if self.progress_callback:
+                    self.progress_callback.update_progress(f"[NATIVE-CALC] MATCH 改用 Excel 計算: {e}")
+            except Exception as e:
+                if self.progress_callback:
+                    self.progress_callback.update_progress(f"[NATIVE-CALC] MATCH 原生計算異常，改用 Excel 計算: {e}")
+
+        return self.calculate_safely(match_content, workbook_path, sheet_name, cell_address)
+
+    def _calculate_with_com(self, indirect_content, workbook_path, sheet_name, cell_address):
+        """安全計算 INDIRECT - 使用完全隔離的暖實例（同一工作簿重用）"""
+        if win32com is None and self.dispatch_factory is None:
+            return {
+                'success': False,
+                'error': '此運算式需要 Excel COM 計算，但目前環境沒有 pywin32',
+                'indirect_content': indirect_content
+            }
+        self.calculation_stats['com'] += 1
         temp_instance = None
+        instance_failed = False
         temp_cell = None
         original_value = None
         original_formula = None
@@ -409,12 +796,11 @@ class ExcelComManager:
                     'indirect_content': indirect_content
                 }
             
-            # 為計算創建臨時的完全隔離實例
-            temp_instance = self.open_workbook_for_calculation(workbook_path)
+            # 取得此工作簿的完全隔離暖實例
+            temp_instance = self.acquire_instance(workbook_path)
             
             wb = temp_instance['workbook']
             excel_app = temp_instance['app']
-            instance_key = temp_instance['instance_id']
             
             # 定位目標儲存格
             try:
@@ -512,6 +898,7 @@ class ExcelComManager:
             }
             
         except Exception as e:
+            instance_failed = True
             if self.progress_callback:
                 self.progress_callback.update_progress(f"[ULTRA-SAFE-CALC] 計算異常: {e}")
             return {
@@ -521,13 +908,13 @@ class ExcelComManager:
             }
         
         finally:
-            # 確保清理臨時實例
+            # 歸還暖實例；發生異常的實例直接關閉（分析結束時 _ultra_safe_cleanup 會關閉其餘實例）
             if temp_instance:
                 try:
-                    self.close_specific_instance(temp_instance['instance_id'])
+                    self.release_instance(temp_instance, discard=instance_failed)
                 except Exception as cleanup_error:
                     if self.progress_callback:
-                        self.progress_callback.update_progress(f"[ULTRA-SAFE-CALC] 清理臨時實例失敗: {cleanup_error}")
+                        self.progress_callback.update_progress(f"[ULTRA-SAFE-CALC] 歸還實例失敗: {cleanup_error}")
     
     def _is_excel_error(self, result):
         """檢查是否為Excel錯誤值"""
@@ -539,4 +926,4 @@ class ExcelComManager:
         ]
         
         result_str = str(result).upper()
-        return any(error in result_str for error in error_values)
\ No newline at end of file
+        return any(error in result_str for error in error_values)
\ No newline at end of file
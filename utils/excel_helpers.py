@@ -281,7 +281,8 @@ def replace_links_in_excel(summary_window, replace_frame, pane, summary_tree, ol
     formula_idx = pane.view.tree_columns.index("formula")
     address_idx = pane.view.tree_columns.index("address")
 
-    current_formulas = [pane.view.result_tree.item(item_id, "values") for item_id in pane.view.result_tree.get_children()]
+    from core.worksheet_tree import get_filtered_formulas
+    current_formulas = get_filtered_formulas(pane, expand_regions=True)
 
     for item_data in current_formulas:
         if len(item_data) > formula_idx and old_link in str(item_data[formula_idx]):
@@ -9,79 +9,216 @@ including external file access and worksheet management.
 import os
 import re
 import openpyxl
-import xlrd
 
 
-def read_external_cell_value(current_workbook_path, external_file_full_path, external_sheet_name, cell_address):
+_CELL_ADDRESS_PATTERN = re.compile(r'^([A-Z]{1,3})([0-9]+)$', re.IGNORECASE)
+_OPENPYXL_EXTENSIONS = ('.xlsx', '.xlsm', '.xltx', '.xltm')
+
+
+def _split_cell_address(cell_address):
     """
-    Read cell value from an external Excel file.
+    Convert an A1-style address into zero-based (row, column) indexes.
     
     Args:
-        current_workbook_path (str): Path to the current workbook
-        external_file_full_path (str): Full path to the external file
-        external_sheet_name (str): Name of the worksheet in external file
-        cell_address (str): Cell address to read (e.g., 'A1')
+        cell_address (str): Cell address (e.g., 'A1' or '$B$2')
         
     Returns:
-        str: Formatted string containing the cell value or error message
+        tuple: (row_idx, col_idx) or None if the address is not a single cell
     """
-    full_external_path_normalized = os.path.normpath(external_file_full_path)
-    if not os.path.exists(full_external_path_normalized):
-        return f"External (File Not Found on Disk: {full_external_path_normalized})"
+    m = _CELL_ADDRESS_PATTERN.match(cell_address.replace('$', '').strip())
+    if not m:
+        return None
+    col_letters, row_str = m.groups()
+    col_idx = 0
+    for c in col_letters.upper():
+        col_idx = col_idx * 26 + (ord(c) - ord('A') + 1)
+    return int(row_str) - 1, col_idx - 1
+
+
+def _find_sheet_name(sheet_names, wanted_name):
+    """Case-insensitive sheet lookup, returning the real sheet name or None."""
+    wanted_lower = wanted_name.lower()
+    for sname in sheet_names:
+        if sname.lower() == wanted_lower:
+            return sname
+    return None
+
+
+def _read_openpyxl_group(file_path, sheet_name, positions):
+    """
+    Read a group of cells from one sheet of an .xlsx-family file.
     
-    file_extension = os.path.splitext(full_external_path_normalized)[1].lower()
+    The workbook comes from the shared workbook cache, and the requested cells
+    are served from a single streaming pass over their bounding rows/columns.
     
-    if file_extension in ['.xlsx', '.xlsm', '.xltx', '.xltm']:
-        try:
-            workbook = openpyxl.load_workbook(full_external_path_normalized, data_only=True, read_only=True)
-            found_sheet = None
-            for sname in workbook.sheetnames:
-                if sname.lower() == external_sheet_name.lower():
-                    found_sheet = sname
-                    break
-            if found_sheet:
-                worksheet = workbook[found_sheet]
-                cell_value = worksheet[cell_address].value
-                workbook.close()
-                return f"External (OpenPyxl): {cell_value if cell_value is not None else 'Empty'}"
-            else:
-                workbook.close()
-                return "External (Sheet Not Found in file)"
-        except Exception as e:
-            return f"External (OpenPyxl Error: {str(e)[:100]})"
+    Args:
+        file_path (str): Normalized path of the external file
+        sheet_name (str): Requested worksheet name (case-insensitive)
+        positions (dict): (row_idx, col_idx) -> list of request keys
+        
+    Returns:
+        dict: request key -> formatted value string
+    """
+    from utils.workbook_cache import get_cached_workbook
+    
+    results = {}
+    try:
+        workbook = get_cached_workbook(file_path, read_only=True, data_only=True)
+        found_sheet = _find_sheet_name(workbook.sheetnames, sheet_name)
+        if not found_sheet:
+            for keys in positions.values():
+                for key in keys:
+                    results[key] = "External (Sheet Not Found in file)"
+            return results
+        
+        worksheet = workbook[found_sheet]
+        rows = [pos[0] for pos in positions]
+        cols = [pos[1] for pos in positions]
+        min_row, max_row = min(rows), max(rows)
+        min_col, max_col = min(cols), max(cols)
+        
+        wanted_by_row = {}
+        for row_idx, col_idx in positions:
+            wanted_by_row.setdefault(row_idx, []).append(col_idx)
+        
+        values = {}
+        for row_offset, row_values in enumerate(worksheet.iter_rows(
+                min_row=min_row + 1, max_row=max_row + 1,
+                min_col=min_col + 1, max_col=max_col + 1, values_only=True)):
+            row_idx = min_row + row_offset
+            for col_idx in wanted_by_row.get(row_idx, ()):
+                offset = col_idx - min_col
+                values[(row_idx, col_idx)] = row_values[offset] if offset < len(row_values) else None
+        
+        for pos, keys in positions.items():
+            cell_value = values.get(pos)
+            for key in keys:
+                results[key] = f"External (OpenPyxl): {cell_value if cell_value is not None else 'Empty'}"
+    except Exception as e:
+        for keys in positions.values():
+            for key in keys:
+                results[key] = f"External (OpenPyxl Error: {str(e)[:100]})"
+    return results
+
+
+def _read_xlrd_groups(file_path, sheet_groups):
+    """
+    Read groups of cells from the sheets of a legacy .xls file.
+    
+    The book comes from the pooled xlrd handles, so only the requested sheets
+    are loaded and the BIFF stream is not parsed again on later reads.
+    
+    Args:
+        file_path (str): Normalized path of the external file
+        sheet_groups (dict): sheet name -> {(row_idx, col_idx): [request keys]}
+        
+    Returns:
+        dict: request key -> formatted value string
+    """
+    from utils.xlrd_cache import get_pooled_xls_sheet
     
-    if file_extension == '.xls':
+    results = {}
+    for sheet_name, positions in sheet_groups.items():
         try:
-            import xlrd
-            workbook = xlrd.open_workbook(full_external_path_normalized, on_demand=True)
-            found_sheet = None
-            for sname in workbook.sheet_names():
-                if sname.lower() == external_sheet_name.lower():
-                    found_sheet = sname
-                    break
-            if found_sheet:
-                worksheet = workbook.sheet_by_name(found_sheet)
-                m = re.match(r'^([A-Z]+)([0-9]+)$', cell_address.replace('$', ''))
-                if m:
-                    col_letters, row_str = m.groups()
-                    col_idx = 0
-                    for i, c in enumerate(reversed(col_letters)):
-                        col_idx += (ord(c.upper()) - ord('A') + 1) * (26 ** i)
-                    col_idx -= 1
-                    row_idx = int(row_str) - 1
-                    if 0 <= row_idx < worksheet.nrows and 0 <= col_idx < worksheet.ncols:
-                        cell_value = worksheet.cell_value(row_idx, col_idx)
-                        return f"External (xlrd): {cell_value if cell_value != '' else 'Empty'}"
-                    else:
-                        return "External (Cell Address Out of Range)"
+            worksheet = get_pooled_xls_sheet(file_path, sheet_name)
+            if worksheet is None:
+                for keys in positions.values():
+                    for key in keys:
+                        results[key] = "External (Sheet Not Found in file)"
+                continue
+            
+            for (row_idx, col_idx), keys in positions.items():
+                if 0 <= row_idx < worksheet.nrows and 0 <= col_idx < worksheet.ncols:
+                    cell_value = worksheet.cell_value(row_idx, col_idx)
+                    text = f"External (xlrd): {cell_value if cell_value != '' else 'Empty'}"
                 else:
-                    return "External (Invalid Cell Address Format)"
-            else:
-                return "External (Sheet Not Found in file)"
+                    text = "External (Cell Address Out of Range)"
+                for key in keys:
+                    results[key] = text
         except Exception as e:
-            return f"External (xlrd Error: {str(e)[:100]})"
+            for keys in positions.values():
+                for key in keys:
+                    results[key] = f"External (xlrd Error: {str(e)[:100]})"
+    return results
+
+
+def read_external_cell_values(cell_requests):
+    """
+    Read many cell values from external Excel files in one batch.
+    
+    Requests are grouped by target file and sheet so that each file is opened
+    once (through the shared workbook cache for .xlsx-family files and the
+    pooled xlrd books for .xls) and every sheet group is served from that
+    single handle.
+    
+    Args:
+        cell_requests (iterable): (external_file_full_path, external_sheet_name, cell_address) tuples
+        
+    Returns:
+        dict: Maps each request tuple to the same formatted string that
+              read_external_cell_value returns for it
+    """
+    from utils.file_fingerprint import get_fingerprint_service
+    
+    fingerprint_service = get_fingerprint_service()
+    results = {}
+    # normalized path -> sheet name (lower) -> (sheet name, {(row, col): [request keys]})
+    file_groups = {}
+    
+    for request in cell_requests:
+        if request in results:
+            continue
+        external_file_full_path, external_sheet_name, cell_address = request
+        full_external_path_normalized = os.path.normpath(external_file_full_path)
+        if not fingerprint_service.exists(full_external_path_normalized):
+            results[request] = f"External (File Not Found on Disk: {full_external_path_normalized})"
+            continue
+        
+        file_extension = os.path.splitext(full_external_path_normalized)[1].lower()
+        if file_extension not in _OPENPYXL_EXTENSIONS and file_extension != '.xls':
+            results[request] = "External (Live reading for this file type is disabled)"
+            continue
+        
+        position = _split_cell_address(cell_address)
+        if position is None:
+            results[request] = "External (Invalid Cell Address Format)"
+            continue
+        
+        results[request] = None
+        sheet_groups = file_groups.setdefault(full_external_path_normalized, {})
+        _, positions = sheet_groups.setdefault(external_sheet_name.lower(), (external_sheet_name, {}))
+        positions.setdefault(position, []).append(request)
     
-    return "External (Live reading for this file type is disabled)"
+    for file_path, sheet_groups in file_groups.items():
+        file_extension = os.path.splitext(file_path)[1].lower()
+        if file_extension == '.xls':
+            results.update(_read_xlrd_groups(
+                file_path, {sheet_name: positions for sheet_name, positions in sheet_groups.values()}
+            ))
+        else:
+            for sheet_name, positions in sheet_groups.values():
+                results.update(_read_openpyxl_group(file_path, sheet_name, positions))
+    
+    return results
+
+
+def read_external_cell_value(current_workbook_path, external_file_full_path, external_sheet_name, cell_address):
+    """
+    Read cell value from an external Excel file.
+    
+    Single-reference wrapper around read_external_cell_values.
+    
+    Args:
+        current_workbook_path (str): Path to the current workbook
+        external_file_full_path (str): Full path to the external file
+        external_sheet_name (str): Name of the worksheet in external file
+        cell_address (str): Cell address to read (e.g., 'A1')
+        
+    Returns:
+        str: Formatted string containing the cell value or error message
+    """
+    request = (external_file_full_path, external_sheet_name, cell_address)
+    return read_external_cell_values([request])[request]
 
 
 def find_matching_sheet(workbook, sheet_name):
@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+"""
+File Fingerprint Service
+Shared cache-key service for all workbook caches: combines file size, mtime
+and a sampled content hash, and memoizes stat results for a short TTL so
+per-cell cache lookups do not hit the filesystem every time.
+Parsed state is keyed by a content id: byte-identical files at different
+paths share one id, confirmed by a full hash before two paths are merged
+"""
+
+import os
+import time
+import hashlib
+import threading
+from dataclasses import dataclass
+
+# Bytes read from the head, middle and tail of a file for the sampled hash.
+# .xlsx/.xlsm files are zip archives whose central directory (with a CRC of
+# every member) sits at the tail, so the tail sample changes with any content.
+SAMPLE_BLOCK_SIZE = 64 * 1024
+FULL_HASH_BLOCK_SIZE = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class FileFingerprint:
+    """
+    Identity of a file version on disk
+    content_id keys parsed state: equal only for byte-identical files
+    """
+    size: int
+    mtime_ns: int
+    sample_hash: str
+    path: str
+    content_id: tuple
+
+
+class FileFingerprintService:
+    """
+    Thread-safe fingerprint provider shared by the workbook caches
+    - stat results are memoized for stat_ttl_seconds
+    - sampled hashes are recomputed only when size/mtime change
+    - files with the same size and sampled hash are a candidate group; a new
+      path joins an existing content id only if the full hashes match
+    - full content hashes are computed on demand
+    """
+
+    def __init__(self, stat_ttl_seconds=1.0):
+        self.stat_ttl_seconds = stat_ttl_seconds
+        self.lock = threading.RLock()
+        self._stat_memo = {}         # path -> (expires_at, stat_result or None)
+        self._fingerprint_memo = {}  # path -> FileFingerprint
+        self._full_hash_memo = {}    # path -> ((size, mtime_ns), hexdigest)
+        self._content_groups = {}    # (size, sample_hash) -> [FileFingerprint]
+        self._stats = {
+            'stat_calls': 0,
+            'stat_hits': 0,
+            'sample_hashes': 0,
+            'full_hashes': 0,
+            'shared_content_ids': 0
+        }
+
+    @staticmethod
+    def normalize_path(file_path):
+        return os.path.normpath(os.path.abspath(file_path))
+
+    def stat(self, file_path):
+        """
+        Get a (possibly memoized) os.stat result
+
+        Args:
+            file_path: Path to the file
+
+        Returns:
+            os.stat_result or None if the file does not exist
+        """
+        normalized_path = self.normalize_path(file_path)
+        now = time.monotonic()
+
+        with self.lock:
+            memo = self._stat_memo.get(normalized_path)
+            if memo is not None and memo[0] > now:
+                self._stats['stat_hits'] += 1
+                return memo[1]
+
+        try:
+            result = os.stat(normalized_path)
+        except OSError:
+            result = None
+
+        with self.lock:
+            self._stats['stat_calls'] += 1
+            self._stat_memo[normalized_path] = (now + self.stat_ttl_seconds, result)
+        return result
+
+    def exists(self, file_path):
+        return self.stat(file_path) is not None
+
+    def fingerprint(self, file_path):
+        """
+        Get the fingerprint (size, mtime, sampled hash) of a file
+
+        Args:
+            file_path: Path to the file
+
+        Returns:
+            FileFingerprint or None if the file does not exist
+        """
+        normalized_path = self.normalize_path(file_path)
+        stat_result = self.stat(normalized_path)
+        if stat_result is None:
+            with self.lock:
+                self._fingerprint_memo.pop(normalized_path, None)
+            return None
+
+        with self.lock:
+            cached = self._fingerprint_memo.get(normalized_path)
+        if cached is not None and cached.size == stat_result.st_size and cached.mtime_ns == stat_result.st_mtime_ns:
+            return cached
+
+        try:
+            sample_hash = self._sample_hash(normalized_path, stat_result.st_size)
+        except OSError:
+            return None
+
+        content_id = self._resolve_content_id(normalized_path, stat_result, sample_hash)
+        fingerprint = FileFingerprint(stat_result.st_size, stat_result.st_mtime_ns, sample_hash, normalized_path,
+                                      content_id)
+        with self.lock:
+            self._stats['sample_hashes'] += 1
+            self._fingerprint_memo[normalized_path] = fingerprint
+            group = self._content_groups.setdefault((fingerprint.size, sample_hash), [])
+            group[:] = [member for member in group if member.path != normalized_path]
+            group.append(fingerprint)
+        return fingerprint
+
+    def _is_current(self, fingerprint):
+        stat_result = self.stat(fingerprint.path)
+        return stat_result is not None and \
+            (stat_result.st_size, stat_result.st_mtime_ns) == (fingerprint.size, fingerprint.mtime_ns)
+
+    def _resolve_content_id(self, normalized_path, stat_result, sample_hash):
+        """
+        Content id for a new file version. The sampled hash only selects
+        candidates; another path's id is reused only when the full hashes
+        match, so files differing outside the sampled blocks never share one.
+        """
+        group_key = (stat_result.st_size, sample_hash)
+        with self.lock:
+            candidates = list(self._content_groups.get(group_key, ()))
+
+        own_hash = None
+        for candidate in candidates:
+            if candidate.path == normalized_path:
+                continue
+            if not self._is_current(candidate):
+                with self.lock:
+                    group = self._content_groups.get(group_key, [])
+                    if candidate in group:
+                        group.remove(candidate)
+                continue
+            if own_hash is None:
+                own_hash = self.full_hash(normalized_path)
+                if own_hash is None:
+                    break
+            if self.full_hash(candidate.path) == own_hash:
+                with self.lock:
+                    self._stats['shared_content_ids'] += 1
+                return candidate.content_id
+
+        return (stat_result.st_size, sample_hash, normalized_path, stat_result.st_mtime_ns)
+
+    def full_hash(self, file_path):
+        """
+        Get the SHA-256 of the whole file (computed on demand, memoized per version)
+
+        Args:
+            file_path: Path to the file
+
+        Returns:
+            str: Hex digest, or None if the file does not exist
+        """
+        normalized_path = self.normalize_path(file_path)
+        stat_result = self.stat(normalized_path)
+        if stat_result is None:
+            return None
+
+        version = (stat_result.st_size, stat_result.st_mtime_ns)
+        with self.lock:
+            cached = self._full_hash_memo.get(normalized_path)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        hash_object = hashlib.sha256()
+        try:
+            with open(normalized_path, 'rb') as f:
+                for block in iter(lambda: f.read(FULL_HASH_BLOCK_SIZE), b''):
+                    hash_object.update(block)
+        except OSError:
+            return None
+
+        digest = hash_object.hexdigest()
+        with self.lock:
+            self._stats['full_hashes'] += 1
+            self._full_hash_memo[normalized_path] = (version, digest)
+        return digest
+
+    def _sample_hash(self, normalized_path, size):
+        hash_object = hashlib.blake2b(digest_size=16)
+        hash_object.update(str(size).encode('ascii'))
+        with open(normalized_path, 'rb') as f:
+            if size <= SAMPLE_BLOCK_SIZE * 3:
+                hash_object.update(f.read())
+            else:
+                for offset in (0, size // 2 - SAMPLE_BLOCK_SIZE // 2, size - SAMPLE_BLOCK_SIZE):
+                    f.seek(offset)
+                    hash_object.update(f.read(SAMPLE_BLOCK_SIZE))
+        return hash_object.hexdigest()
+
+    def invalidate(self, file_path=None):
+        """
+        Drop memoized results for one file, or for all files
+
+        Args:
+            file_path: Path to invalidate (None for everything)
+        """
+        with self.lock:
+            if file_path is None:
+                self._stat_memo.clear()
+                self._fingerprint_memo.clear()
+                self._full_hash_memo.clear()
+                self._content_groups.clear()
+                return
+            normalized_path = self.normalize_path(file_path)
+            self._stat_memo.pop(normalized_path, None)
+            self._fingerprint_memo.pop(normalized_path, None)
+            self._full_hash_memo.pop(normalized_path, None)
+
+    def get_stats(self):
+        with self.lock:
+            return self._stats.copy()
+
+
+# Global service instance
+_global_service = None
+_service_lock = threading.Lock()
+
+
+def get_fingerprint_service():
+    """
+    Get the global fingerprint service instance (singleton pattern)
+
+    Returns:
+        FileFingerprintService: The global service instance
+    """
+    global _global_service
+
+    if _global_service is None:
+        with _service_lock:
+            if _global_service is None:
+                _global_service = FileFingerprintService(stat_ttl_seconds=1.0)
+
+    return _global_service
+
+
+def get_file_fingerprint(file_path):
+    """
+    Convenience function to fingerprint a file using the global service
+
+    Args:
+        file_path: Path to the file
+
+    Returns:
+        FileFingerprint or None if the file does not exist
+    """
+    return get_fingerprint_service().fingerprint(file_path)
@@ -0,0 +1,1454 @@
+# -*- coding: utf-8 -*-
+"""
+Native Formula Evaluator - 以快取的儲存格值在 Python 內計算 Excel 運算式
+取代每次都要開啟隔離 Excel 實例的 calculate_safely：
+- 支援 MATCH（精確 / 遞增 / 遞減）、INDEX、ROW/COLUMN、ROWS/COLUMNS 與四則運算
+- 支援 INDIRECT 參數常見的文字函數：&、ADDRESS、TEXT、CHAR、SUBSTITUTE、LEFT/RIGHT/MID 等
+- OFFSET、XLOOKUP 返回引用（CellRange），可直接轉為靜態地址；XMATCH 支援所有比對 / 搜尋模式
+- 多條件 MATCH(1, (A:A=x)*(B:B=y), 0) 交給 criteria_match 向量化計算
+- 不支援的運算式會拋出 UnsupportedExpression，呼叫端再改用 COM 計算
+"""
+
+import os
+import re
+import math
+import datetime
+from decimal import Decimal, ROUND_HALF_UP
+
+from utils.sheet_value_cache import get_sheet_values, EXCEL_MAX_ROWS, EXCEL_MAX_COLUMNS
+
+
+class UnsupportedExpression(Exception):
+    """原生計算器無法處理的運算式（需要改用 Excel COM）"""
+    pass
+
+
+class ExcelError:
+    """Excel 錯誤值，例如 #N/A、#REF!"""
+
+    __slots__ = ('code',)
+
+    def __init__(self, code):
+        self.code = code
+
+    def __eq__(self, other):
+        return isinstance(other, ExcelError) and other.code == self.code
+
+    def __hash__(self):
+        return hash(self.code)
+
+    def __str__(self):
+        return self.code
+
+    __repr__ = __str__
+
+
+ERROR_NA = ExcelError('#N/A')
+ERROR_REF = ExcelError('#REF!')
+ERROR_VALUE = ExcelError('#VALUE!')
+ERROR_DIV0 = ExcelError('#DIV/0!')
+ERROR_NUM = ExcelError('#NUM!')
+ERROR_NAME = ExcelError('#NAME?')
+
+_ERROR_LITERALS = {
+    '#N/A': ERROR_NA, '#REF!': ERROR_REF, '#VALUE!': ERROR_VALUE, '#DIV/0!': ERROR_DIV0,
+    '#NUM!': ERROR_NUM, '#NAME?': ERROR_NAME, '#NULL!': ExcelError('#NULL!')
+}
+
+
+def col_letters_to_num(letters):
+    num = 0
+    for ch in letters.upper():
+        num = num * 26 + (ord(ch) - ord('A') + 1)
+    return num
+
+
+def col_num_to_letters(col_num):
+    result = ''
+    while col_num > 0:
+        col_num -= 1
+        result = chr(ord('A') + (col_num % 26)) + result
+        col_num //= 26
+    return result
+
+
+class CellRange:
+    """指向某工作簿/工作表中的矩形範圍（1-based，含邊界）"""
+
+    __slots__ = ('workbook_path', 'sheet_name', 'min_row', 'min_col', 'max_row', 'max_col')
+
+    def __init__(self, workbook_path, sheet_name, min_row, min_col, max_row, max_col):
+        self.workbook_path = workbook_path
+        self.sheet_name = sheet_name
+        self.min_row = min(min_row, max_row)
+        self.min_col = min(min_col, max_col)
+        self.max_row = max(min_row, max_row)
+        self.max_col = max(min_col, max_col)
+
+    @property
+    def rows(self):
+        return self.max_row - self.min_row + 1
+
+    @property
+    def columns(self):
+        return self.max_col - self.min_col + 1
+
+    @property
+    def is_cell(self):
+        return self.min_row == self.max_row and self.min_col == self.max_col
+
+    def address(self):
+        """A1 樣式地址（不含工作表），例如 B3 或 A1:C10"""
+        start = f"{col_num_to_letters(self.min_col)}{self.min_row}"
+        if self.is_cell:
+            return start
+        return f"{start}:{col_num_to_letters(self.max_col)}{self.max_row}"
+
+    def reference_text(self, current_workbook_path, current_sheet_name):
+        """
+        以目前儲存格位置為基準的公式引用文字：
+        同工作表 -> B3，同檔案其他工作表 -> Sheet2!B3，外部檔案 -> 'C:\\dir\\[f.xlsx]Sheet'!B3
+        """
+        same_workbook = os.path.normcase(os.path.abspath(self.workbook_path)) == \
+            os.path.normcase(os.path.abspath(current_workbook_path))
+        if same_workbook:
+            if self.sheet_name.lower() == current_sheet_name.lower():
+                return self.address()
+            return f"{quote_sheet_name(self.sheet_name)}!{self.address()}"
+        directory, file_name = os.path.split(self.workbook_path)
+        prefix = f"{directory}{os.sep}[{file_name}]{self.sheet_name}".replace("'", "''")
+        return f"'{prefix}'!{self.address()}"
+
+    def key(self):
+        return (os.path.normcase(self.workbook_path), self.sheet_name.lower(),
+                self.min_row, self.min_col, self.max_row, self.max_col)
+
+    def __repr__(self):
+        return f"CellRange({os.path.basename(self.workbook_path)}!{self.sheet_name}!{self.address()})"
+
+
+# ---------------------------------------------------------------------------
+# Tokenizer
+# ---------------------------------------------------------------------------
+
+_SHEET_PREFIX = (
+    r"(?:'(?:[^']|'')+'"                                        # 'Sheet Name' / 'C:\dir\[f.xlsx]Sheet'
+    r"|\[[^\]]+\][A-Za-z0-9_\.\u4e00-\u9fff]+"                  # [f.xlsx]Sheet
+    r"|[A-Za-z0-9_\.\u4e00-\u9fff][A-Za-z0-9_\.\u4e00-\u9fff ]*" # Sheet1 / 工作表1
+    r")!"
+)
+_CELL = r"\$?[A-Za-z]{1,3}\$?\d+"
+_REF_BODY = (
+    rf"(?:{_CELL}(?::{_CELL})?"
+    r"|\$?[A-Za-z]{1,3}:\$?[A-Za-z]{1,3}"
+    r"|\$?\d+:\$?\d+)"
+)
+
+_TOKEN_PATTERN = re.compile(
+    r"""
+    (?P<ws>\s+)
+    |(?P<string>"(?:[^"]|"")*")
+    |(?P<error>\#(?:N/A|REF!|VALUE!|DIV/0!|NUM!|NAME\?|NULL!))
+    |(?P<func>[A-Za-z_][A-Za-z0-9_\.]*(?=\())
+    |(?P<ref>(?:""" + _SHEET_PREFIX + r""")?""" + _REF_BODY + r"""(?![A-Za-z0-9_\(]))
+    |(?P<bool>(?:TRUE|FALSE)(?![A-Za-z0-9_\(]))
+    |(?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+    |(?P<op><=|>=|<>|[-+*/^&=<>%(),])
+    """,
+    re.VERBOSE | re.IGNORECASE,
+)
+
+
+def tokenize(expression):
+    """將運算式切成 (kind, text) 列表；遇到無法識別的內容時拋出 UnsupportedExpression"""
+    tokens = []
+    pos = 0
+    length = len(expression)
+    while pos < length:
+        match = _TOKEN_PATTERN.match(expression, pos)
+        if not match:
+            raise UnsupportedExpression(f"無法識別的語法: {expression[pos:pos + 20]}")
+        kind = match.lastgroup
+        if kind != 'ws':
+            tokens.append((kind, match.group(kind)))
+        pos = match.end()
+    return tokens
+
+
+# ---------------------------------------------------------------------------
+# Parser (precedence climbing) -> AST tuples
+# ---------------------------------------------------------------------------
+
+_BINARY_PRECEDENCE = {
+    '=': 1, '<>': 1, '<': 1, '>': 1, '<=': 1, '>=': 1,
+    '&': 2,
+    '+': 3, '-': 3,
+    '*': 4, '/': 4,
+    '^': 5,
+}
+_UNARY_PRECEDENCE = 6
+
+
+class _Parser:
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def take(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def expect(self, text):
+        kind, value = self.take()
+        if kind != 'op' or value != text:
+            raise UnsupportedExpression(f"預期 '{text}'，實際為 '{value}'")
+
+    def parse(self):
+        if not self.tokens:
+            raise UnsupportedExpression("空運算式")
+        node = self.parse_expression(0)
+        if self.pos != len(self.tokens):
+            raise UnsupportedExpression(f"多餘的內容: {self.peek()[1]}")
+        return node
+
+    def parse_expression(self, min_precedence):
+        left = self.parse_unary()
+        while True:
+            kind, value = self.peek()
+            if kind == 'op' and value == '%':
+                self.take()
+                left = ('percent', left)
+                continue
+            if kind != 'op' or value not in _BINARY_PRECEDENCE:
+                return left
+            precedence = _BINARY_PRECEDENCE[value]
+            if precedence < min_precedence:
+                return left
+            self.take()
+            # ^ 在 Excel 中是左結合
+            right = self.parse_expression(precedence + 1)
+            left = ('binop', value, left, right)
+
+    def parse_unary(self):
+        kind, value = self.peek()
+        if kind == 'op' and value in ('-', '+'):
+            self.take()
+            operand = self.parse_expression(_UNARY_PRECEDENCE)
+            return ('neg', operand) if value == '-' else operand
+        return self.parse_primary()
+
+    def parse_primary(self):
+        kind, value = self.take()
+        if kind == 'number':
+            return ('value', float(value))
+        if kind == 'string':
+            return ('value', value[1:-1].replace('""', '"'))
+        if kind == 'bool':
+            return ('value', value.upper() == 'TRUE')
+        if kind == 'error':
+            return ('value', _ERROR_LITERALS[value.upper()])
+        if kind == 'ref':
+            return ('ref', value)
+        if kind == 'func':
+            return self.parse_function(value.upper())
+        if kind == 'op' and value == '(':
+            node = self.parse_expression(0)
+            self.expect(')')
+            return node
+        raise UnsupportedExpression(f"無法解析: {value}")
+
+    def parse_function(self, name):
+        self.expect('(')
+        args = []
+        kind, value = self.peek()
+        if kind == 'op' and value == ')':
+            self.take()
+            return ('func', name, args)
+        while True:
+            kind, value = self.peek()
+            if kind == 'op' and value in (',', ')'):
+                args.append(('missing',))
+            else:
+                args.append(self.parse_expression(0))
+            kind, value = self.take()
+            if kind == 'op' and value == ',':
+                continue
+            if kind == 'op' and value == ')':
+                return ('func', name, args)
+            raise UnsupportedExpression(f"函數 {name} 參數語法錯誤")
+
+
+def parse_expression(expression):
+    """解析運算式為 AST；前導 '=' 可有可無"""
+    expression = expression.strip()
+    if expression.startswith('='):
+        expression = expression[1:]
+    return _Parser(tokenize(expression)).parse()
+
+
+# ---------------------------------------------------------------------------
+# Value helpers (Excel semantics)
+# ---------------------------------------------------------------------------
+
+def normalize_cell_value(value):
+    """把 openpyxl/xlrd 讀出的值轉為計算器內部型別（數字一律 float）"""
+    if value is None or isinstance(value, (bool, str, ExcelError)):
+        if isinstance(value, str) and value.upper() in _ERROR_LITERALS:
+            return _ERROR_LITERALS[value.upper()]
+        return value
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, datetime.datetime):
+        from openpyxl.utils.datetime import to_excel
+        return float(to_excel(value))
+    if isinstance(value, (datetime.date, datetime.time, datetime.timedelta)):
+        from openpyxl.utils.datetime import to_excel
+        return float(to_excel(value))
+    return str(value)
+
+
+def to_number(value):
+    """Excel 數值轉換；無法轉換時返回 #VALUE!"""
+    if isinstance(value, ExcelError):
+        return value
+    if value is None:
+        return 0.0
+    if isinstance(value, bool):
+        return 1.0 if value else 0.0
+    if isinstance(value, float):
+        return value
+    if isinstance(value, (int,)):
+        return float(value)
+    if isinstance(value, str):
+        text = value.strip()
+        if not text:
+            return ERROR_VALUE
+        try:
+            if text.endswith('%'):
+                return float(text[:-1]) / 100.0
+            return float(text.replace(',', ''))
+        except ValueError:
+            return ERROR_VALUE
+    return ERROR_VALUE
+
+
+def to_text(value):
+    """Excel 文字轉換（用於 & 與文字函數）"""
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, float):
+        if value == int(value) and abs(value) < 1e15:
+            return str(int(value))
+        # Excel 以 15 位有效數字顯示，例如 0.1+0.2 -> 0.3
+        text = f"{value:.15g}"
+        if 'e' in text:
+            mantissa, exponent = text.split('e')
+            text = f"{mantissa}E{int(exponent):+03d}"
+        return text
+    return str(value)
+
+
+def to_bool(value):
+    if isinstance(value, ExcelError):
+        return value
+    if value is None:
+        return False
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, float):
+        return value != 0
+    if isinstance(value, str):
+        if value.upper() == 'TRUE':
+            return True
+        if value.upper() == 'FALSE':
+            return False
+    return ERROR_VALUE
+
+
+def _type_rank(value):
+    # Excel 比較順序：數字 < 文字 < 邏輯值
+    if isinstance(value, bool):
+        return 2
+    if isinstance(value, str):
+        return 1
+    return 0
+
+
+def compare_values(left, right):
+    """Excel 比較：返回 -1/0/1；文字不分大小寫，空白視為 0 或空字串"""
+    if left is None:
+        left = '' if isinstance(right, str) else (False if isinstance(right, bool) else 0.0)
+    if right is None:
+        right = '' if isinstance(left, str) else (False if isinstance(left, bool) else 0.0)
+    rank_left, rank_right = _type_rank(left), _type_rank(right)
+    if rank_left != rank_right:
+        return -1 if rank_left < rank_right else 1
+    if isinstance(left, str):
+        left, right = left.lower(), right.lower()
+    if left < right:
+        return -1
+    if left > right:
+        return 1
+    return 0
+
+
+def wildcard_to_regex(pattern):
+    """把 Excel 萬用字元 (* ? ~) 轉為不分大小寫的正則"""
+    parts = []
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == '~' and i + 1 < len(pattern) and pattern[i + 1] in '*?~':
+            parts.append(re.escape(pattern[i + 1]))
+            i += 2
+            continue
+        if ch == '*':
+            parts.append('.*')
+        elif ch == '?':
+            parts.append('.')
+        else:
+            parts.append(re.escape(ch))
+        i += 1
+    return re.compile('^' + ''.join(parts) + '$', re.IGNORECASE | re.DOTALL)
+
+
+def has_wildcards(text):
+    return isinstance(text, str) and ('*' in text or '?' in text)
+
+
+def match_exact(lookup_value, values):
+    """MATCH(...,0) 語意：返回第一個相等值的 0-based 位置或 None"""
+    if has_wildcards(lookup_value):
+        regex = wildcard_to_regex(lookup_value)
+        for i, value in enumerate(values):
+            if isinstance(value, str) and regex.match(value):
+                return i
+        return None
+    for i, value in enumerate(values):
+        if value is None or _type_rank(value) != _type_rank(lookup_value):
+            continue
+        if compare_values(lookup_value, value) == 0:
+            return i
+    return None
+
+
+def match_ascending(lookup_value, values):
+    """MATCH(...,1) 語意：遞增資料中小於或等於查找值的最大值位置"""
+    found = None
+    for i, value in enumerate(values):
+        if value is None or _type_rank(value) != _type_rank(lookup_value):
+            continue
+        if compare_values(value, lookup_value) <= 0:
+            found = i
+        else:
+            break
+    return found
+
+
+def match_descending(lookup_value, values):
+    """MATCH(...,-1) 語意：遞減資料中大於或等於查找值的最小值位置"""
+    found = None
+    for i, value in enumerate(values):
+        if value is None or _type_rank(value) != _type_rank(lookup_value):
+            continue
+        if compare_values(value, lookup_value) >= 0:
+            found = i
+        else:
+            break
+    return found
+
+
+def quote_sheet_name(sheet_name):
+    """Excel 引用中的工作表名稱：含空白/符號或像儲存格地址時加上單引號"""
+    if re.match(r'^[A-Za-z_\u4e00-\u9fff][A-Za-z0-9_\.\u4e00-\u9fff]*$', sheet_name) and \
+            not re.match(r'^[A-Za-z]{1,3}\d+$', sheet_name) and \
+            sheet_name.upper() not in ('TRUE', 'FALSE'):
+        return sheet_name
+    return "'" + sheet_name.replace("'", "''") + "'"
+
+
+def _split_format_sections(format_text):
+    """以 ; 分割格式代碼（引號內的 ; 不分割）"""
+    sections = []
+    current = ''
+    in_quotes = False
+    for ch in format_text:
+        if ch == '"':
+            in_quotes = not in_quotes
+        if ch == ';' and not in_quotes:
+            sections.append(current)
+            current = ''
+            continue
+        current += ch
+    sections.append(current)
+    return sections
+
+
+def _format_number_section(value, section):
+    """套用單一數字格式區段，例如 0.00、#,##0、00、0%、"Q"0"""
+    parts = []      # (is_literal, text)
+    core = ''
+    core_done = False
+    i = 0
+    while i < len(section):
+        ch = section[i]
+        if ch == '"':
+            end = section.find('"', i + 1)
+            if end == -1:
+                raise UnsupportedExpression(f"不支援的 TEXT 格式: {section}")
+            parts.append((True, section[i + 1:end]))
+            i = end + 1
+            continue
+        if ch == '\\' and i + 1 < len(section):
+            parts.append((True, section[i + 1]))
+            i += 2
+            continue
+        if ch in '#0,.%':
+            if core_done and ch != '%':
+                raise UnsupportedExpression(f"不支援的 TEXT 格式: {section}")
+            if not core:
+                parts.append((False, None))
+            core += ch
+            i += 1
+            continue
+        if ch in '$-+()/: ':
+            if core:
+                core_done = True
+            parts.append((True, ch))
+            i += 1
+            continue
+        raise UnsupportedExpression(f"不支援的 TEXT 格式: {section}")
+
+    if not core:
+        return ''.join(text for _, text in parts if text is not None)
+
+    percent = core.count('%')
+    number_pattern = core.replace('%', '')
+    if number_pattern.endswith(','):
+        raise UnsupportedExpression(f"不支援的 TEXT 格式: {section}")
+    int_pattern, _, dec_pattern = number_pattern.partition('.')
+    thousands = ',' in int_pattern
+    min_int_digits = int_pattern.count('0')
+    max_decimals = len(dec_pattern)
+    min_decimals = len(dec_pattern.rstrip('#'))
+
+    number = Decimal(repr(value)) * (Decimal(100) ** percent)
+    quantum = Decimal(1).scaleb(-max_decimals)
+    text = str(abs(number).quantize(quantum, rounding=ROUND_HALF_UP))
+    int_text, _, dec_text = text.partition('.')
+    while len(dec_text) > min_decimals and dec_text.endswith('0'):
+        dec_text = dec_text[:-1]
+    int_text = int_text.lstrip('0')
+    int_text = int_text.rjust(min_int_digits, '0')
+    if thousands and int_text:
+        int_text = f"{int(int_text):,}".rjust(min_int_digits, '0')
+    if dec_text:
+        formatted = f"{int_text}.{dec_text}"
+    elif '.' in number_pattern:
+        formatted = f"{int_text}."
+    else:
+        formatted = int_text
+    if number < 0 and any(ch in '123456789' for ch in formatted):
+        formatted = '-' + formatted
+    formatted += '%' * percent
+
+    return ''.join(formatted if not is_literal else text for is_literal, text in parts)
+
+
+_DATE_TOKEN_PATTERN = re.compile(r'yyyy|yy|mmmmm|mmmm|mmm|mm|m|dddd|ddd|dd|d|"[^"]*"|\\.|[-/ .,:]', re.IGNORECASE)
+
+
+def _format_date(value, format_text):
+    """套用日期格式（yyyy/yy/mmm/mm/m/dddd/ddd/dd/d），時間格式不支援"""
+    if re.search(r'[hsHS]|AM/PM', format_text):
+        raise UnsupportedExpression(f"不支援的 TEXT 時間格式: {format_text}")
+    from openpyxl.utils.datetime import from_excel
+    date_value = from_excel(value)
+    result = ''
+    pos = 0
+    while pos < len(format_text):
+        match = _DATE_TOKEN_PATTERN.match(format_text, pos)
+        if not match:
+            raise UnsupportedExpression(f"不支援的 TEXT 格式: {format_text}")
+        token = match.group(0)
+        lower = token.lower()
+        if token.startswith('"'):
+            result += token[1:-1]
+        elif token.startswith('\\'):
+            result += token[1:]
+        elif lower == 'yyyy':
+            result += f"{date_value.year:04d}"
+        elif lower == 'yy':
+            result += f"{date_value.year % 100:02d}"
+        elif lower == 'mmmmm':
+            result += date_value.strftime('%B')[0]
+        elif lower == 'mmmm':
+            result += date_value.strftime('%B')
+        elif lower == 'mmm':
+            result += date_value.strftime('%b')
+        elif lower == 'mm':
+            result += f"{date_value.month:02d}"
+        elif lower == 'm':
+            result += str(date_value.month)
+        elif lower == 'dddd':
+            result += date_value.strftime('%A')
+        elif lower == 'ddd':
+            result += date_value.strftime('%a')
+        elif lower == 'dd':
+            result += f"{date_value.day:02d}"
+        elif lower == 'd':
+            result += str(date_value.day)
+        else:
+            result += token
+        pos = match.end()
+    return result
+
+
+def format_text(value, format_code):
+    """Excel TEXT 函數的常見格式；無法處理的格式拋出 UnsupportedExpression"""
+    if format_code.upper() in ('', 'GENERAL', '@'):
+        return to_text(value)
+    number = to_number(value) if not isinstance(value, str) or value.strip() else value
+    if not isinstance(number, float):
+        # 文字值：只有 @ 區段會套用，其他格式保持原樣
+        return to_text(value)
+
+    unquoted = re.sub(r'"[^"]*"|\\.', '', format_code)
+    if re.search(r'[yYdD]', unquoted) or (re.search(r'[mM]', unquoted) and not re.search(r'[0#]', unquoted)):
+        return _format_date(number, format_code)
+
+    sections = _split_format_sections(format_code)
+    if number < 0 and len(sections) > 1:
+        return _format_number_section(-number, sections[1])
+    if number == 0 and len(sections) > 2:
+        return _format_number_section(number, sections[2])
+    return _format_number_section(number, sections[0])
+
+
+# ---------------------------------------------------------------------------
+# Evaluator
+# ---------------------------------------------------------------------------
+
+class EvaluationContext:
+    """運算式所在的位置（用於 ROW()/COLUMN() 與未指定工作表的引用）"""
+
+    __slots__ = ('workbook_path', 'sheet_name', 'row', 'col')
+
+    def __init__(self, workbook_path, sheet_name, cell_address=None):
+        self.workbook_path = workbook_path
+        self.sheet_name = sheet_name
+        self.row = None
+        self.col = None
+        if cell_address:
+            match = re.match(r'^\$?([A-Za-z]{1,3})\$?(\d+)', cell_address.strip())
+            if match:
+                self.col = col_letters_to_num(match.group(1))
+                self.row = int(match.group(2))
+
+
+class NativeFormulaEvaluator:
+    """
+    原生 Excel 運算式計算器
+    所有儲存格值來自 sheet_value_cache（data_only 的已計算值），不啟動 Excel
+    """
+
+    # 函數名稱 -> 方法名稱
+    FUNCTIONS = {
+        'MATCH': '_fn_match',
+        'XMATCH': '_fn_xmatch',
+        'XLOOKUP': '_fn_xlookup',
+        'INDEX': '_fn_index',
+        'OFFSET': '_fn_offset',
+        'ROW': '_fn_row',
+        'COLUMN': '_fn_column',
+        'ROWS': '_fn_rows',
+        'COLUMNS': '_fn_columns',
+        'ABS': '_fn_abs',
+        'INT': '_fn_int',
+        'MOD': '_fn_mod',
+        'ROUND': '_fn_round',
+        'SUM': '_fn_sum',
+        'MIN': '_fn_min',
+        'MAX': '_fn_max',
+        'ADDRESS': '_fn_address',
+        'TEXT': '_fn_text',
+        'CHAR': '_fn_char',
+        'SUBSTITUTE': '_fn_substitute',
+        'LEFT': '_fn_left',
+        'RIGHT': '_fn_right',
+        'MID': '_fn_mid',
+        'LEN': '_fn_len',
+        'TRIM': '_fn_trim',
+        'UPPER': '_fn_upper',
+        'LOWER': '_fn_lower',
+        'VALUE': '_fn_value',
+        'CONCATENATE': '_fn_concatenate',
+    }
+
+    def __init__(self):
+        self._ast_cache = {}
+        self._stats = {'evaluations': 0, 'unsupported': 0}
+
+    # ---- public API ----
+
+    def evaluate(self, expression, workbook_path, sheet_name, cell_address=None):
+        """
+        計算運算式並返回純量結果（引用會被取值）
+
+        Raises:
+            UnsupportedExpression: 需要改用 Excel COM 計算
+        """
+        context = EvaluationContext(workbook_path, sheet_name, cell_address)
+        try:
+            result = self.evaluate_node(self._parse(expression), context)
+            self._stats['evaluations'] += 1
+            return self.to_scalar(result)
+        except UnsupportedExpression:
+            self._stats['unsupported'] += 1
+            raise
+        except (RecursionError, OverflowError) as e:
+            self._stats['unsupported'] += 1
+            raise UnsupportedExpression(str(e))
+
+    def evaluate_reference(self, expression, workbook_path, sheet_name, cell_address=None):
+        """計算運算式並要求結果為引用（CellRange），否則拋出 UnsupportedExpression"""
+        result = self.evaluate_raw(expression, workbook_path, sheet_name, cell_address)
+        if not isinstance(result, CellRange):
+            raise UnsupportedExpression("運算結果不是引用")
+        return result
+
+    def evaluate_raw(self, expression, workbook_path, sheet_name, cell_address=None):
+        """計算運算式，引用結果保持為 CellRange（不取值），其他結果原樣返回"""
+        context = EvaluationContext(workbook_path, sheet_name, cell_address)
+        return self.evaluate_node(self._parse(expression), context)
+
+    def calculate(self, expression, workbook_path, sheet_name, cell_address=None):
+        """
+        與 ExcelComManager.calculate_safely 相同格式的結果字典
+        UnsupportedExpression 會向上拋出，讓呼叫端改用 COM
+        """
+        result = self.evaluate(expression, workbook_path, sheet_name, cell_address)
+        if result is None:
+            return {'success': False, 'error': '計算結果為空', 'indirect_content': expression, 'engine': 'native'}
+        if isinstance(result, ExcelError):
+            return {'success': False, 'error': f'Excel計算錯誤: {result}', 'indirect_content': expression, 'engine': 'native'}
+        return {
+            'success': True,
+            'static_reference': str(result).strip(),
+            'calculation_result': result,
+            'indirect_content': expression,
+            'engine': 'native'
+        }
+
+    def get_stats(self):
+        return self._stats.copy()
+
+    # ---- parsing ----
+
+    def _parse(self, expression):
+        ast = self._ast_cache.get(expression)
+        if ast is None:
+            ast = parse_expression(expression)
+            if len(self._ast_cache) > 4096:
+                self._ast_cache.clear()
+            self._ast_cache[expression] = ast
+        return ast
+
+    # ---- evaluation ----
+
+    def evaluate_node(self, node, context):
+        kind = node[0]
+        if kind == 'value':
+            return node[1]
+        if kind == 'ref':
+            return self.resolve_reference_text(node[1], context)
+        if kind == 'func':
+            return self.call_function(node[1], node[2], context)
+        if kind == 'binop':
+            return self._binary(node[1], self.evaluate_node(node[2], context), self.evaluate_node(node[3], context))
+        if kind == 'neg':
+            value = to_number(self.to_scalar(self.evaluate_node(node[1], context)))
+            return value if isinstance(value, ExcelError) else -value
+        if kind == 'percent':
+            value = to_number(self.to_scalar(self.evaluate_node(node[1], context)))
+            return value if isinstance(value, ExcelError) else value / 100.0
+        if kind == 'missing':
+            return None
+        raise UnsupportedExpression(f"未知節點: {kind}")
+
+    def call_function(self, name, arg_nodes, context):
+        if name.startswith('_XLFN.'):  # 新版函數在檔案中以 _xlfn. 前綴保存
+            name = name[len('_XLFN.'):]
+        if name == 'MATCH' and len(arg_nodes) >= 2 and self._criteria_leaves(arg_nodes[1]):
+            return self._criteria_match(arg_nodes, context)
+        method_name = self.FUNCTIONS.get(name)
+        if method_name is None:
+            raise UnsupportedExpression(f"不支援的函數: {name}")
+        args = [self.evaluate_node(arg, context) for arg in arg_nodes]
+        return getattr(self, method_name)(args, context)
+
+    def _binary(self, op, left, right):
+        left = self.to_scalar(left)
+        right = self.to_scalar(right)
+        if op == '&':
+            for value in (left, right):
+                if isinstance(value, ExcelError):
+                    return value
+            return to_text(left) + to_text(right)
+        if op in ('=', '<>', '<', '>', '<=', '>='):
+            for value in (left, right):
+                if isinstance(value, ExcelError):
+                    return value
+            cmp = compare_values(left, right)
+            return {
+                '=': cmp == 0, '<>': cmp != 0, '<': cmp < 0,
+                '>': cmp > 0, '<=': cmp <= 0, '>=': cmp >= 0
+            }[op]
+
+        left = to_number(left)
+        right = to_number(right)
+        if isinstance(left, ExcelError):
+            return left
+        if isinstance(right, ExcelError):
+            return right
+        if op == '+':
+            return left + right
+        if op == '-':
+            return left - right
+        if op == '*':
+            return left * right
+        if op == '/':
+            return ERROR_DIV0 if right == 0 else left / right
+        if op == '^':
+            try:
+                result = left ** right
+            except (OverflowError, ZeroDivisionError):
+                return ERROR_NUM
+            return ERROR_NUM if isinstance(result, complex) else float(result)
+        raise UnsupportedExpression(f"不支援的運算子: {op}")
+
+    # ---- references ----
+
+    def resolve_reference_text(self, text, context):
+        """把引用文字（可含工作表/外部檔案前綴）轉為 CellRange"""
+        workbook_path = context.workbook_path
+        sheet_name = context.sheet_name
+        body = text
+        if '!' in text:
+            prefix, body = text.rsplit('!', 1)
+            workbook_path, sheet_name = self._resolve_prefix(prefix, context)
+        return self._parse_ref_body(body, workbook_path, sheet_name)
+
+    def _resolve_prefix(self, prefix, context):
+        prefix = prefix.strip()
+        if prefix.startswith("'") and prefix.endswith("'"):
+            prefix = prefix[1:-1].replace("''", "'")
+        if '[' in prefix and ']' in prefix:
+            dir_part, rest = prefix.split('[', 1)
+            file_name, sheet_name = rest.split(']', 1)
+            dir_part = dir_part.replace('\\\\', '\\')
+            if dir_part:
+                workbook_path = os.path.join(dir_part, file_name)
+            elif file_name.lower() == os.path.basename(context.workbook_path).lower():
+                workbook_path = context.workbook_path
+            else:
+                workbook_path = os.path.join(os.path.dirname(context.workbook_path), file_name)
+            if not os.path.exists(workbook_path):
+                # 外部檔案不在磁碟上：只有 Excel 的連結快取能計算
+                raise UnsupportedExpression(f"外部檔案不存在: {workbook_path}")
+            return workbook_path, sheet_name
+        return context.workbook_path, prefix
+
+    def _parse_ref_body(self, body, workbook_path, sheet_name):
+        clean = body.replace('$', '').upper()
+        if ':' in clean:
+            start, end = clean.split(':', 1)
+        else:
+            start, end = clean, clean
+        if start.isdigit() and end.isdigit():
+            return CellRange(workbook_path, sheet_name, int(start), 1, int(end), EXCEL_MAX_COLUMNS)
+        if start.isalpha() and end.isalpha():
+            return CellRange(workbook_path, sheet_name, 1, col_letters_to_num(start), EXCEL_MAX_ROWS, col_letters_to_num(end))
+        start_match = re.match(r'^([A-Z]{1,3})(\d+)$', start)
+        end_match = re.match(r'^([A-Z]{1,3})(\d+)$', end)
+        if not start_match or not end_match:
+            raise UnsupportedExpression(f"無法解析引用: {body}")
+        return CellRange(
+            workbook_path, sheet_name,
+            int(start_match.group(2)), col_letters_to_num(start_match.group(1)),
+            int(end_match.group(2)), col_letters_to_num(end_match.group(1))
+        )
+
+    def sheet_values(self, cell_range):
+        """取得範圍所屬工作表的值快照；工作表不存在時返回 None"""
+        try:
+            return get_sheet_values(cell_range.workbook_path, cell_range.sheet_name)
+        except FileNotFoundError:
+            raise UnsupportedExpression(f"檔案不存在: {cell_range.workbook_path}")
+
+    def range_values(self, cell_range):
+        """取得範圍內的值（list of lists，已轉為內部型別）"""
+        sheet = self.sheet_values(cell_range)
+        if sheet is None:
+            return ERROR_REF
+        return [[normalize_cell_value(v) for v in row]
+                for row in sheet.get_range(cell_range.min_row, cell_range.min_col,
+                                           cell_range.max_row, cell_range.max_col)]
+
+    def vector_values(self, cell_range):
+        """取得單欄或單列範圍的值（list）；二維範圍返回 None"""
+        sheet = self.sheet_values(cell_range)
+        if sheet is None:
+            return ERROR_REF
+        if cell_range.columns == 1:
+            raw = sheet.column(cell_range.min_col, cell_range.min_row, cell_range.max_row)
+        elif cell_range.rows == 1:
+            raw = sheet.row(cell_range.min_row, cell_range.min_col, cell_range.max_col)
+        else:
+            return None
+        return [normalize_cell_value(v) for v in raw]
+
+    def to_scalar(self, value):
+        """把引用轉為純量值；多格範圍在純量位置不支援（需要隱含交集）"""
+        if isinstance(value, CellRange):
+            if not value.is_cell:
+                raise UnsupportedExpression("多格範圍不能作為純量使用")
+            sheet = self.sheet_values(value)
+            if sheet is None:
+                return ERROR_REF
+            return normalize_cell_value(sheet.get(value.min_row, value.min_col))
+        if isinstance(value, list):
+            raise UnsupportedExpression("陣列不能作為純量使用")
+        return value
+
+    def _number_arg(self, args, index, default=None):
+        if index >= len(args) or args[index] is None:
+            if default is None:
+                raise UnsupportedExpression("缺少必要參數")
+            return default
+        return to_number(self.to_scalar(args[index]))
+
+    def _text_arg(self, args, index, default=None):
+        if index >= len(args) or args[index] is None:
+            if default is None:
+                raise UnsupportedExpression("缺少必要參數")
+            return default
+        value = self.to_scalar(args[index])
+        return value if isinstance(value, ExcelError) else to_text(value)
+
+    def _iter_numbers(self, args):
+        for arg in args:
+            if isinstance(arg, CellRange):
+                values = self.range_values(arg)
+                if isinstance(values, ExcelError):
+                    yield values
+                    continue
+                for row in values:
+                    for value in row:
+                        if isinstance(value, (float, ExcelError)) and not isinstance(value, bool):
+                            yield value
+            elif arg is not None:
+                yield to_number(arg)
+
+    # ---- functions ----
+
+    def _fn_match(self, args, context):
+        if len(args) < 2:
+            raise UnsupportedExpression("MATCH 參數不足")
+        lookup_value = self.to_scalar(args[0])
+        if isinstance(lookup_value, ExcelError):
+            return lookup_value
+        if not isinstance(args[1], CellRange):
+            raise UnsupportedExpression("MATCH 只支援儲存格範圍")
+        match_type = self._number_arg(args, 2, 1.0)
+        if isinstance(match_type, ExcelError):
+            return match_type
+        return self.match(lookup_value, args[1], match_type)
+
+    def _criteria_leaves(self, node):
+        """
+        MATCH 的第二參數若為條件乘積 (A:A=x)*(B:B=y)*...，返回各比較節點；否則返回 None
+        """
+        while node[0] == 'neg' and node[1][0] == 'neg':  # --(A:A=x)
+            node = node[1][1]
+        if node[0] != 'binop':
+            return None
+        if node[1] == '*':
+            left = self._criteria_leaves(node[2])
+            right = self._criteria_leaves(node[3])
+            return left + right if left and right else None
+        if node[1] in ('=', '<>', '<', '>', '<=', '>='):
+            return [node]
+        return None
+
+    def _criteria_coerced(self, node):
+        """條件陣列是否已轉為數字（條件乘積或 --）；單一比較的結果是 TRUE/FALSE"""
+        return node[0] == 'neg' or node[1] == '*'
+
+    def _criteria_match(self, arg_nodes, context):
+        """MATCH(1, (範圍=值)*(範圍=值)..., 0)：以向量化的多條件快取計算"""
+        from utils.criteria_match import get_criteria_match_cache, FLIPPED_OPERATORS
+
+        lookup_value = self.to_scalar(self.evaluate_node(arg_nodes[0], context))
+        if isinstance(lookup_value, ExcelError):
+            return lookup_value
+        match_type = 1.0
+        if len(arg_nodes) > 2 and arg_nodes[2][0] != 'missing':
+            match_type = to_number(self.to_scalar(self.evaluate_node(arg_nodes[2], context)))
+            if isinstance(match_type, ExcelError):
+                return match_type
+        if match_type != 0:
+            raise UnsupportedExpression("多條件 MATCH 只支援精確匹配")
+        if lookup_value is None:
+            lookup_value = 0.0
+        # 乘積或 -- 得到 1/0 的數字陣列，只能以數字查找；單一比較得到 TRUE/FALSE，只能以布林值查找
+        if self._criteria_coerced(arg_nodes[1]):
+            if isinstance(lookup_value, bool) or not isinstance(lookup_value, float):
+                return ERROR_NA
+            target = lookup_value
+        else:
+            if not isinstance(lookup_value, bool):
+                return ERROR_NA
+            target = 1.0 if lookup_value else 0.0
+        if target not in (0.0, 1.0):
+            return ERROR_NA
+
+        criteria = []
+        orientation = None
+        for _, operator, left_node, right_node in self._criteria_leaves(arg_nodes[1]):
+            left = self.evaluate_node(left_node, context)
+            right = self.evaluate_node(right_node, context)
+            left_is_range = isinstance(left, CellRange) and not left.is_cell
+            right_is_range = isinstance(right, CellRange) and not right.is_cell
+            if left_is_range == right_is_range:
+                raise UnsupportedExpression("每個條件必須是一個範圍與一個值的比較")
+            if right_is_range:
+                left, right, operator = right, left, FLIPPED_OPERATORS[operator]
+            if left.columns != 1 and left.rows != 1:
+                raise UnsupportedExpression("條件範圍必須是單欄或單列")
+            range_orientation = 'column' if left.columns == 1 else 'row'
+            if orientation not in (None, range_orientation):
+                raise UnsupportedExpression("條件範圍方向不一致")
+            orientation = range_orientation
+            if self.sheet_values(left) is None:
+                return ERROR_REF
+            value = self.to_scalar(right)
+            if isinstance(value, ExcelError):
+                return ERROR_NA
+            criteria.append((left, operator, value))
+
+        position = get_criteria_match_cache().find_first(criteria, target == 1.0)
+        return ERROR_NA if position is None else float(position + 1)
+
+    def match(self, lookup_value, cell_range, match_type=0):
+        """MATCH 語意：返回 1-based 位置（float）或 #N/A / #REF!"""
+        if cell_range.columns != 1 and cell_range.rows != 1:
+            return ERROR_NA
+        if self.sheet_values(cell_range) is None:
+            return ERROR_REF
+        if lookup_value is None:
+            lookup_value = 0.0
+
+        # 使用共用的查找索引（每個查找欄只建立一次）
+        from utils.lookup_index import get_lookup_index_cache
+        if match_type == 0:
+            if has_wildcards(lookup_value):
+                position = match_exact(lookup_value, self.vector_values(cell_range))
+            else:
+                position = get_lookup_index_cache().find_exact(cell_range, lookup_value)
+        else:
+            position = get_lookup_index_cache().find_approximate(cell_range, lookup_value, 1 if match_type > 0 else -1)
+        return ERROR_NA if position is None else float(position + 1)
+
+    def match_position(self, lookup_expression, range_expression, workbook_path, sheet_name, cell_address=None, match_type=0):
+        """
+        計算 MATCH(lookup_expression, range_expression, match_type)，
+        range_expression 為引用文字（可含工作表/外部檔案前綴）
+
+        Returns:
+            與 calculate 相同格式的結果字典
+        """
+        context = EvaluationContext(workbook_path, sheet_name, cell_address)
+        content = f"MATCH({lookup_expression}, {range_expression}, {match_type})"
+        lookup_value = self.to_scalar(self.evaluate_node(self._parse(lookup_expression), context))
+        if isinstance(lookup_value, ExcelError):
+            position = lookup_value
+        else:
+            cell_range = self.resolve_reference_text(range_expression.strip(), context)
+            position = self.match(lookup_value, cell_range, match_type)
+        self._stats['evaluations'] += 1
+        if isinstance(position, ExcelError):
+            return {'success': False, 'error': f'Excel計算錯誤: {position}', 'indirect_content': content, 'engine': 'native'}
+        return {
+            'success': True,
+            'static_reference': str(position),
+            'calculation_result': position,
+            'indirect_content': content,
+            'engine': 'native'
+        }
+
+    def _xmatch_modes(self, args, match_index):
+        """讀取 XMATCH / XLOOKUP 的 match_mode 與 search_mode 參數"""
+        match_mode = self._number_arg(args, match_index, 0.0)
+        search_mode = self._number_arg(args, match_index + 1, 1.0)
+        for value in (match_mode, search_mode):
+            if isinstance(value, ExcelError):
+                return value
+        if match_mode not in (0, -1, 1, 2) or search_mode not in (1, -1, 2, -2):
+            return ERROR_VALUE
+        return int(match_mode), int(search_mode)
+
+    def xmatch(self, lookup_value, cell_range, match_mode=0, search_mode=1):
+        """XMATCH 語意：返回 0-based 位置或 None（使用共用的查找索引）"""
+        if match_mode == 2:
+            values = self.vector_values(cell_range)
+            if not isinstance(lookup_value, str):
+                lookup_value = to_text(lookup_value)
+            regex = wildcard_to_regex(lookup_value)
+            order = range(len(values) - 1, -1, -1) if search_mode == -1 else range(len(values))
+            for i in order:
+                value = values[i]
+                if value is not None and not isinstance(value, ExcelError) and regex.match(to_text(value)):
+                    return i
+            return None
+        from utils.lookup_index import get_lookup_index_cache
+        return get_lookup_index_cache().find_xmatch(cell_range, lookup_value, match_mode, search_mode)
+
+    def _fn_xmatch(self, args, context):
+        if len(args) < 2:
+            raise UnsupportedExpression("XMATCH 參數不足")
+        lookup_value = self.to_scalar(args[0])
+        if isinstance(lookup_value, ExcelError):
+            return lookup_value
+        lookup_range = args[1]
+        if not isinstance(lookup_range, CellRange):
+            raise UnsupportedExpression("XMATCH 只支援儲存格範圍")
+        if lookup_range.columns != 1 and lookup_range.rows != 1:
+            return ERROR_VALUE
+        modes = self._xmatch_modes(args, 2)
+        if isinstance(modes, ExcelError):
+            return modes
+        if self.sheet_values(lookup_range) is None:
+            return ERROR_REF
+        position = self.xmatch(lookup_value, lookup_range, *modes)
+        return ERROR_NA if position is None else float(position + 1)
+
+    def _fn_xlookup(self, args, context):
+        """XLOOKUP 返回引用（return_array 中對應的儲存格 / 列 / 欄），找不到時返回 if_not_found"""
+        if len(args) < 3:
+            raise UnsupportedExpression("XLOOKUP 參數不足")
+        lookup_value = self.to_scalar(args[0])
+        if isinstance(lookup_value, ExcelError):
+            return lookup_value
+        lookup_range, return_range = args[1], args[2]
+        if not isinstance(lookup_range, CellRange) or not isinstance(return_range, CellRange):
+            raise UnsupportedExpression("XLOOKUP 只支援儲存格範圍")
+        if lookup_range.columns != 1 and lookup_range.rows != 1:
+            return ERROR_VALUE
+        vertical = lookup_range.columns == 1 and (lookup_range.rows > 1 or return_range.rows == lookup_range.rows)
+        if (vertical and return_range.rows != lookup_range.rows) or \
+                (not vertical and return_range.columns != lookup_range.columns):
+            return ERROR_VALUE
+        modes = self._xmatch_modes(args, 4)
+        if isinstance(modes, ExcelError):
+            return modes
+        if self.sheet_values(lookup_range) is None:
+            return ERROR_REF
+
+        position = self.xmatch(lookup_value, lookup_range, *modes)
+        if position is None:
+            if len(args) > 3 and args[3] is not None:
+                return args[3]
+            return ERROR_NA
+        if vertical:
+            row = return_range.min_row + position
+            return CellRange(return_range.workbook_path, return_range.sheet_name,
+                             row, return_range.min_col, row, return_range.max_col)
+        col = return_range.min_col + position
+        return CellRange(return_range.workbook_path, return_range.sheet_name,
+                         return_range.min_row, col, return_range.max_row, col)
+
+    def _fn_index(self, args, context):
+        if len(args) < 2:
+            raise UnsupportedExpression("INDEX 參數不足")
+        reference = args[0]
+        if not isinstance(reference, CellRange):
+            raise UnsupportedExpression("INDEX 只支援儲存格範圍")
+        row_num = self._number_arg(args, 1, 0.0)
+        col_num = self._number_arg(args, 2, 0.0)
+        if len(args) > 3 and args[3] is not None:
+            raise UnsupportedExpression("INDEX 不支援多區域參數")
+        for value in (row_num, col_num):
+            if isinstance(value, ExcelError):
+                return value
+        row_num = int(row_num)
+        col_num = int(col_num)
+
+        # 單列範圍只給一個索引時，該索引代表欄
+        if len(args) == 2 and reference.rows == 1 and reference.columns > 1:
+            row_num, col_num = 1, row_num
+        if row_num < 0 or col_num < 0 or row_num > reference.rows or col_num > reference.columns:
+            return ERROR_REF
+
+        min_row = reference.min_row if row_num == 0 else reference.min_row + row_num - 1
+        max_row = reference.max_row if row_num == 0 else min_row
+        min_col = reference.min_col if col_num == 0 else reference.min_col + col_num - 1
+        max_col = reference.max_col if col_num == 0 else min_col
+        return CellRange(reference.workbook_path, reference.sheet_name, min_row, min_col, max_row, max_col)
+
+    def _fn_offset(self, args, context):
+        if len(args) < 3:
+            raise UnsupportedExpression("OFFSET 參數不足")
+        reference = args[0]
+        if not isinstance(reference, CellRange):
+            return ERROR_VALUE
+        rows = self._number_arg(args, 1, 0.0)
+        cols = self._number_arg(args, 2, 0.0)
+        height = self._number_arg(args, 3, float(reference.rows))
+        width = self._number_arg(args, 4, float(reference.columns))
+        for value in (rows, cols, height, width):
+            if isinstance(value, ExcelError):
+                return value
+        rows, cols, height, width = int(rows), int(cols), int(height), int(width)
+        if height == 0 or width == 0:
+            return ERROR_REF
+
+        min_row = reference.min_row + rows
+        min_col = reference.min_col + cols
+        # 負的高度/寬度向上/向左延伸
+        max_row = min_row + height - 1 if height > 0 else min_row + height + 1
+        max_col = min_col + width - 1 if width > 0 else min_col + width + 1
+        for row in (min_row, max_row):
+            if not 1 <= row <= EXCEL_MAX_ROWS:
+                return ERROR_REF
+        for col in (min_col, max_col):
+            if not 1 <= col <= EXCEL_MAX_COLUMNS:
+                return ERROR_REF
+        return CellRange(reference.workbook_path, reference.sheet_name, min_row, min_col, max_row, max_col)
+
+    def _fn_row(self, args, context):
+        if not args or args[0] is None:
+            if context.row is None:
+                raise UnsupportedExpression("ROW() 需要儲存格位置")
+            return float(context.row)
+        if not isinstance(args[0], CellRange):
+            return ERROR_VALUE
+        return float(args[0].min_row)
+
+    def _fn_column(self, args, context):
+        if not args or args[0] is None:
+            if context.col is None:
+                raise UnsupportedExpression("COLUMN() 需要儲存格位置")
+            return float(context.col)
+        if not isinstance(args[0], CellRange):
+            return ERROR_VALUE
+        return float(args[0].min_col)
+
+    def _fn_rows(self, args, context):
+        if not args or not isinstance(args[0], CellRange):
+            raise UnsupportedExpression("ROWS 只支援儲存格範圍")
+        return float(args[0].rows)
+
+    def _fn_columns(self, args, context):
+        if not args or not isinstance(args[0], CellRange):
+            raise UnsupportedExpression("COLUMNS 只支援儲存格範圍")
+        return float(args[0].columns)
+
+    def _fn_abs(self, args, context):
+        value = self._number_arg(args, 0)
+        return value if isinstance(value, ExcelError) else abs(value)
+
+    def _fn_int(self, args, context):
+        value = self._number_arg(args, 0)
+        return value if isinstance(value, ExcelError) else float(math.floor(value))
+
+    def _fn_mod(self, args, context):
+        number = self._number_arg(args, 0)
+        divisor = self._number_arg(args, 1)
+        for value in (number, divisor):
+            if isinstance(value, ExcelError):
+                return value
+        if divisor == 0:
+            return ERROR_DIV0
+        return number - divisor * math.floor(number / divisor)
+
+    def _fn_round(self, args, context):
+        number = self._number_arg(args, 0)
+        digits = self._number_arg(args, 1, 0.0)
+        for value in (number, digits):
+            if isinstance(value, ExcelError):
+                return value
+        factor = 10.0 ** int(digits)
+        # Excel 四捨五入（遠離零），不是銀行家捨入
+        return math.copysign(math.floor(abs(number) * factor + 0.5) / factor, number)
+
+    def _fn_sum(self, args, context):
+        total = 0.0
+        for value in self._iter_numbers(args):
+            if isinstance(value, ExcelError):
+                return value
+            total += value
+        return total
+
+    def _fn_min(self, args, context):
+        numbers = list(self._iter_numbers(args))
+        for value in numbers:
+            if isinstance(value, ExcelError):
+                return value
+        return min(numbers) if numbers else 0.0
+
+    def _fn_max(self, args, context):
+        numbers = list(self._iter_numbers(args))
+        for value in numbers:
+            if isinstance(value, ExcelError):
+                return value
+        return max(numbers) if numbers else 0.0
+
+
+    def _fn_address(self, args, context):
+        row_num = self._number_arg(args, 0)
+        col_num = self._number_arg(args, 1)
+        abs_num = self._number_arg(args, 2, 1.0)
+        a1_style = True
+        if len(args) > 3 and args[3] is not None:
+            a1_style = to_bool(self.to_scalar(args[3]))
+        sheet_text = self._text_arg(args, 4, '')
+        for value in (row_num, col_num, abs_num, a1_style, sheet_text):
+            if isinstance(value, ExcelError):
+                return value
+        row_num, col_num, abs_num = int(row_num), int(col_num), int(abs_num)
+        if not (1 <= row_num <= EXCEL_MAX_ROWS and 1 <= col_num <= EXCEL_MAX_COLUMNS and 1 <= abs_num <= 4):
+            return ERROR_VALUE
+
+        row_absolute = abs_num in (1, 2)
+        col_absolute = abs_num in (1, 3)
+        if a1_style:
+            address = (('$' if col_absolute else '') + col_num_to_letters(col_num) +
+                       ('$' if row_absolute else '') + str(row_num))
+        else:
+            address = (f"R{row_num}" if row_absolute else f"R[{row_num}]") + \
+                      (f"C{col_num}" if col_absolute else f"C[{col_num}]")
+        if sheet_text:
+            return f"{quote_sheet_name(sheet_text)}!{address}"
+        return address
+
+    def _fn_text(self, args, context):
+        if len(args) < 2:
+            raise UnsupportedExpression("TEXT 參數不足")
+        value = self.to_scalar(args[0])
+        format_code = self._text_arg(args, 1, '')
+        for item in (value, format_code):
+            if isinstance(item, ExcelError):
+                return item
+        return format_text(value, format_code)
+
+    def _fn_char(self, args, context):
+        number = self._number_arg(args, 0)
+        if isinstance(number, ExcelError):
+            return number
+        number = int(number)
+        if not 1 <= number <= 255:
+            return ERROR_VALUE
+        return bytes([number]).decode('cp1252', errors='replace')
+
+    def _fn_substitute(self, args, context):
+        text = self._text_arg(args, 0)
+        old_text = self._text_arg(args, 1)
+        new_text = self._text_arg(args, 2, '')
+        for value in (text, old_text, new_text):
+            if isinstance(value, ExcelError):
+                return value
+        if not old_text:
+            return text
+        if len(args) > 3 and args[3] is not None:
+            instance = self._number_arg(args, 3)
+            if isinstance(instance, ExcelError):
+                return instance
+            instance = int(instance)
+            if instance < 1:
+                return ERROR_VALUE
+            position = -1
+            for _ in range(instance):
+                position = text.find(old_text, position + 1)
+                if position == -1:
+                    return text
+            return text[:position] + new_text + text[position + len(old_text):]
+        return text.replace(old_text, new_text)
+
+    def _fn_left(self, args, context):
+        text = self._text_arg(args, 0)
+        count = self._number_arg(args, 1, 1.0)
+        for value in (text, count):
+            if isinstance(value, ExcelError):
+                return value
+        if count < 0:
+            return ERROR_VALUE
+        return text[:int(count)]
+
+    def _fn_right(self, args, context):
+        text = self._text_arg(args, 0)
+        count = self._number_arg(args, 1, 1.0)
+        for value in (text, count):
+            if isinstance(value, ExcelError):
+                return value
+        if count < 0:
+            return ERROR_VALUE
+        count = int(count)
+        return text[-count:] if count else ''
+
+    def _fn_mid(self, args, context):
+        text = self._text_arg(args, 0)
+        start = self._number_arg(args, 1)
+        count = self._number_arg(args, 2)
+        for value in (text, start, count):
+            if isinstance(value, ExcelError):
+                return value
+        if start < 1 or count < 0:
+            return ERROR_VALUE
+        start = int(start)
+        return text[start - 1:start - 1 + int(count)]
+
+    def _fn_len(self, args, context):
+        text = self._text_arg(args, 0)
+        return text if isinstance(text, ExcelError) else float(len(text))
+
+    def _fn_trim(self, args, context):
+        text = self._text_arg(args, 0)
+        return text if isinstance(text, ExcelError) else ' '.join(part for part in text.split(' ') if part)
+
+    def _fn_upper(self, args, context):
+        text = self._text_arg(args, 0)
+        return text if isinstance(text, ExcelError) else text.upper()
+
+    def _fn_lower(self, args, context):
+        text = self._text_arg(args, 0)
+        return text if isinstance(text, ExcelError) else text.lower()
+
+    def _fn_value(self, args, context):
+        return self._number_arg(args, 0)
+
+    def _fn_concatenate(self, args, context):
+        result = ''
+        for index in range(len(args)):
+            text = self._text_arg(args, index, '')
+            if isinstance(text, ExcelError):
+                return text
+            result += text
+        return result
+
+# 全域實例（解析結果快取在實例上）
+_native_evaluator = None
+
+
+def get_native_evaluator():
+    """獲取全域原生計算器實例"""
+    global _native_evaluator
+    if _native_evaluator is None:
+        _native_evaluator = NativeFormulaEvaluator()
+    return _native_evaluator
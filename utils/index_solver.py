@@ -24,6 +24,9 @@ class IndexSolver:
             if not index_functions:
                 return {'success': False, 'error': 'No INDEX functions found'}
             
+            # 本節點所有需要計算的 row/col 參數先排入佇列，一次批次計算
+            self._prefetch_index_parameters(index_functions, workbook_path, sheet_name, cell_address)
+            
             resolved_formula = formula
             static_references = []
             calculation_details = []
@@ -108,6 +111,19 @@ class IndexSolver:
             self.progress_callback.update_progress(f"[INDEX-SIMPLE] 解析異常: {e}")
             return {'success': False, 'error': str(e), 'original_formula': formula, 'internal_references': []}
 
+    def _prefetch_index_parameters(self, index_functions, workbook_path, sheet_name, cell_address):
+        """收集非數字的 row/col 參數，交給 ExcelComManager 一次計算"""
+        expressions = []
+        for index_func in index_functions:
+            params_result = self._extract_index_parameters_accurate_debug(index_func['content'])
+            if not params_result['success']:
+                continue
+            for param in (params_result['row'], params_result['column']):
+                if not self._is_simple_number(param):
+                    expressions.append(param)
+        if expressions:
+            self.excel_manager.prefetch_expressions(expressions, workbook_path, sheet_name, cell_address)
+
     def _is_simple_number(self, param):
         """檢查是否為簡單數字"""
         try:
@@ -301,12 +317,13 @@ class IndexSolver:
     
     def _parse_cell_address_debug(self, cell_address):
         """解析儲存格地址為列號和行號"""
-        match = re.match(r'([A-Z]+)(\d+)', cell_address.upper())
-        if not match:
+        # 整欄 (C:C) / 整列 (5:5) 範圍的起點分別為第 1 列 / 第 A 欄
+        match = re.match(r'([A-Z]*)(\d*)$', cell_address.strip().upper())
+        if not match or not (match.group(1) or match.group(2)):
             raise ValueError(f"Invalid cell address: {cell_address}")
         
-        col_letters = match.group(1)
-        row_num = int(match.group(2))
+        col_letters = match.group(1) or 'A'
+        row_num = int(match.group(2) or 1)
         
         col_num = 0
         for char in col_letters:
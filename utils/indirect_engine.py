@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""
+INDIRECT Engine - 唯一的 INDIRECT 解析引擎
+取代舊的 IndirectProcessor / SimpleIndirectResolver / core_indirect_resolver /
+pure_indirect_logic 四套實作：
+- INDIRECT 參數由原生計算器在共用的工作簿快取上計算，不再每次完整載入工作簿
+- 原生計算不支援時才交給 ExcelComManager（同一公式的多個參數一次批次計算）
+- 結果記憶在所有解析器共用的計算結果記憶 (utils.calculation_memo)
+"""
+
+import os
+import threading
+
+from utils.calculation_memo import get_calculation_memo
+from utils.formula_evaluator import (
+    get_native_evaluator, UnsupportedExpression, ExcelError, quote_sheet_name, to_text
+)
+
+
+class IndirectEngine:
+    """
+    INDIRECT 解析引擎（執行緒安全，結果存放在共用的計算結果記憶）
+    """
+
+    # 記憶命名空間：INDIRECT 參數結果以 Excel 文字格式保存，與一般運算式結果分開
+    MEMO_NAMESPACE = 'indirect'
+
+    def __init__(self, memo=None):
+        self.memo = memo or get_calculation_memo()
+        self.lock = threading.RLock()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'native': 0,
+            'com': 0,
+            'failures': 0
+        }
+
+    # ---- public API ----
+
+    def resolve_formula(self, formula, workbook_path, sheet_name, cell_address, excel_manager=None):
+        """
+        將公式中所有 INDIRECT(...) 替換為靜態引用
+
+        Args:
+            formula: 公式字串 (例如: =SUM(INDIRECT(D32&"!A8")))
+            workbook_path: 公式所在的Excel文件路徑
+            sheet_name: 公式所在的工作表
+            cell_address: 公式所在的儲存格（ROW()/COLUMN() 需要）
+            excel_manager: 可選的 ExcelComManager，原生計算不支援時使用
+
+        Returns:
+            dict: {
+                'success': bool,
+                'resolved_formula': str,
+                'static_references': list[str],
+                'calculation_details': list[dict],
+                'original_formula': str,
+                'errors': list[str]
+            }
+        """
+        indirect_functions = self.extract_indirect_functions(formula or '')
+        if not indirect_functions:
+            return {'success': False, 'error': 'No INDIRECT functions found', 'original_formula': formula}
+
+        resolved_formula = formula
+        static_references = []
+        calculation_details = []
+        errors = []
+
+        calc_results = self.resolve_expressions(
+            [indirect_func['content'] for indirect_func in indirect_functions],
+            workbook_path, sheet_name, cell_address, excel_manager
+        )
+
+        for indirect_func, calc_result in zip(indirect_functions, calc_results):
+            if not calc_result['success']:
+                errors.append(calc_result.get('error', 'Unknown error'))
+                continue
+
+            static_ref = calc_result['static_reference']
+            if '!' in static_ref:
+                final_static_ref = static_ref
+            else:
+                final_static_ref = f"{quote_sheet_name(sheet_name)}!{static_ref}"
+
+            resolved_formula = resolved_formula.replace(indirect_func['full_function'], final_static_ref)
+            static_references.append(final_static_ref)
+            calculation_details.append({
+                'original_function': indirect_func['full_function'],
+                'content': indirect_func['content'],
+                'static_reference': final_static_ref,
+                'raw_excel_result': static_ref,
+                'engine': calc_result.get('engine', 'com')
+            })
+
+        return {
+            'success': len(static_references) > 0,
+            'resolved_formula': resolved_formula,
+            'static_references': static_references,
+            'calculation_details': calculation_details,
+            'original_formula': formula,
+            'errors': errors
+        }
+
+    def resolve_expression(self, indirect_content, workbook_path, sheet_name, cell_address, excel_manager=None):
+        """
+        計算單一 INDIRECT 參數，得到引用文字
+
+        Returns:
+            dict: 與 calculate_safely 相同格式 {'success', 'static_reference', 'engine', ...}
+        """
+        return self.resolve_expressions([indirect_content], workbook_path, sheet_name, cell_address, excel_manager)[0]
+
+    def resolve_expressions(self, contents, workbook_path, sheet_name, cell_address, excel_manager=None):
+        """
+        計算同一儲存格中的多個 INDIRECT 參數
+        先查記憶、再用原生計算；剩下需要 Excel 的參數以一次 calculate_batch 送出
+
+        Returns:
+            list[dict]: 順序與 contents 相同
+        """
+        results = [None] * len(contents)
+        memo_keys = [self._memo_key(content, workbook_path, sheet_name, cell_address) for content in contents]
+        pending = []
+        computed = []
+
+        for i, (content, memo_key) in enumerate(zip(contents, memo_keys)):
+            if memo_key is not None:
+                cached = self.memo.get(memo_key)
+                with self.lock:
+                    self._stats['hits' if cached is not None else 'misses'] += 1
+                if cached is not None:
+                    results[i] = cached
+                    continue
+
+            computed.append(i)
+            result = self._calculate_native(content, workbook_path, sheet_name, cell_address)
+            if result is None:
+                pending.append(i)
+            else:
+                results[i] = result
+
+        if pending:
+            com_results = self._calculate_with_manager(
+                [contents[i] for i in pending], workbook_path, sheet_name, cell_address, excel_manager
+            )
+            for i, result in zip(pending, com_results):
+                results[i] = result
+
+        for i in computed:
+            self.memo.put(memo_keys[i], results[i])
+        return results
+
+    def extract_indirect_functions(self, formula):
+        """提取公式中所有的 INDIRECT 函數（引號內的括號不計算）"""
+        indirect_functions = []
+        search_start = 0
+        formula_upper = formula.upper()
+
+        while True:
+            indirect_pos = formula_upper.find('INDIRECT(', search_start)
+            if indirect_pos == -1:
+                break
+
+            start_pos = indirect_pos + len('INDIRECT(')
+            bracket_count = 1
+            current_pos = start_pos
+            in_quotes = False
+
+            while current_pos < len(formula) and bracket_count > 0:
+                char = formula[current_pos]
+                if char == '"':
+                    in_quotes = not in_quotes
+                elif not in_quotes:
+                    if char == '(':
+                        bracket_count += 1
+                    elif char == ')':
+                        bracket_count -= 1
+                current_pos += 1
+
+            if bracket_count == 0:
+                indirect_functions.append({
+                    'full_function': formula[indirect_pos:current_pos],
+                    'content': formula[start_pos:current_pos - 1],
+                    'start_pos': indirect_pos,
+                    'end_pos': current_pos
+                })
+
+            search_start = current_pos
+
+        return indirect_functions
+
+    def get_stats(self):
+        with self.lock:
+            total_requests = self._stats['hits'] + self._stats['misses']
+            hit_rate = (self._stats['hits'] / total_requests * 100) if total_requests > 0 else 0
+            return {
+                'hit_rate_percent': round(hit_rate, 2),
+                'stats': self._stats.copy()
+            }
+
+    # ---- internals ----
+
+    def _memo_key(self, indirect_content, workbook_path, sheet_name, cell_address):
+        """
+        記憶鍵（見 CalculationMemo.make_key）；外部檔案引用不記憶，
+        只有位置相關的參數（ROW()/COLUMN()、R1C1 相對引用）才以儲存格區分
+        """
+        return self.memo.make_key(indirect_content, workbook_path, sheet_name, cell_address,
+                                  namespace=self.MEMO_NAMESPACE)
+
+    def _calculate_native(self, indirect_content, workbook_path, sheet_name, cell_address):
+        """原生計算（共用工作簿快取）；不支援時返回 None"""
+        if os.path.exists(workbook_path):
+            try:
+                value = get_native_evaluator().evaluate(indirect_content, workbook_path, sheet_name, cell_address)
+                with self.lock:
+                    self._stats['native'] += 1
+                if value is None or isinstance(value, ExcelError):
+                    with self.lock:
+                        self._stats['failures'] += 1
+                    return {
+                        'success': False,
+                        'error': f'Excel計算錯誤: {value}' if value is not None else '計算結果為空',
+                        'indirect_content': indirect_content,
+                        'engine': 'native'
+                    }
+                return {
+                    'success': True,
+                    'static_reference': to_text(value).strip(),
+                    'calculation_result': value,
+                    'indirect_content': indirect_content,
+                    'engine': 'native'
+                }
+            except UnsupportedExpression:
+                pass
+            except Exception as e:
+                print(f"INDIRECT native evaluation error: {e}")
+        return None
+
+    def _calculate_with_manager(self, contents, workbook_path, sheet_name, cell_address, excel_manager):
+        """Excel COM 後備：多個參數以一次批次計算完成"""
+        if excel_manager is None:
+            with self.lock:
+                self._stats['failures'] += len(contents)
+            return [{
+                'success': False,
+                'error': '原生計算不支援此 INDIRECT 參數，且沒有可用的 Excel 管理器',
+                'indirect_content': content
+            } for content in contents]
+        with self.lock:
+            self._stats['com'] += len(contents)
+        results = excel_manager.calculate_batch(contents, workbook_path, sheet_name, cell_address)
+        for result in results:
+            result.setdefault('engine', 'com')
+            if not result.get('success'):
+                with self.lock:
+                    self._stats['failures'] += 1
+        return results
+
+
+# 全域實例
+_global_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_indirect_engine():
+    """獲取全域 INDIRECT 引擎實例"""
+    global _global_engine
+
+    if _global_engine is None:
+        with _engine_lock:
+            if _global_engine is None:
+                _global_engine = IndirectEngine()
+
+    return _global_engine
+
+
+def resolve_indirect_in_formula(formula, workbook_path, sheet_name, cell_address=None, excel_manager=None):
+    """
+    便捷函數：使用全域引擎解析公式中的 INDIRECT
+
+    Returns:
+        dict: 見 IndirectEngine.resolve_formula
+    """
+    return get_indirect_engine().resolve_formula(formula, workbook_path, sheet_name, cell_address, excel_manager)
@@ -1,19 +1,23 @@
 # -*- coding: utf-8 -*-
 """
 INDIRECT Solver - 從 progress_enhanced_exploder.py 中提取的INDIRECT解析邏輯
-純粹的程式碼搬移，不修改任何邏輯
+解析工作交給唯一的 INDIRECT 引擎 (utils.indirect_engine)，
+這裡只負責收集圖譜所需的內部引用
 """
 
+from utils.indirect_engine import get_indirect_engine
+
 class IndirectSolver:
-    """INDIRECT函數解析器 - 從原始程式碼中完全搬移"""
+    """INDIRECT函數解析器"""
     
     def __init__(self, excel_manager, progress_callback, main_analyzer=None):
         self.excel_manager = excel_manager
         self.progress_callback = progress_callback
         self.main_analyzer = main_analyzer
+        self.engine = get_indirect_engine()
     
     def _resolve_indirect_with_excel(self, formula, workbook_path, sheet_name, cell_address):
-        """使用安全的 Excel 管理解析 INDIRECT"""
+        """解析 INDIRECT - 原生計算優先，必要時才使用安全的 Excel 管理"""
         try:
             self.progress_callback.update_progress(f"[INDIRECT] 開始解析: {formula}")
             
@@ -22,9 +26,6 @@ class IndirectSolver:
             if not indirect_functions:
                 return {'success': False, 'error': 'No INDIRECT functions found'}
             
-            resolved_formula = formula
-            static_references = []
-            calculation_details = []
             internal_references = []
             
             # 分析 INDIRECT 內部引用
@@ -35,48 +36,21 @@ class IndirectSolver:
                     )
                     internal_references.extend(temp_references)
             
-            # 逐個解析 INDIRECT 函數
-            for i, indirect_func in enumerate(indirect_functions):
-                self.progress_callback.update_progress(f"[INDIRECT] 處理第 {i+1} 個: {indirect_func['content']}")
-                
-                calc_result = self.excel_manager.calculate_safely(
-                    indirect_func['content'], workbook_path, sheet_name, cell_address
+            result = self.engine.resolve_formula(
+                formula, workbook_path, sheet_name, cell_address, self.excel_manager
+            )
+            
+            for detail in result.get('calculation_details', []):
+                self.progress_callback.update_progress(
+                    f"[INDIRECT] 替換 ({detail['engine']}): {detail['original_function']} -> {detail['static_reference']}"
                 )
-                
-                if calc_result and calc_result['success']:
-                    static_ref = calc_result['static_reference']
-                    
-                    if '!' in static_ref:
-                        final_static_ref = static_ref
-                    else:
-                        final_static_ref = f"{sheet_name}!{static_ref}"
-                    
-                    old_formula = resolved_formula
-                    resolved_formula = resolved_formula.replace(
-                        indirect_func['full_function'], 
-                        final_static_ref
-                    )
-                    
-                    self.progress_callback.update_progress(f"[INDIRECT] 替換: {indirect_func['full_function']} -> {final_static_ref}")
-                    
-                    static_references.append(final_static_ref)
-                    calculation_details.append({
-                        'original_function': indirect_func['full_function'],
-                        'content': indirect_func['content'],
-                        'static_reference': final_static_ref,
-                        'raw_excel_result': static_ref
-                    })
+            for error in result.get('errors', []):
+                self.progress_callback.update_progress(f"[INDIRECT] 解析失敗: {error}")
             
-            success = len(static_references) > 0
-            
-            return {
-                'success': success,
-                'resolved_formula': resolved_formula,
-                'static_references': static_references,
-                'calculation_details': calculation_details,
-                'original_formula': formula,
-                'internal_references': internal_references
-            }
+            result['internal_references'] = internal_references
+            if not result['success'] and 'error' not in result:
+                result['error'] = '; '.join(result.get('errors', [])) or 'INDIRECT resolution failed'
+            return result
             
         except Exception as e:
             self.progress_callback.update_progress(f"[INDIRECT] 解析異常: {e}")
@@ -89,37 +63,4 @@ class IndirectSolver:
 
     def _extract_all_indirect_functions(self, formula):
         """提取公式中所有的 INDIRECT 函數"""
-        indirect_functions = []
-        search_start = 0
-        
-        while True:
-            indirect_pos = formula.upper().find('INDIRECT(', search_start)
-            if indirect_pos == -1:
-                break
-            
-            start_pos = indirect_pos + len('INDIRECT(')
-            bracket_count = 1
-            current_pos = start_pos
-            
-            while current_pos < len(formula) and bracket_count > 0:
-                char = formula[current_pos]
-                if char == '(':
-                    bracket_count += 1
-                elif char == ')':
-                    bracket_count -= 1
-                current_pos += 1
-            
-            if bracket_count == 0:
-                content = formula[start_pos:current_pos-1]
-                full_function = formula[indirect_pos:current_pos]
-                
-                indirect_functions.append({
-                    'full_function': full_function,
-                    'content': content,
-                    'start_pos': indirect_pos,
-                    'end_pos': current_pos
-                })
-            
-            search_start = current_pos
-        
-        return indirect_functions
\ No newline at end of file
+        return self.engine.extract_indirect_functions(formula)
@@ -0,0 +1,336 @@
+# -*- coding: utf-8 -*-
+"""
+Lookup Index Cache - 查找索引
+同一個查找欄（或列）只建立一次索引，VLOOKUP / HLOOKUP / INDEX-MATCH 共用：
+- 精確匹配：值 -> 第一個位置 的字典，每次查找 O(1)
+- 近似匹配 (1 / -1)：已排序的鍵陣列 + bisect，每次查找 O(log n)
+- XLOOKUP / XMATCH：不重複鍵排序後保存第一個與最後一個位置，
+  支援完全相符 / 下一個較小 / 下一個較大與正向 / 反向搜尋（資料不需排序）
+- 文字比較不分大小寫（與 Excel 一致）
+- 整數/浮點數/日期統一轉為數值鍵
+"""
+
+import os
+import bisect
+import threading
+from collections import OrderedDict
+
+from utils.file_fingerprint import get_fingerprint_service
+from utils.sheet_value_cache import get_sheet_values
+from utils.formula_evaluator import ExcelError, normalize_cell_value
+
+
+def lookup_key(value):
+    """
+    把儲存格值或查找值轉為索引鍵；空白與錯誤值返回 None（不參與精確匹配）
+    """
+    value = normalize_cell_value(value)
+    if value is None or isinstance(value, ExcelError):
+        return None
+    if isinstance(value, bool):
+        return ('b', value)
+    if isinstance(value, float):
+        return ('n', value)
+    return ('s', value.lower())
+
+
+class SortedLookupIndex:
+    """
+    近似匹配索引：依型別（數字 / 文字 / 邏輯值）分開保存資料順序中的鍵與位置
+    Excel 的近似匹配假設資料已排序，只在相同型別的值之間比較
+    """
+
+    __slots__ = ('_keys', '_positions', '_reversed_keys')
+
+    def __init__(self, values):
+        self._keys = {}
+        self._positions = {}
+        self._reversed_keys = {}
+        for position, value in enumerate(values):
+            key = lookup_key(value)
+            if key is None:
+                continue
+            self._keys.setdefault(key[0], []).append(key[1])
+            self._positions.setdefault(key[0], []).append(position)
+
+    def find_ascending(self, key):
+        """MATCH(...,1)：遞增資料中小於或等於查找值的最後一個位置"""
+        keys = self._keys.get(key[0])
+        if not keys:
+            return None
+        i = bisect.bisect_right(keys, key[1]) - 1
+        return self._positions[key[0]][i] if i >= 0 else None
+
+    def find_descending(self, key):
+        """MATCH(...,-1)：遞減資料中大於或等於查找值的最後一個位置"""
+        keys = self._keys.get(key[0])
+        if not keys:
+            return None
+        reversed_keys = self._reversed_keys.get(key[0])
+        if reversed_keys is None:
+            reversed_keys = self._reversed_keys[key[0]] = keys[::-1]
+        count = len(keys) - bisect.bisect_left(reversed_keys, key[1])
+        return self._positions[key[0]][count - 1] if count > 0 else None
+
+
+class OrderedLookupIndex:
+    """
+    XLOOKUP / XMATCH 索引：依型別保存排序後的不重複鍵，以及每個鍵第一次與最後一次出現的位置
+    """
+
+    __slots__ = ('_keys', '_first', '_last')
+
+    def __init__(self, values):
+        first = {}
+        last = {}
+        for position, value in enumerate(values):
+            key = lookup_key(value)
+            if key is None:
+                continue
+            first.setdefault(key, position)
+            last[key] = position
+        self._keys = {}
+        for key in sorted(first, key=lambda k: (k[0], k[1])):
+            self._keys.setdefault(key[0], []).append(key[1])
+        self._first = first
+        self._last = last
+
+    def find(self, key, match_mode=0, reverse=False):
+        """
+        Args:
+            key: lookup_key() 的結果
+            match_mode: 0 完全相符，-1 完全相符或下一個較小，1 完全相符或下一個較大
+            reverse: True 時返回最後一次出現的位置（search_mode -1）
+
+        Returns:
+            0-based 位置；找不到時返回 None
+        """
+        positions = self._last if reverse else self._first
+        position = positions.get(key)
+        if position is not None or match_mode == 0:
+            return position
+        keys = self._keys.get(key[0])
+        if not keys:
+            return None
+        if match_mode < 0:
+            i = bisect.bisect_left(keys, key[1]) - 1
+        else:
+            i = bisect.bisect_right(keys, key[1])
+        if i < 0 or i >= len(keys):
+            return None
+        return positions[(key[0], keys[i])]
+
+
+def resolve_range_lookup(param, excel_manager, workbook_path, sheet_name, cell_address):
+    """
+    VLOOKUP/HLOOKUP 第四參數轉為 MATCH 類型：FALSE/0/空白 -> 0（精確），TRUE/非零 -> 1（近似）
+    空白參數（例如 VLOOKUP(x,r,2,)）在 Excel 中等同 FALSE；其他運算式交給 excel_manager 計算
+    """
+    val = param.strip().upper() if isinstance(param, str) else str(param)
+    if val == '':
+        return 0
+    if val not in ('TRUE', 'FALSE'):
+        try:
+            float(val)
+        except ValueError:
+            res = excel_manager.calculate_safely(param, workbook_path, sheet_name, cell_address)
+            if not res['success']:
+                raise ValueError(f"參數計算失敗: {res.get('error')}")
+            val = str(res['static_reference']).strip().upper()
+    if val == 'FALSE':
+        return 0
+    if val == 'TRUE':
+        return 1
+    return 0 if float(val) == 0 else 1
+
+
+class LookupIndexCache:
+    """
+    執行緒安全的查找索引 LRU 快取
+    鍵為 (檔案內容指紋, 工作表, 方向, 欄/列號, 起點, 終點, 索引種類)
+    """
+
+    def __init__(self, max_size=64):
+        self.max_size = max_size
+        self.cache = OrderedDict()
+        self.lock = threading.RLock()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'lookups': 0
+        }
+
+    def get_exact_index(self, file_path, sheet_name, orientation, line, start, end):
+        """
+        獲取精確匹配索引
+
+        Args:
+            file_path: Excel檔案路徑
+            sheet_name: 工作表名稱
+            orientation: 'column'（VLOOKUP/直向 MATCH）或 'row'（HLOOKUP/橫向 MATCH）
+            line: 欄號（column）或列號（row），1-based
+            start, end: 查找範圍的起訖列號（column）或欄號（row），1-based
+
+        Returns:
+            dict: 索引鍵 -> 0-based 位置；工作表不存在時返回 None
+        """
+        return self._get_index('exact', file_path, sheet_name, orientation, line, start, end)
+
+    def get_sorted_index(self, file_path, sheet_name, orientation, line, start, end):
+        """
+        獲取近似匹配索引（參數同 get_exact_index）
+
+        Returns:
+            SortedLookupIndex；工作表不存在時返回 None
+        """
+        return self._get_index('sorted', file_path, sheet_name, orientation, line, start, end)
+
+    def _get_index(self, kind, file_path, sheet_name, orientation, line, start, end):
+        service = get_fingerprint_service()
+        normalized_path = os.path.normpath(os.path.abspath(file_path))
+        fingerprint = service.fingerprint(normalized_path)
+        if fingerprint is None:
+            raise FileNotFoundError(f"File not found: {file_path}")
+
+        cache_key = (fingerprint.content_id, sheet_name.lower(), orientation, line, start, end, kind)
+
+        with self.lock:
+            entry = self.cache.get(cache_key)
+            if entry is not None and service.fingerprint(entry['file_path']) == entry['fingerprint']:
+                self.cache.move_to_end(cache_key)
+                self._stats['hits'] += 1
+                return entry['index']
+
+            self._stats['misses'] += 1
+            sheet = get_sheet_values(normalized_path, sheet_name)
+            if sheet is None:
+                return None
+
+            if orientation == 'row':
+                values = sheet.row(line, start, end)
+            else:
+                values = sheet.column(line, start, end)
+
+            if kind == 'sorted':
+                index = SortedLookupIndex(values)
+            elif kind == 'ordered':
+                index = OrderedLookupIndex(values)
+            else:
+                index = {}
+                for position, value in enumerate(values):
+                    key = lookup_key(value)
+                    if key is not None and key not in index:
+                        index[key] = position
+
+            self.cache[cache_key] = {
+                'index': index,
+                'file_path': normalized_path,
+                'fingerprint': fingerprint
+            }
+            self.cache.move_to_end(cache_key)
+            while len(self.cache) > self.max_size:
+                self.cache.popitem(last=False)
+                self._stats['evictions'] += 1
+            return index
+
+    def _index_args(self, cell_range):
+        if cell_range.columns == 1:
+            return (cell_range.workbook_path, cell_range.sheet_name, 'column',
+                    cell_range.min_col, cell_range.min_row, cell_range.max_row)
+        return (cell_range.workbook_path, cell_range.sheet_name, 'row',
+                cell_range.min_row, cell_range.min_col, cell_range.max_col)
+
+    def find_exact(self, cell_range, lookup_value):
+        """
+        在單欄或單列範圍中精確查找（不處理萬用字元）
+
+        Args:
+            cell_range: formula_evaluator.CellRange（單欄或單列）
+            lookup_value: 查找值
+
+        Returns:
+            0-based 位置；找不到時返回 None
+        """
+        index = self.get_exact_index(*self._index_args(cell_range))
+        with self.lock:
+            self._stats['lookups'] += 1
+        if index is None:
+            return None
+        key = lookup_key(lookup_value)
+        return None if key is None else index.get(key)
+
+    def find_approximate(self, cell_range, lookup_value, match_type=1):
+        """
+        在已排序的單欄或單列範圍中近似查找
+
+        Args:
+            cell_range: formula_evaluator.CellRange（單欄或單列）
+            lookup_value: 查找值
+            match_type: 1（遞增，小於或等於）或 -1（遞減，大於或等於）
+
+        Returns:
+            0-based 位置；找不到時返回 None
+        """
+        index = self.get_sorted_index(*self._index_args(cell_range))
+        with self.lock:
+            self._stats['lookups'] += 1
+        key = lookup_key(lookup_value)
+        if index is None or key is None:
+            return None
+        if match_type > 0:
+            return index.find_ascending(key)
+        return index.find_descending(key)
+
+    def find_xmatch(self, cell_range, lookup_value, match_mode=0, search_mode=1):
+        """
+        XMATCH / XLOOKUP 語意的查找（萬用字元模式 2 由呼叫端處理）
+
+        Args:
+            cell_range: formula_evaluator.CellRange（單欄或單列）
+            lookup_value: 查找值
+            match_mode: 0 / -1 / 1（完全相符 / 下一個較小 / 下一個較大）
+            search_mode: 1 / -1（從頭 / 從尾）；2 / -2 二分搜尋在已排序資料上的結果相同
+
+        Returns:
+            0-based 位置；找不到時返回 None
+        """
+        index = self._get_index('ordered', *self._index_args(cell_range))
+        with self.lock:
+            self._stats['lookups'] += 1
+        key = lookup_key(lookup_value)
+        if index is None or key is None:
+            return None
+        return index.find(key, match_mode, reverse=(search_mode == -1))
+
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
+
+    def get_stats(self):
+        with self.lock:
+            total_requests = self._stats['hits'] + self._stats['misses']
+            hit_rate = (self._stats['hits'] / total_requests * 100) if total_requests > 0 else 0
+            return {
+                'cache_size': len(self.cache),
+                'max_size': self.max_size,
+                'hit_rate_percent': round(hit_rate, 2),
+                'stats': self._stats.copy()
+            }
+
+
+# 全域實例
+_global_lookup_cache = None
+_lookup_cache_lock = threading.Lock()
+
+
+def get_lookup_index_cache():
+    """獲取全域查找索引快取實例"""
+    global _global_lookup_cache
+
+    if _global_lookup_cache is None:
+        with _lookup_cache_lock:
+            if _global_lookup_cache is None:
+                _global_lookup_cache = LookupIndexCache(max_size=64)
+
+    return _global_lookup_cache
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+OFFSET Solver - 解析並靜態化 OFFSET 函數
+設計與 IndexSolver/VLookupSolver 一致：
+- 以原生計算器從快取的儲存格值計算 rows/cols/height/width，不啟動 Excel
+- 結果（儲存格或範圍）替換回公式，之後與一般靜態引用一樣展開
+"""
+
+from utils.formula_evaluator import UnsupportedExpression, ExcelError
+
+
+class OffsetSolver:
+    """OFFSET 函數解析器"""
+
+    def __init__(self, excel_manager, progress_callback, main_analyzer=None):
+        self.excel_manager = excel_manager
+        self.progress_callback = progress_callback
+        self.main_analyzer = main_analyzer
+
+    def resolve_offset(self, formula, workbook_path, sheet_name, cell_address):
+        """
+        將公式中的 OFFSET 函數轉換為靜態引用。
+
+        Returns dict:
+            {
+                'success': bool,
+                'resolved_formula': str,
+                'static_references': list[str],
+                'calculation_details': list[dict],
+                'original_formula': str,
+                'internal_references': list[dict],
+                'errors': list[str]
+            }
+        """
+        try:
+            self.progress_callback.update_progress(f"[OFFSET] 開始解析: {formula}")
+
+            offsets = self._extract_all_offset_functions(formula)
+            if not offsets:
+                return {'success': False, 'error': 'No OFFSET functions found'}
+
+            evaluator = self.excel_manager.native_evaluator
+            resolved_formula = formula
+            static_references = []
+            calculation_details = []
+            internal_references = []
+            errors = []
+
+            for i, oinfo in enumerate(offsets):
+                full_fn = oinfo['full_function']
+                content = oinfo['content']
+                self.progress_callback.update_progress(f"[OFFSET] 處理第 {i+1} 個: {content}")
+
+                # 基準引用與參數中的引用（提供給圖譜）
+                if self.main_analyzer:
+                    try:
+                        refs = self.main_analyzer._parse_formula_references_accurate(f"={content}", workbook_path, sheet_name)
+                        internal_references.extend(refs)
+                    except Exception:
+                        pass
+
+                try:
+                    target = evaluator.evaluate_reference(full_fn, workbook_path, sheet_name, cell_address)
+                except UnsupportedExpression as e:
+                    errors.append(f"OFFSET 無法以原生方式計算: {e}")
+                    continue
+                except Exception as e:
+                    errors.append(f"OFFSET 計算失敗: {e}")
+                    continue
+
+                if isinstance(target, ExcelError):
+                    errors.append(f"OFFSET 計算錯誤: {target}")
+                    continue
+
+                static_ref = target.reference_text(workbook_path, sheet_name)
+                resolved_formula = resolved_formula.replace(full_fn, static_ref)
+                static_references.append(static_ref)
+                calculation_details.append({
+                    'original_function': full_fn,
+                    'content': content,
+                    'target_sheet': target.sheet_name,
+                    'target_address': target.address(),
+                    'height': target.rows,
+                    'width': target.columns,
+                    'final_ref': static_ref
+                })
+                self.progress_callback.update_progress(f"[OFFSET] {full_fn} -> {static_ref}")
+
+            success = len(static_references) > 0
+            return {
+                'success': success,
+                'resolved_formula': resolved_formula,
+                'static_references': static_references,
+                'calculation_details': calculation_details,
+                'original_formula': formula,
+                'internal_references': internal_references,
+                'errors': errors
+            }
+
+        except Exception as e:
+            self.progress_callback.update_progress(f"[OFFSET] 解析異常: {e}")
+            return {'success': False, 'error': str(e), 'original_formula': formula, 'internal_references': [], 'errors': [str(e)]}
+
+    # ---- helpers ----
+
+    def _extract_all_offset_functions(self, formula):
+        """
+        提取所有 OFFSET(...) 片段，返回 list[{full_function, content}]
+        巢狀的 OFFSET 只取最外層（內層由原生計算器一併計算）
+        """
+        items = []
+        search_start = 0
+        up = formula.upper()
+        while True:
+            pos = up.find('OFFSET(', search_start)
+            if pos == -1:
+                break
+            # 排除名稱以 OFFSET 結尾的其他函數
+            if pos > 0 and (up[pos - 1].isalnum() or up[pos - 1] in '_.'):
+                search_start = pos + len('OFFSET(')
+                continue
+            start_pos = pos + len('OFFSET(')
+            bracket = 1
+            i = start_pos
+            in_quotes = False
+            while i < len(formula) and bracket > 0:
+                ch = formula[i]
+                if ch == '"':
+                    in_quotes = not in_quotes
+                elif not in_quotes:
+                    if ch == '(':
+                        bracket += 1
+                    elif ch == ')':
+                        bracket -= 1
+                i += 1
+            if bracket == 0:
+                content = formula[start_pos:i-1]
+                full_function = formula[pos:i]
+                items.append({'full_function': full_function, 'content': content})
+            search_start = i
+        return items
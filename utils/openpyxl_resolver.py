@@ -7,7 +7,8 @@ Based on the provided ResolvedWorkbookView implementation
 import openpyxl
 import os
 import re
-from .safe_cache import get_safe_cached_workbook
+import threading
+from .safe_cache import get_safe_cached_workbook, get_safe_global_cache
 import traceback
 
 # 輔助函數：從工作簿中獲取外部連結映射
@@ -62,23 +63,79 @@ def _resolve_formula_string(formula_str, external_link_map):
     return formula_str
 
 
+class _ExternalLinkResolver:
+    """
+    每個 workbook 版本一份：外部連結映射、預先編譯的替換正則，
+    以及每個 cell 已解析的公式文字
+    """
+    __slots__ = ('external_link_map', '_pattern', '_formula_memo', '_lock')
+
+    def __init__(self, external_link_map):
+        self.external_link_map = external_link_map
+        if external_link_map:
+            indexes = '|'.join(re.escape(index_str) for index_str in external_link_map)
+            self._pattern = re.compile(r'\[({})\]([^!]+)!'.format(indexes))
+        else:
+            self._pattern = None
+        self._formula_memo = {}
+        self._lock = threading.Lock()
+
+    def _replace(self, match):
+        # 正確格式：'path\[file.xlsx]WorksheetName'!
+        return f"{self.external_link_map[match.group(1)]}{match.group(2)}'!"
+
+    def resolve(self, formula_str):
+        if hasattr(formula_str, 'text'):
+            formula_str = formula_str.text
+        elif not isinstance(formula_str, str):
+            return _resolve_formula_string(formula_str, self.external_link_map)
+        if self._pattern is None or '[' not in formula_str:
+            return formula_str
+        return self._pattern.sub(self._replace, formula_str)
+
+    def resolve_cell(self, sheet_title, cell):
+        """解析 cell 的公式文字，按 (工作表, 座標) 記憶結果"""
+        raw_value = cell.value
+        key = (sheet_title, cell.coordinate)
+        cached = self._formula_memo.get(key)
+        if cached is not None and cached[0] == raw_value:
+            return cached[1]
+        resolved = self.resolve(raw_value)
+        with self._lock:
+            self._formula_memo[key] = (raw_value, resolved)
+        return resolved
+
+
+def _as_resolver(external_link_map):
+    """接受外部連結映射 dict 或已建立的 _ExternalLinkResolver"""
+    if isinstance(external_link_map, _ExternalLinkResolver):
+        return external_link_map
+    return _ExternalLinkResolver(external_link_map or {})
+
+
 class ResolvedCellView:
     """
     包裝 openpyxl.Cell 物件，並在存取其值時解析外部連結。
     透過 __getattr__ 和 __setattr__ 代理所有未明確定義的屬性。
     """
-    _wrapped_attrs = ('_cell', '_external_link_map') # 內部屬性列表
+    __slots__ = ('_cell', '_resolver', '_sheet_title')
+    _wrapped_attrs = __slots__ # 內部屬性列表
 
-    def __init__(self, openpyxl_cell, external_link_map):
+    def __init__(self, openpyxl_cell, external_link_map, sheet_title=None):
         object.__setattr__(self, '_cell', openpyxl_cell)
-        object.__setattr__(self, '_external_link_map', external_link_map)
+        object.__setattr__(self, '_resolver', _as_resolver(external_link_map))
+        object.__setattr__(self, '_sheet_title', sheet_title)
+
+    @property
+    def _external_link_map(self):
+        return self._resolver.external_link_map
 
     @property
     def value(self):
-        if self._cell.data_type == 'f':
-            return _resolve_formula_string(self._cell.value, self._external_link_map)
-        else:
-            return self._cell.value
+        cell = self._cell
+        if cell.data_type == 'f':
+            return self._resolver.resolve_cell(self._sheet_title, cell)
+        return cell.value
 
     @value.setter
     def value(self, new_value):
@@ -140,12 +197,19 @@ class ResolvedSheetView:
     """
     包裝 openpyxl.Worksheet 物件，並提供方法來獲取 ResolvedCellView 物件。
     透過 __getattr__ 和 __setattr__ 代理所有未明確定義的屬性。
+    代理出來的方法會被記住，重複存取時不再重新建立包裝函數。
     """
-    _wrapped_attrs = ('_sheet', '_external_link_map') # 內部屬性列表
+    __slots__ = ('_sheet', '_resolver', '_proxy_cache')
+    _wrapped_attrs = __slots__ # 內部屬性列表
 
     def __init__(self, openpyxl_sheet, external_link_map):
         object.__setattr__(self, '_sheet', openpyxl_sheet)
-        object.__setattr__(self, '_external_link_map', external_link_map)
+        object.__setattr__(self, '_resolver', _as_resolver(external_link_map))
+        object.__setattr__(self, '_proxy_cache', {})
+
+    @property
+    def _external_link_map(self):
+        return self._resolver.external_link_map
 
     # 明確定義常用屬性
     @property
@@ -176,18 +240,52 @@ class ResolvedSheetView:
     def row_dimensions(self):
         return self._sheet.row_dimensions
 
+    def read_resolved(self, key):
+        """
+        快速路徑：直接取得 cell 的 (data_type, 已解析的值)，不建立 ResolvedCellView
+        """
+        cell = self._sheet[key]
+        data_type = cell.data_type
+        if data_type == 'f':
+            return data_type, self._resolver.resolve_cell(self._sheet.title, cell)
+        return data_type, cell.value
+
+    def iter_formula_cells(self, min_row=None, max_row=None, min_col=None, max_col=None, with_format=False):
+        """
+        串流公式儲存格：yield (row, column, 已解析的公式, number_format)
+        不建立 ResolvedCellView；with_format=False 時以 values_only 讀取，number_format 為 None
+        """
+        resolver = self._resolver
+        first_row = min_row or 1
+        first_col = min_col or 1
+        rows = self._sheet.iter_rows(min_row, max_row, min_col, max_col, values_only=not with_format)
+        for row_offset, row in enumerate(rows):
+            for col_offset, item in enumerate(row):
+                value = item.value if with_format else item
+                if value is None:
+                    continue
+                if isinstance(value, str):
+                    if not value.startswith('='):
+                        continue
+                elif not hasattr(value, 'text'):
+                    continue  # 數值等常數；ArrayFormula 物件帶有 text
+                number_format = getattr(item, 'number_format', None) if with_format else None
+                yield first_row + row_offset, first_col + col_offset, resolver.resolve(value), number_format
+
     # 明確定義常用方法，並處理返回值的包裝
     def iter_rows(self, min_row=None, max_row=None, min_col=None, max_col=None):
+        resolver = self._resolver
+        title = self._sheet.title
         for row in self._sheet.iter_rows(min_row, max_row, min_col, max_col):
-            yield tuple(ResolvedCellView(cell, self._external_link_map) for cell in row)
+            yield tuple(ResolvedCellView(cell, resolver, title) for cell in row)
 
     def __getitem__(self, key):
         cell = self._sheet[key]
-        return ResolvedCellView(cell, self._external_link_map)
+        return ResolvedCellView(cell, self._resolver, self._sheet.title)
 
     def cell(self, row, column, value=None):
         original_cell = self._sheet.cell(row=row, column=column, value=value)
-        return ResolvedCellView(original_cell, self._external_link_map)
+        return ResolvedCellView(original_cell, self._resolver, self._sheet.title)
 
     def append(self, iterable):
         self._sheet.append(iterable)
@@ -212,14 +310,20 @@ class ResolvedSheetView:
 
     def __getattr__(self, name):
         # 代理所有未明確定義的屬性到底層 openpyxl.Worksheet
+        cached = self._proxy_cache.get(name)
+        if cached is not None:
+            return cached
         attr = getattr(self._sheet, name)
         if callable(attr):
+            resolver = self._resolver
+            title = self._sheet.title
             def wrapper(*args, **kwargs):
                 result = attr(*args, **kwargs)
                 # 如果方法返回 openpyxl.Cell，則包裝為 ResolvedCellView
                 if isinstance(result, openpyxl.cell.cell.Cell):
-                    return ResolvedCellView(result, self._external_link_map)
+                    return ResolvedCellView(result, resolver, title)
                 return result
+            self._proxy_cache[name] = wrapper
             return wrapper
         return attr
 
@@ -227,6 +331,7 @@ class ResolvedSheetView:
         if name in self._wrapped_attrs:
             object.__setattr__(self, name, value)
         else:
+            self._proxy_cache.pop(name, None)
             setattr(self._sheet, name, value)
 
 
@@ -234,35 +339,52 @@ class ResolvedWorkbookView:
     """
     包裝 openpyxl.Workbook 物件，並提供類似的介面，但其儲存格值會解析外部連結。
     透過 __getattr__ 和 __setattr__ 代理所有未明確定義的屬性。
+    外部連結映射只在建立時計算一次，工作表 view 也會被重複使用。
     """
-    _wrapped_attrs = ('_workbook', '_external_link_map') # 內部屬性列表
+    __slots__ = ('_workbook', '_resolver', '_sheet_views', '_proxy_cache')
+    _wrapped_attrs = ('_workbook', '_resolver', '_sheet_views', '_proxy_cache') # 內部屬性列表
 
     def __init__(self, openpyxl_workbook):
         object.__setattr__(self, '_workbook', openpyxl_workbook)
-        object.__setattr__(self, '_external_link_map', _get_external_link_map(openpyxl_workbook))
+        object.__setattr__(self, '_resolver', _ExternalLinkResolver(_get_external_link_map(openpyxl_workbook)))
+        object.__setattr__(self, '_sheet_views', {})
+        object.__setattr__(self, '_proxy_cache', {})
+
+    @property
+    def _external_link_map(self):
+        return self._resolver.external_link_map
+
+    def _sheet_view(self, sheet):
+        view = self._sheet_views.get(sheet.title)
+        if view is None or view._sheet is not sheet:
+            view = ResolvedSheetView(sheet, self._resolver)
+            self._sheet_views[sheet.title] = view
+        return view
 
     # 明確定義常用屬性/方法，並處理返回值的包裝
     @property
     def active(self):
-        return ResolvedSheetView(self._workbook.active, self._external_link_map)
+        return self._sheet_view(self._workbook.active)
 
     @property
     def sheetnames(self):
         return self._workbook.sheetnames
 
     def __getitem__(self, key):
-        sheet = self._workbook[key]
-        return ResolvedSheetView(sheet, self._external_link_map)
+        view = self._sheet_views.get(key)
+        if view is not None:
+            return view
+        return self._sheet_view(self._workbook[key])
 
     def create_sheet(self, title=None, index=None):
         new_sheet = self._workbook.create_sheet(title=title, index=index)
-        return ResolvedSheetView(new_sheet, self._external_link_map)
+        return self._sheet_view(new_sheet)
 
     def remove(self, worksheet):
         if isinstance(worksheet, ResolvedSheetView):
-            self._workbook.remove(worksheet._sheet)
-        else:
-            self._workbook.remove(worksheet)
+            worksheet = worksheet._sheet
+        self._sheet_views.pop(worksheet.title, None)
+        self._workbook.remove(worksheet)
 
     def remove_sheet(self, worksheet):
         self.remove(worksheet)
@@ -270,7 +392,7 @@ class ResolvedWorkbookView:
     def get_sheet_by_name(self, name):
         sheet = self._workbook.get_sheet_by_name(name)
         if sheet:
-            return ResolvedSheetView(sheet, self._external_link_map)
+            return self._sheet_view(sheet)
         return None
 
     def save(self, filename):
@@ -278,14 +400,18 @@ class ResolvedWorkbookView:
 
     def __getattr__(self, name):
         # 代理所有未明確定義的屬性到底層 openpyxl.Workbook
+        cached = self._proxy_cache.get(name)
+        if cached is not None:
+            return cached
         attr = getattr(self._workbook, name)
         if callable(attr):
             def wrapper(*args, **kwargs):
                 result = attr(*args, **kwargs)
                 # 如果方法返回 openpyxl.Worksheet，則包裝為 ResolvedSheetView
                 if isinstance(result, openpyxl.worksheet.worksheet.Worksheet):
-                    return ResolvedSheetView(result, self._external_link_map)
+                    return self._sheet_view(result)
                 return result
+            self._proxy_cache[name] = wrapper
             return wrapper
         return attr
 
@@ -293,6 +419,7 @@ class ResolvedWorkbookView:
         if name in self._wrapped_attrs:
             object.__setattr__(self, name, value)
         else:
+            self._proxy_cache.pop(name, None)
             setattr(self._workbook, name, value)
 
 
@@ -300,36 +427,65 @@ def load_resolved_workbook(file_path, use_cache=True):
     """
     載入 Excel 檔案，並返回一個 ResolvedWorkbookView 物件。
     這個物件的儲存格值會自動解析外部連結，並代理所有未明確定義的屬性。
+    使用快取時，每個 workbook 版本只會建立一次 view（連同外部連結映射）。
     
     Args:
         file_path: Excel 檔案路徑
         use_cache: 是否使用快取系統 (預設: True)
     """
-    if use_cache:
-        from .safe_cache import get_safe_cached_workbook
-        workbook = get_safe_cached_workbook(file_path, data_only=False)
-    else:
-        workbook = openpyxl.load_workbook(file_path, data_only=False)
-    
-    return ResolvedWorkbookView(workbook)
+    if not use_cache:
+        return ResolvedWorkbookView(openpyxl.load_workbook(file_path, data_only=False))
+
+    # view 存放在 safe cache 的工作簿項目上，工作簿被淘汰或重新載入時一起釋放
+    return get_safe_global_cache().get_workbook_attachment(
+        file_path, 'resolved_view', ResolvedWorkbookView, data_only=False)
+
+
+def _read_xls_cell(file_path, sheet_name, cell_address):
+    """
+    使用共用的 xlrd book pool 讀取舊式 .xls 檔案的 cell
+    xlrd 無法讀取公式，因此 .xls 引用一律以數值 cell 呈現
+    """
+    from openpyxl.utils.cell import coordinate_to_tuple
+    from .xlrd_cache import get_pooled_xls_sheet
+
+    sheet = get_pooled_xls_sheet(file_path, sheet_name)
+    if sheet is None:
+        raise KeyError(f"Worksheet {sheet_name} does not exist.")
+
+    row, column = coordinate_to_tuple(cell_address.replace('$', ''))
+    value = None
+    if row - 1 < sheet.nrows and column - 1 < sheet.ncols:
+        value = sheet.cell_value(row - 1, column - 1)
+        if value == '':
+            value = None
+
+    return {
+        'formula': None,
+        'calculated_value': value,
+        'display_value': str(value) if value is not None else "",
+        'cell_type': 'value',
+        'has_external_references': False
+    }
 
 
 def read_cell_with_resolved_references(file_path, sheet_name, cell_address, use_cache=True):
     """
     使用 ResolvedWorkbookView 讀取指定 cell 的資訊
+    .xls 檔案改用 xlrd book pool 讀取
     返回: (formula, calculated_value, display_value, cell_type)
     """
     try:
+        if os.path.splitext(file_path)[1].lower() == '.xls':
+            return _read_xls_cell(file_path, sheet_name, cell_address)
+
         # 使用 resolved workbook 讀取 (with cache)
         resolved_wb = load_resolved_workbook(file_path, use_cache=use_cache)
         
         resolved_sheet = resolved_wb[sheet_name]
-        resolved_cell = resolved_sheet[cell_address]
         
-        # 獲取原始和解析後的值
-        original_value = resolved_cell._cell.value
-        resolved_value = resolved_cell.value
-        cell_type = resolved_cell.data_type
+        # 獲取解析後的值（快速路徑，不建立 ResolvedCellView）
+        cell_type, resolved_value = resolved_sheet.read_resolved(cell_address)
         
         # 判斷 cell 類型和內容
         if cell_type == 'f':  # Formula
@@ -338,7 +494,6 @@ def read_cell_with_resolved_references(file_path, sheet_name, cell_address, use_
             # 嘗試獲取計算值 (使用 data_only=True with cache)
             try:
                 if use_cache:
-                    from .safe_cache import get_safe_cached_workbook
                     data_wb = get_safe_cached_workbook(file_path, data_only=True)
                 else:
                     data_wb = openpyxl.load_workbook(file_path, data_only=True)
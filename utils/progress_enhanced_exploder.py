@@ -8,8 +8,12 @@ User: ckcm0210
 
 import re
 import os
-import win32com.client
-import pythoncom
+try:
+    import win32com.client
+    import pythoncom
+except ImportError:  # 非 Windows 環境：計算改由原生計算器處理
+    win32com = None
+    pythoncom = None
 import time
 import psutil
 from urllib.parse import unquote
@@ -20,6 +24,10 @@ from utils.indirect_solver import IndirectSolver
 from utils.index_solver import IndexSolver
 from utils.vlookup_solver import VLookupSolver
 from utils.hlookup_solver import HLookupSolver
+from utils.xlookup_solver import XLookupSolver
+from utils.offset_solver import OffsetSolver
+from utils.branch_solver import LiveBranchSolver, BRANCH_FUNCTION_PATTERN
+from utils.criteria_solver import CriteriaSolver, CRITERIA_FUNCTION_PATTERN
 import datetime
 import gc
 import traceback
@@ -82,9 +90,13 @@ class ProgressCallback:
 class EnhancedDependencyExploder:
     """超安全版公式依賴鏈爆炸分析器 - 完全避免檔案鎖定 + INDEX支援"""
     
-    def __init__(self, max_depth=10, range_expand_threshold=5, progress_callback=None):
+    # 條件列節點展開時最多展開的儲存格數量
+    CRITERIA_EXPAND_LIMIT = 200
+    
+    def __init__(self, max_depth=10, range_expand_threshold=5, progress_callback=None, live_branch=False):
         self.max_depth = max_depth
         self.range_expand_threshold = range_expand_threshold
+        self.live_branch = live_branch  # 只展開 IF/IFS/CHOOSE/SWITCH 的現行分支
         self.visited_cells = set()
         self.circular_refs = []
         self.progress_callback = progress_callback or ProgressCallback()
@@ -98,6 +110,10 @@ class EnhancedDependencyExploder:
         self.vlookup_solver = VLookupSolver(self.excel_manager, self.progress_callback, self)
         self.hlookup_solver = HLookupSolver(self.excel_manager, self.progress_callback, self)
         self.indirect_solver = IndirectSolver(self.excel_manager, self.progress_callback, self)
+        self.offset_solver = OffsetSolver(self.excel_manager, self.progress_callback, self)
+        self.xlookup_solver = XLookupSolver(self.excel_manager, self.progress_callback, self)
+        self.branch_solver = LiveBranchSolver(self.excel_manager, self.progress_callback, self)
+        self.criteria_solver = CriteriaSolver(self.excel_manager, self.progress_callback, self)
         
         # 初始化 COM
         try:
@@ -171,17 +187,40 @@ class EnhancedDependencyExploder:
             fixed_formula = self._clean_formula(original_formula) if original_formula else None
             resolved_formula = fixed_formula
             indirect_info = None
+            offset_info = None
             index_info = None
             vlookup_info = None
             hlookup_info = None
+            xlookup_info = None
+            branch_info = None
+            criteria_info = None
+            
+            # 現行分支模式 - 先剪除休眠分支，之後的動態函數解析只處理現行分支
+            if self.live_branch and fixed_formula and fixed_formula.startswith('=') and BRANCH_FUNCTION_PATTERN.search(fixed_formula):
+                self.progress_callback.update_progress(f"正在判斷現行分支: {current_ref}")
+                try:
+                    branch_result = self.branch_solver.resolve_live_branches(
+                        fixed_formula, workbook_path, sheet_name, cell_address
+                    )
+                    if branch_result.get('success'):
+                        resolved_formula = branch_result['live_formula']
+                        branch_info = {
+                            'has_live_branch': True,
+                            'success': True,
+                            'resolved_formula': resolved_formula,
+                            'details': branch_result,
+                            'dormant_branches': branch_result['dormant_branches']
+                        }
+                except Exception as e:
+                    self.progress_callback.update_progress(f"現行分支判斷異常: {str(e)}")
             
             if fixed_formula and fixed_formula.startswith('='):
                 # INDIRECT 處理 - 修改：使用拆分的模組
-                if 'INDIRECT' in fixed_formula.upper():
+                if 'INDIRECT' in resolved_formula.upper():
                     self.progress_callback.update_progress(f"正在解析INDIRECT函數: {current_ref}")
                     try:
                         resolved_result = self.indirect_solver._resolve_indirect_with_excel(
-                            fixed_formula, workbook_path, sheet_name, cell_address
+                            resolved_formula, workbook_path, sheet_name, cell_address
                         )
                         if resolved_result and resolved_result['success']:
                             resolved_formula = resolved_result['resolved_formula']
@@ -218,6 +257,40 @@ class EnhancedDependencyExploder:
                         }
                         self.progress_callback.update_progress(f"INDIRECT解析異常: {str(e)}")
                 
+                # OFFSET 處理 - 原生計算目標引用，之後與靜態引用一樣展開
+                if 'OFFSET(' in (resolved_formula or fixed_formula).upper():
+                    self.progress_callback.update_progress(f"正在解析OFFSET函數: {current_ref}")
+                    try:
+                        offset_result = self.offset_solver.resolve_offset(
+                            resolved_formula, workbook_path, sheet_name, cell_address
+                        )
+                        if offset_result and offset_result['success']:
+                            resolved_formula = offset_result['resolved_formula']
+                            offset_info = {
+                                'has_offset': True,
+                                'success': True,
+                                'resolved_formula': resolved_formula,
+                                'details': offset_result,
+                                'internal_references': offset_result.get('internal_references', [])
+                            }
+                            self.progress_callback.update_progress(f"OFFSET解析完成，resolved: {resolved_formula}")
+                        else:
+                            offset_info = {
+                                'has_offset': True,
+                                'success': False,
+                                'error': offset_result.get('error') or '; '.join(offset_result.get('errors', [])) or 'Unknown error',
+                                'internal_references': []
+                            }
+                            self.progress_callback.update_progress(f"OFFSET解析失敗: {offset_info['error']}")
+                    except Exception as e:
+                        offset_info = {
+                            'has_offset': True,
+                            'success': False,
+                            'error': str(e),
+                            'internal_references': []
+                        }
+                        self.progress_callback.update_progress(f"OFFSET解析異常: {str(e)}")
+                
                 # INDEX/VLOOKUP 處理 - 修改：使用拆分的模組
                 if 'INDEX(' in (resolved_formula or fixed_formula).upper():
                     self.progress_callback.update_progress(f"正在解析INDEX函數: {current_ref}")
@@ -320,10 +393,67 @@ class EnhancedDependencyExploder:
                     }
                     self.progress_callback.update_progress(f"VLOOKUP解析異常: {str(e)}")
             
+            # XLOOKUP 處理 - 原生計算，查找經由共用查找索引
+            _formula_text = resolved_formula if resolved_formula else fixed_formula
+            if _formula_text and _formula_text.startswith('=') and 'XLOOKUP(' in _formula_text.upper():
+                self.progress_callback.update_progress(f"正在解析XLOOKUP函數: {current_ref}")
+                try:
+                    xres = self.xlookup_solver.resolve_xlookup(_formula_text, workbook_path, sheet_name, cell_address)
+                    if xres and xres.get('success'):
+                        resolved_formula = xres['resolved_formula']
+                        xlookup_info = {
+                            'has_xlookup': True,
+                            'success': True,
+                            'resolved_formula': resolved_formula,
+                            'details': xres,
+                            'internal_references': xres.get('internal_references', [])
+                        }
+                        self.progress_callback.update_progress(f"XLOOKUP解析完成，resolved: {resolved_formula}")
+                    else:
+                        xlookup_info = {
+                            'has_xlookup': True,
+                            'success': False,
+                            'error': xres.get('error') or '; '.join(xres.get('errors', [])) or 'Unknown error',
+                            'internal_references': xres.get('internal_references', [])
+                        }
+                        self.progress_callback.update_progress(f"XLOOKUP解析失敗: {xlookup_info['error']}")
+                except Exception as e:
+                    xlookup_info = {
+                        'has_xlookup': True,
+                        'success': False,
+                        'error': str(e),
+                        'internal_references': []
+                    }
+                    self.progress_callback.update_progress(f"XLOOKUP解析異常: {str(e)}")
+            
+            # SUMIFS/COUNTIFS/SUMPRODUCT 條件分析 - 找出實際參與計算的列（公式不改寫）
+            _formula_text = resolved_formula if resolved_formula else fixed_formula
+            if _formula_text and _formula_text.startswith('=') and CRITERIA_FUNCTION_PATTERN.search(_formula_text):
+                self.progress_callback.update_progress(f"正在分析條件彙總函數: {current_ref}")
+                try:
+                    cres = self.criteria_solver.resolve_criteria(_formula_text, workbook_path, sheet_name, cell_address)
+                    criteria_info = {
+                        'has_criteria': True,
+                        'success': cres.get('success', False),
+                        'details': cres.get('criteria_details', []),
+                        'error': cres.get('error') or '; '.join(cres.get('errors', []))
+                    }
+                    if not criteria_info['success']:
+                        self.progress_callback.update_progress(f"條件分析失敗: {criteria_info['error']}")
+                except Exception as e:
+                    criteria_info = {
+                        'has_criteria': True,
+                        'success': False,
+                        'details': [],
+                        'error': str(e)
+                    }
+                    self.progress_callback.update_progress(f"條件分析異常: {str(e)}")
+            
             # 創建節點
             return self._create_node_with_dynamic_functions(
                 workbook_path, sheet_name, cell_address, current_depth, root_workbook_path,
-                cell_info, fixed_formula, resolved_formula, indirect_info, index_info, vlookup_info, hlookup_info
+                cell_info, fixed_formula, resolved_formula, indirect_info, index_info, vlookup_info, hlookup_info,
+                offset_info, xlookup_info, branch_info, criteria_info
             )
             
         except Exception as e:
@@ -358,7 +488,7 @@ class EnhancedDependencyExploder:
             # In case of any regex error, return the original formula
             return formula
 
-    def _create_node_with_dynamic_functions(self, workbook_path, sheet_name, cell_address, current_depth, root_workbook_path, cell_info, fixed_formula, resolved_formula=None, indirect_info=None, index_info=None, vlookup_info=None, hlookup_info=None):
+    def _create_node_with_dynamic_functions(self, workbook_path, sheet_name, cell_address, current_depth, root_workbook_path, cell_info, fixed_formula, resolved_formula=None, indirect_info=None, index_info=None, vlookup_info=None, hlookup_info=None, offset_info=None, xlookup_info=None, branch_info=None, criteria_info=None):
         """創建支持動態函數的節點"""
         filename = os.path.basename(workbook_path)
         dir_path = os.path.dirname(workbook_path)
@@ -430,6 +560,29 @@ class EnhancedDependencyExploder:
         else:
             node['has_hlookup'] = False
         
+        if xlookup_info and xlookup_info.get('has_xlookup'):
+            node['has_xlookup'] = True
+            if xlookup_info.get('success'):
+                has_dynamic_resolution = True
+                node['xlookup_details'] = xlookup_info.get('details')
+                node['xlookup_internal_references_count'] = len(xlookup_info.get('internal_references', []))
+            else:
+                node['xlookup_error'] = xlookup_info.get('error')
+        else:
+            node['has_xlookup'] = False
+        
+        # OFFSET 信息
+        if offset_info and offset_info.get('has_offset'):
+            node['has_offset'] = True
+            if offset_info.get('success'):
+                has_dynamic_resolution = True
+                node['offset_details'] = offset_info.get('details')
+                node['offset_internal_references_count'] = len(offset_info.get('internal_references', []))
+            else:
+                node['offset_error'] = offset_info.get('error')
+        else:
+            node['has_offset'] = False
+        
         # INDEX 信息
         if index_info and index_info.get('has_index'):
             node['has_index'] = True
@@ -442,12 +595,34 @@ class EnhancedDependencyExploder:
         else:
             node['has_index'] = False
 
+        # 現行分支信息
+        if branch_info and branch_info.get('success'):
+            has_dynamic_resolution = True
+            node['has_live_branch'] = True
+            node['live_branch_details'] = branch_info.get('details')
+            node['dormant_branch_count'] = len(branch_info.get('dormant_branches', []))
+        else:
+            node['has_live_branch'] = False
+
+        # 條件彙總信息（公式不改寫，不計入 has_resolved）
+        if criteria_info and criteria_info.get('has_criteria'):
+            node['has_criteria'] = True
+            if criteria_info.get('success'):
+                node['criteria_details'] = criteria_info.get('details')
+            else:
+                node['criteria_error'] = criteria_info.get('error')
+        else:
+            node['has_criteria'] = False
+
         # --- NEW LOGIC FOR has_resolved ---
         node['has_resolved'] = (
+            node.get('has_live_branch', False) or
             node.get('has_indirect', False) or
             node.get('has_index', False) or
             node.get('has_vlookup', False) or
-            node.get('has_hlookup', False)
+            node.get('has_hlookup', False) or
+            node.get('has_xlookup', False) or
+            node.get('has_offset', False)
         )
         
         # 設置resolved_formula
@@ -462,43 +637,42 @@ class EnhancedDependencyExploder:
             try:
                 references = self._parse_formula_references_accurate(formula_to_parse, workbook_path, sheet_name)
                 for ref in references:
+                    child_node = self._create_reference_node(ref, workbook_path, sheet_name, current_depth + 1, root_workbook_path)
                     if ref.get('is_range_summary'):
-                        try:
-                            rp_info = range_processor.process_range(
-                                ref.get('workbook_path', workbook_path),
-                                ref.get('sheet_name', sheet_name),
-                                ref.get('cell_address', '')
-                            )
-                            range_node = self._create_range_node(rp_info, current_depth + 1, root_workbook_path)
-                            node['children'].append(range_node)
-                            continue
-                        except Exception as re_error:
-                            self.progress_callback.update_progress(f"範圍摘要節點建立失敗: {str(re_error)}")
-                            error_node = self._create_error_node(
-                                ref.get('workbook_path', workbook_path),
-                                ref.get('sheet_name', sheet_name),
-                                ref.get('cell_address', ''),
-                                current_depth + 1,
-                                root_workbook_path,
-                                str(re_error)
-                            )
-                            node['children'].append(error_node)
-                            continue
-
-                    child_node = self.explode_dependencies(
-                        ref['workbook_path'], ref['sheet_name'], ref['cell_address'],
-                        current_depth + 1, root_workbook_path or workbook_path
-                    )
+                        node['children'].append(child_node)
+                        continue
                     if child_node:
                         if has_dynamic_resolution:
                             if node.get('has_indirect'):
                                 child_node['from_indirect_resolved'] = True
                             if node.get('has_index'):
                                 child_node['from_index_resolved'] = True
+                            if node.get('has_offset'):
+                                child_node['from_offset_resolved'] = True
+                            if node.get('has_xlookup'):
+                                child_node['from_xlookup_resolved'] = True
+                            if node.get('has_live_branch'):
+                                child_node['from_live_branch'] = True
                         node['children'].append(child_node)
             except Exception as e:
                 self.progress_callback.update_progress(f"解析引用時發生錯誤: {str(e)}")
         
+        # 休眠分支 - 收合節點，需要時才展開
+        if branch_info and branch_info.get('success'):
+            for branch_number, branch in enumerate(branch_info.get('dormant_branches', []), 1):
+                dormant_node = self._create_dormant_branch_node(
+                    branch, branch_number, workbook_path, sheet_name, cell_address, current_depth + 1, root_workbook_path
+                )
+                if dormant_node:
+                    node['children'].append(dormant_node)
+        
+        # 條件列 - 收合節點，只記錄參與列的區段，需要時才展開
+        if criteria_info and criteria_info.get('success'):
+            for criteria_number, detail in enumerate(criteria_info.get('details', []), 1):
+                node['children'].append(self._create_criteria_rows_node(
+                    detail, criteria_number, workbook_path, sheet_name, cell_address, current_depth + 1, root_workbook_path
+                ))
+        
         try:
             formula_for_ranges = resolved_formula if resolved_formula else cell_info.get('formula')
             ranges = process_formula_ranges(formula_for_ranges, workbook_path, sheet_name) if formula_for_ranges else []
@@ -526,6 +700,161 @@ class EnhancedDependencyExploder:
         
         return node
 
+    def _create_reference_node(self, ref, workbook_path, sheet_name, child_depth, root_workbook_path):
+        """為一個解析出的引用建立子節點（範圍摘要建立範圍節點，其餘遞歸展開）"""
+        if ref.get('is_range_summary'):
+            try:
+                rp_info = range_processor.process_range(
+                    ref.get('workbook_path', workbook_path),
+                    ref.get('sheet_name', sheet_name),
+                    ref.get('cell_address', '')
+                )
+                return self._create_range_node(rp_info, child_depth, root_workbook_path)
+            except Exception as re_error:
+                self.progress_callback.update_progress(f"範圍摘要節點建立失敗: {str(re_error)}")
+                return self._create_error_node(
+                    ref.get('workbook_path', workbook_path),
+                    ref.get('sheet_name', sheet_name),
+                    ref.get('cell_address', ''),
+                    child_depth,
+                    root_workbook_path,
+                    str(re_error)
+                )
+
+        return self.explode_dependencies(
+            ref['workbook_path'], ref['sheet_name'], ref['cell_address'],
+            child_depth, root_workbook_path or workbook_path
+        )
+
+    def _create_dormant_branch_node(self, branch, branch_number, workbook_path, sheet_name, cell_address, current_depth, root_workbook_path):
+        """創建休眠分支節點（收合狀態，只記錄分支公式與引用數量）；沒有引用的分支不建立節點"""
+        references = self._parse_formula_references_accurate(branch['formula'], workbook_path, sheet_name)
+        if not references:
+            return None
+
+        # 地址需在整棵樹中唯一（圖譜以地址作為節點 ID）
+        label = f"{sheet_name}!{cell_address} [休眠分支 {branch_number}] {branch['label']}"
+        return {
+            'address': label,
+            'short_address': label,
+            'full_address': label,
+            'workbook_path': workbook_path,
+            'sheet_name': sheet_name,
+            'cell_address': cell_address,
+            'value': f"[未展開: {len(references)} 個引用]",
+            'formula': branch['formula'],
+            'full_formula': branch['formula'],
+            'short_formula': self._create_short_formula(branch['formula']),
+            'type': 'dormant_branch',
+            'children': [],
+            'depth': current_depth,
+            'error': None,
+            'is_dormant_branch': True,
+            'is_collapsed': True,
+            'branch_function': branch['function'],
+            'branch_selector': branch['selector'],
+            'reference_count': len(references),
+            'root_workbook_path': root_workbook_path
+        }
+
+    def _create_criteria_rows_node(self, detail, criteria_number, workbook_path, sheet_name, cell_address, current_depth, root_workbook_path):
+        """創建條件列節點（收合狀態）：記錄條件、值範圍與參與列的精簡區段"""
+        target = ', '.join(detail['value_ranges']) or ', '.join(item['range'] for item in detail['criteria'])
+        label = f"{sheet_name}!{cell_address} [{detail['function']} 條件列 {criteria_number}] {target}"
+        return {
+            'address': label,
+            'short_address': label,
+            'full_address': label,
+            'workbook_path': workbook_path,
+            'sheet_name': sheet_name,
+            'cell_address': cell_address,
+            'value': f"[符合 {detail['match_count']}/{detail['total_count']} 列]",
+            'formula': detail['row_set'],
+            'full_formula': detail['row_set'],
+            'short_formula': detail['row_set'],
+            'type': 'criteria_rows',
+            'children': [],
+            'depth': current_depth,
+            'error': None,
+            'is_criteria_rows': True,
+            'is_collapsed': True,
+            'criteria_function': detail['function'],
+            'criteria_detail': detail,
+            'root_workbook_path': root_workbook_path
+        }
+
+    def expand_collapsed_node(self, node):
+        """按需展開收合節點（休眠分支或條件列），結果直接寫入節點"""
+        if node.get('is_dormant_branch'):
+            return self.expand_dormant_branch(node)
+        if node.get('is_criteria_rows'):
+            return self.expand_criteria_rows(node)
+        return node
+
+    def expand_criteria_rows(self, criteria_node):
+        """按需展開條件列節點：展開參與列在值範圍（COUNTIFS 為條件範圍）中的儲存格，最多 CRITERIA_EXPAND_LIMIT 個"""
+        if not criteria_node.get('is_criteria_rows') or not criteria_node.get('is_collapsed'):
+            return criteria_node
+
+        detail = criteria_node['criteria_detail']
+        root_workbook_path = criteria_node.get('root_workbook_path')
+        child_depth = criteria_node.get('depth', 0) + 1
+        self.progress_callback.update_progress(f"[CRITERIA] 展開條件列: {detail['row_set']}")
+
+        cells = []
+        for start, end in detail['position_runs']:
+            for position in range(start, end + 1):
+                for target in detail['expand_ranges']:
+                    if detail['orientation'] == 'column':
+                        row, col = target['min_row'] + position, target['min_col']
+                    else:
+                        row, col = target['min_row'], target['min_col'] + position
+                    cells.append((target['workbook_path'], target['sheet_name'], f"{self._col_num_to_letters(col)}{row}"))
+        total_cells = len(cells)
+
+        children = []
+        for cell_workbook_path, cell_sheet_name, cell_address in cells[:self.CRITERIA_EXPAND_LIMIT]:
+            child_node = self.explode_dependencies(cell_workbook_path, cell_sheet_name, cell_address, child_depth,
+                                                   root_workbook_path or criteria_node['workbook_path'])
+            if child_node:
+                child_node['from_criteria_rows'] = True
+                children.append(child_node)
+
+        criteria_node['children'] = children
+        criteria_node['is_collapsed'] = False
+        if total_cells > self.CRITERIA_EXPAND_LIMIT:
+            criteria_node['value'] = f"[已展開前 {self.CRITERIA_EXPAND_LIMIT} 個，共 {total_cells} 個儲存格]"
+        else:
+            criteria_node['value'] = f"[已展開: {total_cells} 個儲存格]"
+        return criteria_node
+
+    def expand_dormant_branch(self, branch_node):
+        """按需展開休眠分支節點：以一般規則展開分支內的所有引用，結果直接寫入節點"""
+        if not branch_node.get('is_dormant_branch') or not branch_node.get('is_collapsed'):
+            return branch_node
+
+        workbook_path = branch_node['workbook_path']
+        sheet_name = branch_node['sheet_name']
+        root_workbook_path = branch_node.get('root_workbook_path')
+        child_depth = branch_node.get('depth', 0) + 1
+        self.progress_callback.update_progress(f"[BRANCH] 展開休眠分支: {branch_node['formula']}")
+
+        children = []
+        for ref in self._parse_formula_references_accurate(branch_node['formula'], workbook_path, sheet_name):
+            child_node = self._create_reference_node(ref, workbook_path, sheet_name, child_depth, root_workbook_path)
+            if child_node:
+                children.append(child_node)
+        try:
+            for range_info in process_formula_ranges(branch_node['formula'], workbook_path, sheet_name):
+                children.append(self._create_range_node(range_info, child_depth, root_workbook_path))
+        except Exception as e:
+            self.progress_callback.update_progress(f"警告：處理範圍時發生異常 - {str(e)}")
+
+        branch_node['children'] = children
+        branch_node['is_collapsed'] = False
+        branch_node['value'] = f"[已展開: {len(children)} 個引用]"
+        return branch_node
+
     def force_cleanup(self):
         """公開的超安全清理方法"""
         self.progress_callback.update_progress("[USER] 用戶觸發超安全清理...")
@@ -960,7 +1289,22 @@ class EnhancedDependencyExploder:
                     'successful_index_resolutions': 0,
                     'failed_index_resolutions': 0,
                     'index_resolved_references': 0,
-                    'index_internal_references': 0
+                    'index_internal_references': 0,
+                    'total_xlookup_nodes': 0,
+                    'successful_xlookup_resolutions': 0,
+                    'failed_xlookup_resolutions': 0,
+                    'xlookup_internal_references': 0,
+                    'total_offset_nodes': 0,
+                    'successful_offset_resolutions': 0,
+                    'failed_offset_resolutions': 0,
+                    'offset_internal_references': 0,
+                    'live_branch_nodes': 0,
+                    'dormant_branches': 0,
+                    'expanded_dormant_branches': 0,
+                    'total_criteria_nodes': 0,
+                    'criteria_row_sets': 0,
+                    'criteria_contributing_rows': 0,
+                    'failed_criteria_analyses': 0
                 }
             
             # INDIRECT 統計
@@ -1007,6 +1351,41 @@ class EnhancedDependencyExploder:
                 else:
                     dynamic_stats['failed_index_resolutions'] += 1
             
+            # XLOOKUP 統計
+            if node.get('has_xlookup'):
+                dynamic_stats['total_xlookup_nodes'] += 1
+                if node.get('xlookup_details'):
+                    dynamic_stats['successful_xlookup_resolutions'] += 1
+                    dynamic_stats['xlookup_internal_references'] += node.get('xlookup_internal_references_count', 0)
+                else:
+                    dynamic_stats['failed_xlookup_resolutions'] += 1
+            
+            # OFFSET 統計
+            if node.get('has_offset'):
+                dynamic_stats['total_offset_nodes'] += 1
+                if node.get('offset_details'):
+                    dynamic_stats['successful_offset_resolutions'] += 1
+                    dynamic_stats['offset_internal_references'] += node.get('offset_internal_references_count', 0)
+                else:
+                    dynamic_stats['failed_offset_resolutions'] += 1
+            
+            # 現行分支統計
+            if node.get('has_live_branch'):
+                dynamic_stats['live_branch_nodes'] += 1
+            if node.get('is_dormant_branch'):
+                dynamic_stats['dormant_branches'] += 1
+                if not node.get('is_collapsed'):
+                    dynamic_stats['expanded_dormant_branches'] += 1
+            
+            # 條件彙總統計
+            if node.get('has_criteria'):
+                dynamic_stats['total_criteria_nodes'] += 1
+                if not node.get('criteria_details'):
+                    dynamic_stats['failed_criteria_analyses'] += 1
+            if node.get('is_criteria_rows'):
+                dynamic_stats['criteria_row_sets'] += 1
+                dynamic_stats['criteria_contributing_rows'] += node['criteria_detail']['match_count']
+            
             for child in node.get('children', []):
                 count_dynamic_function_nodes(child, dynamic_stats)
             
@@ -1025,15 +1404,19 @@ class EnhancedDependencyExploder:
             'circular_ref_list': self.circular_refs,
             'our_instances_count': len(self.excel_manager.our_excel_instances),  # 修改：使用excel_manager
             'type_distribution': type_counts,
-            'dynamic_function_stats': dynamic_stats
+            'dynamic_function_stats': dynamic_stats,
+            'calculation_stats': dict(self.excel_manager.calculation_stats),
+            'calculation_memo_stats': self.excel_manager.calculation_memo.get_stats(),
+            'excel_pool_stats': self.excel_manager.get_pool_stats()
         }
 
 
-def explode_cell_dependencies_with_progress(workbook_path, sheet_name, cell_address, max_depth=10, range_expand_threshold=5, progress_callback=None):
+def explode_cell_dependencies_with_progress(workbook_path, sheet_name, cell_address, max_depth=10, range_expand_threshold=5, progress_callback=None, live_branch=False):
     """
     便捷函數：爆炸分析指定儲存格的依賴關係 - 超安全版本 + INDEX支援 (完整版本)
+    live_branch=True 時只展開 IF/IFS/CHOOSE/SWITCH 的現行分支，休眠分支為收合節點
     """
-    exploder = EnhancedDependencyExploder(max_depth=max_depth, range_expand_threshold=range_expand_threshold, progress_callback=progress_callback)
+    exploder = EnhancedDependencyExploder(max_depth=max_depth, range_expand_threshold=range_expand_threshold, progress_callback=progress_callback, live_branch=live_branch)
     
     try:
         # 執行分析
@@ -1057,4 +1440,19 @@ def explode_cell_dependencies_with_progress(workbook_path, sheet_name, cell_addr
             exploder.excel_manager._ultra_safe_cleanup()  # 修改：使用excel_manager
         except:
             pass
-        raise e
\ No newline at end of file
+        raise e
+
+
+def expand_collapsed_node_with_progress(node, max_depth=10, range_expand_threshold=5, progress_callback=None, live_branch=False):
+    """
+    便捷函數：展開收合節點（現行分支模式的休眠分支、條件彙總的條件列），直接更新節點並返回
+    """
+    exploder = EnhancedDependencyExploder(max_depth=max_depth, range_expand_threshold=range_expand_threshold, progress_callback=progress_callback, live_branch=live_branch)
+    
+    try:
+        return exploder.expand_collapsed_node(node)
+    finally:
+        try:
+            exploder.excel_manager._ultra_safe_cleanup()
+        except:
+            pass
@@ -8,14 +8,20 @@ import hashlib
 import openpyxl
 from openpyxl.utils import range_boundaries
 import os
-import tempfile
-import shutil
+from collections import OrderedDict
+from utils.workbook_cache import get_cached_workbook
+from utils.file_fingerprint import get_fingerprint_service
+
+# 每次更新hash的行數
+HASH_CHUNK_ROWS = 500
+
 
 class RangeProcessor:
     """Excel範圍處理器"""
     
-    def __init__(self):
-        self.cache = {}  # 緩存已計算的hash
+    def __init__(self, max_cache_entries=512):
+        self.max_cache_entries = max_cache_entries
+        self.cache = OrderedDict()  # 緩存已計算的hash: key -> {'fingerprint', 'result'}
     
     def identify_ranges_in_formula(self, formula):
         """
@@ -101,10 +107,31 @@ class RangeProcessor:
                 'error': str(e)
             }
     
+    def _get_cached_hash(self, cache_key, fingerprint):
+        """讀取緩存結果，檔案指紋不符時視為過期"""
+        entry = self.cache.get(cache_key)
+        if entry is None:
+            return None
+        if entry['fingerprint'] != fingerprint:
+            del self.cache[cache_key]
+            return None
+        self.cache.move_to_end(cache_key)
+        return entry['result']
+    
+    def _store_cached_hash(self, cache_key, fingerprint, result):
+        """寫入緩存並執行LRU大小限制"""
+        self.cache[cache_key] = {'fingerprint': fingerprint, 'result': result}
+        self.cache.move_to_end(cache_key)
+        while len(self.cache) > self.max_cache_entries:
+            self.cache.popitem(last=False)
+    
     def calculate_range_content_hash(self, workbook_path, sheet_name, range_address):
         """
         計算範圍內容的精確hash值
         
+        透過共用的工作簿快取以唯讀模式讀取，按行分塊把儲存格值串流進
+        增量hash，不會先組成整個範圍的大字串。
+        
         Args:
             workbook_path: Excel文件路徑
             sheet_name: 工作表名稱
@@ -113,30 +140,28 @@ class RangeProcessor:
         Returns:
             dict: hash信息
         """
-        cache_key = f"{workbook_path}|{sheet_name}|{range_address}"
+        normalized_path = os.path.normpath(os.path.abspath(workbook_path))
+        fingerprint = get_fingerprint_service().fingerprint(normalized_path)
+        
+        # 檢查文件是否存在
+        if fingerprint is None:
+            return {
+                'hash': 'FILE_NOT_FOUND',
+                'hash_short': 'FILE_NOT_FOUND',
+                'content_summary': '文件不存在',
+                'error': f'文件不存在: {workbook_path}'
+            }
         
-        # 檢查緩存
-        if cache_key in self.cache:
-            return self.cache[cache_key]
+        # 檢查緩存（以內容指紋為鍵，相同內容的檔案副本共用結果）
+        cache_key = (fingerprint.content_id, sheet_name, range_address)
+        cached = self._get_cached_hash(cache_key, fingerprint)
+        if cached is not None:
+            return cached
         
         try:
-            # 檢查文件是否存在
-            if not os.path.exists(workbook_path):
-                return {
-                    'hash': 'FILE_NOT_FOUND',
-                    'hash_short': 'FILE_NOT_FOUND',
-                    'content_summary': '文件不存在',
-                    'error': f'文件不存在: {workbook_path}'
-                }
-            
-            # 使用原始檔案路徑（暫時還原，不使用臨時複本）
-            wb = openpyxl.load_workbook(workbook_path, data_only=True)
+            wb = get_cached_workbook(normalized_path, read_only=True, data_only=True)
             
             if sheet_name not in wb.sheetnames:
-                try:
-                    wb.close()
-                except:
-                    pass
                 return {
                     'hash': 'SHEET_NOT_FOUND',
                     'hash_short': 'SHEET_NOT_FOUND',
@@ -145,41 +170,49 @@ class RangeProcessor:
                 }
             
             ws = wb[sheet_name]
+            min_col, min_row, max_col, max_row = range_boundaries(range_address.replace('$', ''))
             
-            # 獲取範圍內的所有值
-            range_cells = ws[range_address]
-            
-            # 收集所有值用於hash計算
-            values = []
+            hash_object = hashlib.sha256()
             value_types = {'number': 0, 'text': 0, 'formula': 0, 'empty': 0}
+            total_values = 0
+            chunk = []
+            chunk_rows = 0
             
-            # 處理單個儲存格的情況
-            if not isinstance(range_cells, tuple):
-                range_cells = ((range_cells,),)
-            elif not isinstance(range_cells[0], tuple):
-                range_cells = (range_cells,)
-            
-            for row in range_cells:
-                for cell in row:
-                    if cell.value is None:
-                        values.append('')
+            # 逐行串流，每 HASH_CHUNK_ROWS 行更新一次hash；
+            # 以 '|' 分隔各值，結果與整串 '|'.join(values) 的hash相同
+            for row in ws.iter_rows(min_row=min_row, max_row=max_row,
+                                    min_col=min_col, max_col=max_col, values_only=True):
+                for value in row:
+                    if value is None:
+                        text = ''
                         value_types['empty'] += 1
-                    elif isinstance(cell.value, (int, float)):
-                        values.append(str(cell.value))
+                    elif isinstance(value, (int, float)):
+                        text = str(value)
                         value_types['number'] += 1
-                    elif isinstance(cell.value, str):
-                        values.append(cell.value)
-                        if cell.value.startswith('='):
+                    elif isinstance(value, str):
+                        text = value
+                        if value.startswith('='):
                             value_types['formula'] += 1
                         else:
                             value_types['text'] += 1
                     else:
-                        values.append(str(cell.value))
+                        text = str(value)
                         value_types['text'] += 1
+                    
+                    if total_values:
+                        chunk.append('|')
+                    chunk.append(text)
+                    total_values += 1
+                
+                chunk_rows += 1
+                if chunk_rows >= HASH_CHUNK_ROWS:
+                    hash_object.update(''.join(chunk).encode('utf-8'))
+                    chunk = []
+                    chunk_rows = 0
+            
+            if chunk:
+                hash_object.update(''.join(chunk).encode('utf-8'))
             
-            # 計算hash
-            content_string = '|'.join(values)
-            hash_object = hashlib.sha256(content_string.encode('utf-8'))
             full_hash = hash_object.hexdigest()
             short_hash = full_hash[:20]  # 前20位作為短hash，足夠做比較
             
@@ -204,18 +237,12 @@ class RangeProcessor:
                 'hash_short': short_hash,
                 'content_summary': content_summary,
                 'value_types': value_types,
-                'total_values': len(values),
+                'total_values': total_values,
                 'error': None
             }
             
             # 緩存結果
-            self.cache[cache_key] = result
-            
-            # 關閉工作簿
-            try:
-                wb.close()
-            except:
-                pass
+            self._store_cached_hash(cache_key, fingerprint, result)
             return result
             
         except Exception as e:
@@ -225,7 +252,7 @@ class RangeProcessor:
                 'content_summary': f'讀取錯誤: {str(e)}',
                 'error': str(e)
             }
-            self.cache[cache_key] = error_result
+            self._store_cached_hash(cache_key, fingerprint, error_result)
             return error_result
     
     def process_range(self, workbook_path, sheet_name, range_address):
@@ -10,6 +10,7 @@ import threading
 import gc
 from collections import OrderedDict
 from openpyxl import load_workbook
+from utils.file_fingerprint import get_fingerprint_service
 
 
 class SafeWorkbookCache:
@@ -29,6 +30,7 @@ class SafeWorkbookCache:
             'hits': 0,
             'misses': 0,
             'evictions': 0,
+            'stale_evictions': 0,
             'errors': 0,
             'memory_cleanups': 0
         }
@@ -44,13 +46,39 @@ class SafeWorkbookCache:
         Returns:
             openpyxl.Workbook: 工作簿物件
         """
-        if not os.path.exists(file_path):
+        with self.lock:
+            return self._get_cache_entry(file_path, data_only)['workbook']
+
+    def get_workbook_attachment(self, file_path, name, factory, data_only=True):
+        """
+        獲取附加在快取工作簿上的衍生物件（例如已解析外部連結的 view）
+        衍生物件存放在同一個快取項目中，工作簿被淘汰或重新載入時一起釋放
+
+        Args:
+            name: 衍生物件名稱
+            factory: factory(workbook)，第一次請求時建立衍生物件
+        """
+        with self.lock:
+            cache_entry = self._get_cache_entry(file_path, data_only)
+            attachments = cache_entry['attachments']
+            if name not in attachments:
+                attachments[name] = factory(cache_entry['workbook'])
+            return attachments[name]
+
+    def _get_cache_entry(self, file_path, data_only):
+        """返回有效的快取項目，必要時載入工作簿"""
+        normalized_path = os.path.normpath(os.path.abspath(file_path))
+        fingerprint = get_fingerprint_service().fingerprint(normalized_path)
+        if fingerprint is None:
             raise FileNotFoundError(f"File not found: {file_path}")
         
-        normalized_path = os.path.normpath(os.path.abspath(file_path))
-        cache_key = f"{normalized_path}|{data_only}"
+        # 以內容指紋為鍵：相同內容的不同路徑共用同一個已解析工作簿
+        cache_key = (fingerprint.content_id, data_only)
         
         with self.lock:
+            # 檔案儲存後鍵會改變：釋放從同一路徑舊版本載入的工作簿（唯讀模式仍持有檔案）
+            self._evict_stale_versions(normalized_path, fingerprint)
+            
             # 檢查快取
             if cache_key in self.cache:
                 cached_item = self.cache[cache_key]
@@ -58,14 +86,14 @@ class SafeWorkbookCache:
                 if self._is_cache_valid(cached_item, normalized_path):
                     self.cache.move_to_end(cache_key)
                     self._stats['hits'] += 1
-                    return cached_item['workbook']
+                    return cached_item
                 else:
                     self._safe_remove_cache_entry(cache_key)
             
             # 載入新工作簿
-            return self._load_and_cache_workbook(normalized_path, cache_key, data_only)
+            return self._load_and_cache_workbook(normalized_path, cache_key, data_only, fingerprint)
     
-    def _load_and_cache_workbook(self, file_path, cache_key, data_only):
+    def _load_and_cache_workbook(self, file_path, cache_key, data_only, fingerprint):
         """安全載入並快取工作簿"""
         self._stats['misses'] += 1
         
@@ -85,15 +113,16 @@ class SafeWorkbookCache:
             cache_entry = {
                 'workbook': workbook,
                 'file_path': file_path,
-                'file_mtime': os.path.getmtime(file_path),
+                'fingerprint': fingerprint,
                 'cache_time': time.time(),
-                'data_only': data_only
+                'data_only': data_only,
+                'attachments': {}
             }
             
             self.cache[cache_key] = cache_entry
             self._enforce_cache_limit()
             
-            return workbook
+            return cache_entry
             
         except Exception as e:
             self._stats['errors'] += 1
@@ -106,9 +135,9 @@ class SafeWorkbookCache:
             if time.time() - cached_item['cache_time'] > self.max_age_seconds:
                 return False
             
-            # 檢查檔案修改時間
-            current_mtime = os.path.getmtime(file_path)
-            if current_mtime != cached_item['file_mtime']:
+            # 檢查來源檔案指紋（唯讀工作簿會延遲讀取原檔）
+            current_fingerprint = get_fingerprint_service().fingerprint(cached_item['file_path'])
+            if current_fingerprint != cached_item['fingerprint']:
                 return False
             
             return True
@@ -116,6 +145,14 @@ class SafeWorkbookCache:
         except (OSError, KeyError):
             return False
     
+    def _evict_stale_versions(self, file_path, fingerprint):
+        """移除從此路徑舊版本載入的快取項目"""
+        stale_keys = [key for key, entry in self.cache.items()
+                      if entry['file_path'] == file_path and entry['fingerprint'] != fingerprint]
+        for key in stale_keys:
+            self._safe_remove_cache_entry(key)
+            self._stats['stale_evictions'] += 1
+    
     def _safe_remove_cache_entry(self, cache_key):
         """安全移除快取項目"""
         try:
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+Scan Block Cache - 工作表掃描的區塊雜湊快取
+把掃描範圍內的公式區域切成固定列數的區塊，記住每個區塊 Formula/Value2 陣列的雜湊與結果 tuple；
+重新掃描時只有雜湊不同的區塊需要重新分類、讀取 Text 並更新樹狀檢視
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+# 每個區塊的列數
+DEFAULT_BLOCK_ROWS = 500
+
+
+def block_hash(formulas, values):
+    """區塊 Formula/Value2 陣列的雜湊"""
+    payload = repr((formulas, values)).encode('utf-8', 'surrogatepass')
+    return hashlib.blake2b(payload, digest_size=16).digest()
+
+
+class SheetScanState:
+    """一張工作表（一個掃描範圍）上次掃描的區塊快照"""
+
+    __slots__ = ('block_rows', 'blocks')
+
+    def __init__(self, block_rows=DEFAULT_BLOCK_ROWS):
+        self.block_rows = block_rows
+        # (first_row, first_col, last_row, last_col) -> (hash, [結果 tuple])，依掃描順序
+        self.blocks = {}
+
+    def block(self, bounds):
+        """上次掃描中同一矩形的區塊；沒有時返回 (None, [])"""
+        return self.blocks.get(bounds, (None, []))
+
+
+class ScanBlockCache:
+    """
+    執行緒安全的掃描區塊 LRU 快取
+    鍵為 (工作簿路徑, 工作表, 掃描範圍, 掃描模式)，不分大小寫
+    """
+
+    def __init__(self, max_size=16):
+        self.max_size = max_size
+        self.cache = OrderedDict()
+        self.lock = threading.RLock()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'blocks_reused': 0,
+            'blocks_rescanned': 0
+        }
+
+    @staticmethod
+    def make_key(workbook_path, sheet_name, range_address, scan_mode):
+        return (str(workbook_path).lower(), str(sheet_name).lower(), str(range_address).upper(), scan_mode)
+
+    def get(self, key):
+        with self.lock:
+            state = self.cache.get(key)
+            if state is None:
+                self._stats['misses'] += 1
+                return None
+            self.cache.move_to_end(key)
+            self._stats['hits'] += 1
+            return state
+
+    def put(self, key, state, reused_blocks=0, rescanned_blocks=0):
+        with self.lock:
+            self.cache[key] = state
+            self.cache.move_to_end(key)
+            self._stats['blocks_reused'] += reused_blocks
+            self._stats['blocks_rescanned'] += rescanned_blocks
+            while len(self.cache) > self.max_size:
+                self.cache.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def invalidate(self, workbook_path=None, sheet_name=None):
+        """移除指定工作簿 / 工作表的快照（皆為 None 時清空）"""
+        with self.lock:
+            for key in list(self.cache):
+                if workbook_path is not None and key[0] != str(workbook_path).lower():
+                    continue
+                if sheet_name is not None and key[1] != str(sheet_name).lower():
+                    continue
+                del self.cache[key]
+
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
+
+    def get_stats(self):
+        with self.lock:
+            total_requests = self._stats['hits'] + self._stats['misses']
+            hit_rate = (self._stats['hits'] / total_requests * 100) if total_requests > 0 else 0
+            return {
+                'cache_size': len(self.cache),
+                'max_size': self.max_size,
+                'hit_rate_percent': round(hit_rate, 2),
+                'stats': self._stats.copy()
+            }
+
+
+# 全域實例
+_global_block_cache = None
+_block_cache_lock = threading.Lock()
+
+
+def get_scan_block_cache():
+    """獲取全域掃描區塊快取實例"""
+    global _global_block_cache
+
+    if _global_block_cache is None:
+        with _block_cache_lock:
+            if _global_block_cache is None:
+                _global_block_cache = ScanBlockCache(max_size=16)
+
+    return _global_block_cache
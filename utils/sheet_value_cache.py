@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+Sheet Value Cache - 以工作表為單位快取儲存格計算值
+一次串流讀取整張工作表的值（data_only），之後的儲存格/範圍讀取都在記憶體中完成，
+供原生公式計算器 (formula_evaluator) 與查找索引使用
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+from utils.file_fingerprint import get_fingerprint_service
+
+# Excel 工作表上限
+EXCEL_MAX_ROWS = 1048576
+EXCEL_MAX_COLUMNS = 16384
+
+
+class SheetValues:
+    """一張工作表的值快照（1-based 行列）"""
+
+    __slots__ = ('sheet_name', 'rows', 'max_row', 'max_col')
+
+    def __init__(self, sheet_name, rows):
+        self.sheet_name = sheet_name
+        self.rows = rows
+        self.max_row = len(rows)
+        self.max_col = max((len(row) for row in rows), default=0)
+
+    def get(self, row, col):
+        """讀取單一儲存格的值，超出資料範圍時返回 None"""
+        if 1 <= row <= self.max_row:
+            values = self.rows[row - 1]
+            if 1 <= col <= len(values):
+                return values[col - 1]
+        return None
+
+    def get_range(self, min_row, min_col, max_row, max_col):
+        """
+        讀取矩形範圍的值（list of lists）
+        整欄/整列範圍會被裁切到實際資料範圍，避免建立上百萬個空值
+        """
+        max_row = min(max_row, max(self.max_row, min_row))
+        max_col = min(max_col, max(self.max_col, min_col))
+        result = []
+        for row in range(min_row, max_row + 1):
+            if row <= self.max_row:
+                values = self.rows[row - 1]
+                result.append([values[col - 1] if col <= len(values) else None
+                               for col in range(min_col, max_col + 1)])
+            else:
+                result.append([None] * (max_col - min_col + 1))
+        return result
+
+    def column(self, col, min_row, max_row):
+        """讀取單一欄的值（list），整欄範圍會被裁切到實際資料範圍"""
+        max_row = min(max_row, self.max_row)
+        return [self.get(row, col) for row in range(min_row, max_row + 1)]
+
+    def row(self, row, min_col, max_col):
+        """讀取單一列的值（list），整列範圍會被裁切到實際資料範圍"""
+        max_col = min(max_col, self.max_col)
+        return [self.get(row, col) for col in range(min_col, max_col + 1)]
+
+
+class SheetValueCache:
+    """
+    執行緒安全的工作表值 LRU 快取
+    - 以檔案內容指紋為鍵，相同內容的檔案副本共用快照
+    - 來源檔案指紋變更時自動失效
+    """
+
+    def __init__(self, max_size=24):
+        self.max_size = max_size
+        self.cache = OrderedDict()
+        self.lock = threading.RLock()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'errors': 0
+        }
+
+    def get_sheet_values(self, file_path, sheet_name):
+        """
+        獲取工作表值快照
+
+        Args:
+            file_path: Excel檔案路徑 (.xlsx/.xlsm/.xls)
+            sheet_name: 工作表名稱（不分大小寫）
+
+        Returns:
+            SheetValues 或 None（工作表不存在）
+
+        Raises:
+            FileNotFoundError: 檔案不存在
+        """
+        service = get_fingerprint_service()
+        normalized_path = os.path.normpath(os.path.abspath(file_path))
+        fingerprint = service.fingerprint(normalized_path)
+        if fingerprint is None:
+            raise FileNotFoundError(f"File not found: {file_path}")
+
+        cache_key = (fingerprint.content_id, sheet_name.lower())
+
+        with self.lock:
+            entry = self.cache.get(cache_key)
+            if entry is not None:
+                if service.fingerprint(entry['file_path']) == entry['fingerprint']:
+                    self.cache.move_to_end(cache_key)
+                    self._stats['hits'] += 1
+                    return entry['values']
+                del self.cache[cache_key]
+
+            self._stats['misses'] += 1
+            try:
+                values = self._load_sheet_values(normalized_path, sheet_name)
+            except Exception:
+                self._stats['errors'] += 1
+                raise
+
+            self.cache[cache_key] = {
+                'values': values,
+                'file_path': normalized_path,
+                'fingerprint': fingerprint
+            }
+            while len(self.cache) > self.max_size:
+                self.cache.popitem(last=False)
+                self._stats['evictions'] += 1
+            return values
+
+    def _load_sheet_values(self, file_path, sheet_name):
+        """串流讀取整張工作表的值"""
+        if os.path.splitext(file_path)[1].lower() == '.xls':
+            from utils.xlrd_cache import get_pooled_xls_sheet
+            sheet = get_pooled_xls_sheet(file_path, sheet_name)
+            if sheet is None:
+                return None
+            import xlrd
+            from utils.formula_evaluator import ExcelError  # 延遲匯入：formula_evaluator 匯入本模組
+
+            def xls_value(cell_type, value):
+                # xlrd 的錯誤儲存格是整數代碼（例如 7 = #DIV/0!），轉為與 openpyxl 分支一致的錯誤值
+                if cell_type == xlrd.XL_CELL_ERROR:
+                    return ExcelError(xlrd.error_text_from_code.get(value, '#N/A'))
+                return None if value == '' else value
+
+            rows = [tuple(xls_value(cell_type, value)
+                          for cell_type, value in zip(sheet.row_types(row_idx), sheet.row_values(row_idx)))
+                    for row_idx in range(sheet.nrows)]
+            return SheetValues(sheet.name, rows)
+
+        from utils.workbook_cache import get_cached_workbook
+        workbook = get_cached_workbook(file_path, read_only=True, data_only=True)
+        found_sheet = None
+        for sname in workbook.sheetnames:
+            if sname.lower() == sheet_name.lower():
+                found_sheet = sname
+                break
+        if found_sheet is None:
+            return None
+
+        rows = list(workbook[found_sheet].iter_rows(min_row=1, values_only=True))
+        return SheetValues(found_sheet, rows)
+
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
+
+    def get_stats(self):
+        with self.lock:
+            total_requests = self._stats['hits'] + self._stats['misses']
+            hit_rate = (self._stats['hits'] / total_requests * 100) if total_requests > 0 else 0
+            return {
+                'cache_size': len(self.cache),
+                'max_size': self.max_size,
+                'hit_rate_percent': round(hit_rate, 2),
+                'stats': self._stats.copy()
+            }
+
+
+# 全域實例
+_global_sheet_cache = None
+_sheet_cache_lock = threading.Lock()
+
+
+def get_sheet_value_cache():
+    """獲取全域工作表值快取實例"""
+    global _global_sheet_cache
+
+    if _global_sheet_cache is None:
+        with _sheet_cache_lock:
+            if _global_sheet_cache is None:
+                _global_sheet_cache = SheetValueCache(max_size=24)
+
+    return _global_sheet_cache
+
+
+def get_sheet_values(file_path, sheet_name):
+    """
+    便捷函數：使用全域快取獲取工作表值快照
+
+    Returns:
+        SheetValues 或 None（工作表不存在）
+    """
+    return get_sheet_value_cache().get_sheet_values(file_path, sheet_name)
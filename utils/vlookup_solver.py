@@ -1,13 +1,15 @@
 # -*- coding: utf-8 -*-
 """
-VLOOKUP Solver - 解析並靜態化 VLOOKUP 函數（只支援精確匹配 FALSE）
+VLOOKUP Solver - 解析並靜態化 VLOOKUP 函數（精確匹配 FALSE 與近似匹配 TRUE）
 設計與 IndexSolver/IndirectSolver 一致：
-- 依賴 ExcelComManager 進行必要的計算（MATCH、複雜參數）
+- 依賴 ExcelComManager 進行必要的計算（MATCH 經由共用查找索引、複雜參數）
 - 可選擇從 main_analyzer 取得內部引用以便圖譜顯示
 """
 
 import re
 
+from utils.lookup_index import resolve_range_lookup
+
 class VLookupSolver:
     """VLOOKUP 函數解析器"""
 
@@ -18,7 +20,7 @@ class VLookupSolver:
 
     def resolve_vlookup(self, formula, workbook_path, sheet_name, cell_address):
         """
-        將公式中的 VLOOKUP 函數轉換為靜態引用（只支援第四參數為 FALSE 的情況）。
+        將公式中的 VLOOKUP 函數轉換為靜態引用（第四參數 FALSE 為精確匹配，TRUE 或省略為近似匹配）。
 
         Returns dict:
             {
@@ -38,6 +40,9 @@ class VLookupSolver:
             if not vlookups:
                 return {'success': False, 'error': 'No VLOOKUP functions found'}
 
+            # 本節點需要計算的參數先排入佇列，一次批次計算
+            self._prefetch_parameters(vlookups, workbook_path, sheet_name, cell_address)
+
             resolved_formula = formula
             static_references = []
             calculation_details = []
@@ -59,13 +64,10 @@ class VLookupSolver:
                 col_index_param = params_res['col_index']
                 range_lookup_param = params_res['range_lookup']
 
-                # 僅支援 FALSE（精確匹配）
+                # 第四參數：FALSE -> 精確匹配 (0)，TRUE -> 近似匹配 (1)
                 try:
-                    if not self._is_param_false(range_lookup_param, workbook_path, sheet_name, cell_address):
-                        msg = f"第四參數只支援 FALSE，實際為: {range_lookup_param}"
-                        self.progress_callback.update_progress(f"[VLOOKUP] {msg}")
-                        errors.append(msg)
-                        continue
+                    match_type = resolve_range_lookup(range_lookup_param, self.excel_manager,
+                                                      workbook_path, sheet_name, cell_address)
                 except Exception as e:
                     errors.append(f"檢查第四參數失敗: {e}")
                     continue
@@ -96,7 +98,7 @@ class VLookupSolver:
                     errors.append(f"列索引解析失敗: {e}")
                     continue
 
-                # 構建第一列搜尋範圍（精確匹配）
+                # 構建第一列搜尋範圍
                 try:
                     first_col_letter = self._col_letters_of_cell(array_info['start_cell'])
                     min_row = self._row_of_cell(array_info['start_cell'])
@@ -112,10 +114,9 @@ class VLookupSolver:
                     errors.append(f"無法構建搜尋範圍: {e}")
                     continue
 
-                # 使用 Excel 計算 MATCH 以獲得行偏移（1-based）
+                # MATCH 以獲得行偏移（1-based），使用共用查找索引（近似匹配為二分搜尋）
                 try:
-                    match_content = f"MATCH({lookup_param}, {search_range}, 0)"
-                    mres = self.excel_manager.calculate_safely(match_content, workbook_path, sheet_name, cell_address)
+                    mres = self.excel_manager.calculate_match(lookup_param, search_range, workbook_path, sheet_name, cell_address, match_type)
                     if not mres['success']:
                         errors.append(f"MATCH 計算失敗: {mres.get('error')}")
                         continue
@@ -161,6 +162,7 @@ class VLookupSolver:
                     'col_index_param': col_index_param,
                     'range_lookup_param': range_lookup_param,
                     'search_range': search_range,
+                    'match_type': match_type,
                     'row_offset': row_offset,
                     'final_ref': static_ref
                 })
@@ -231,12 +233,12 @@ class VLookupSolver:
                     cur = ''
                     continue
                 cur += ch
-            if cur.strip():
-                params.append(cur.strip())
+            if cur.strip() or params:
+                params.append(cur.strip())  # 保留空白的最後參數，例如 VLOOKUP(x,r,2,)
             if len(params) < 3:
                 return {'success': False, 'error': f'VLOOKUP 參數不足，得到 {len(params)} 個'}
             if len(params) == 3:
-                params.append('FALSE')  # 預設為精確匹配
+                params.append('TRUE')  # 省略時 Excel 預設為近似匹配
             return {
                 'success': True,
                 'lookup_value': params[0],
@@ -247,16 +249,28 @@ class VLookupSolver:
         except Exception as e:
             return {'success': False, 'error': f'參數解析失敗: {e}'}
 
-    def _is_param_false(self, param, workbook_path, sheet_name, cell_address):
-        """確認第四參數為 FALSE（字面或計算後）"""
-        if isinstance(param, str) and param.strip().upper() in ('FALSE', '0'):
+    def _prefetch_parameters(self, functions, workbook_path, sheet_name, cell_address):
+        """收集非常數的列索引與第四參數，交給 ExcelComManager 一次計算"""
+        expressions = []
+        for info in functions:
+            params_res = self._extract_vlookup_parameters(info['content'])
+            if not params_res['success']:
+                continue
+            for param in (params_res['col_index'], params_res['range_lookup']):
+                if not self._is_constant_param(param):
+                    expressions.append(param)
+        if expressions:
+            self.excel_manager.prefetch_expressions(expressions, workbook_path, sheet_name, cell_address)
+
+    def _is_constant_param(self, param):
+        val = param.strip().upper()
+        if val in ('TRUE', 'FALSE', ''):
+            return True
+        try:
+            float(val)
             return True
-        # 複雜情況交給 Excel 計算
-        res = self.excel_manager.calculate_safely(param, workbook_path, sheet_name, cell_address)
-        if not res['success']:
+        except ValueError:
             return False
-        val = str(res['static_reference']).strip().upper()
-        return val in ('FALSE', '0')
 
     def _resolve_to_integer(self, param, workbook_path, sheet_name, cell_address):
         p = param.strip()
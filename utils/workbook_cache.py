@@ -10,11 +10,14 @@ import threading
 from collections import OrderedDict
 from openpyxl import load_workbook
 from openpyxl.workbook import Workbook
+from utils.file_fingerprint import get_fingerprint_service
 
 
 class WorkbookCache:
     """
-    Thread-safe LRU cache for openpyxl workbooks with file modification time checking
+    Thread-safe LRU cache for openpyxl workbooks keyed by content id.
+    Byte-identical files at different paths (confirmed by a full hash)
+    share one parsed workbook.
     """
     
     def __init__(self, max_size=10, max_age_seconds=300):
@@ -33,6 +36,7 @@ class WorkbookCache:
             'hits': 0,
             'misses': 0,
             'evictions': 0,
+            'stale_evictions': 0,
             'errors': 0
         }
     
@@ -53,19 +57,23 @@ class WorkbookCache:
             FileNotFoundError: If the file doesn't exist
             Exception: If the file cannot be loaded
         """
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(f"File not found: {file_path}")
-        
         # Normalize path for consistent caching
         normalized_path = os.path.normpath(os.path.abspath(file_path))
         
+        fingerprint = get_fingerprint_service().fingerprint(normalized_path)
+        if fingerprint is None:
+            raise FileNotFoundError(f"File not found: {file_path}")
+        
         # Force read-only mode to prevent file locking issues
         if force_read_only:
             read_only = True
         
-        cache_key = f"{normalized_path}|{read_only}|{data_only}"
+        cache_key = (fingerprint.content_id, read_only, data_only)
         
         with self.lock:
+            # A saved file gets a new key; close workbooks loaded from its older versions
+            self._evict_stale_versions(normalized_path, fingerprint)
+            
             # Check if workbook is in cache and still valid
             if cache_key in self.cache:
                 cached_item = self.cache[cache_key]
@@ -100,7 +108,7 @@ class WorkbookCache:
                 cache_entry = {
                     'workbook': workbook,
                     'file_path': normalized_path,
-                    'file_mtime': os.path.getmtime(normalized_path),
+                    'fingerprint': fingerprint,
                     'cache_time': time.time(),
                     'read_only': read_only,
                     'data_only': data_only
@@ -125,7 +133,7 @@ class WorkbookCache:
         
         Args:
             cached_item: The cached workbook entry
-            file_path: Path to the original file
+            file_path: Path to the requested file
             
         Returns:
             bool: True if cache is valid, False otherwise
@@ -135,13 +143,10 @@ class WorkbookCache:
             if time.time() - cached_item['cache_time'] > self.max_age_seconds:
                 return False
             
-            # Check if file has been modified
-            current_mtime = os.path.getmtime(file_path)
-            if current_mtime != cached_item['file_mtime']:
-                return False
-            
-            # Check if file still exists
-            if not os.path.exists(file_path):
+            # Read-only workbooks read lazily from the file they were loaded
+            # from, so that source file must still match the cached version
+            current_fingerprint = get_fingerprint_service().fingerprint(cached_item['file_path'])
+            if current_fingerprint != cached_item['fingerprint']:
                 return False
             
             return True
@@ -149,6 +154,26 @@ class WorkbookCache:
         except (OSError, KeyError):
             return False
     
+    def _evict_stale_versions(self, file_path, fingerprint):
+        """
+        Remove entries loaded from older versions of this path
+        
+        Args:
+            file_path: Normalized path being requested
+            fingerprint: Current fingerprint of that path
+        """
+        stale_keys = [key for key, entry in self.cache.items()
+                      if entry['file_path'] == file_path and entry['fingerprint'] != fingerprint]
+        for key in stale_keys:
+            cache_entry = self.cache.pop(key)
+            self._stats['stale_evictions'] += 1
+            print(f"Cache EXPIRED: {os.path.basename(file_path)}")
+            try:
+                if hasattr(cache_entry['workbook'], 'close'):
+                    cache_entry['workbook'].close()
+            except:
+                pass  # Ignore close errors
+    
     def _enforce_cache_limit(self):
         """
         Remove oldest entries if cache exceeds size limit
@@ -195,8 +220,10 @@ class WorkbookCache:
         """
         normalized_path = os.path.normpath(os.path.abspath(file_path))
         
+        get_fingerprint_service().invalidate(normalized_path)
+        
         with self.lock:
-            keys_to_remove = [key for key in self.cache.keys() if key.startswith(normalized_path + "|")]
+            keys_to_remove = [key for key, entry in self.cache.items() if entry['file_path'] == normalized_path]
             
             for key in keys_to_remove:
                 cache_entry = self.cache[key]
@@ -225,6 +252,7 @@ class WorkbookCache:
                 'hits': self._stats['hits'],
                 'misses': self._stats['misses'],
                 'evictions': self._stats['evictions'],
+                'stale_evictions': self._stats['stale_evictions'],
                 'errors': self._stats['errors'],
                 'hit_rate_percent': round(hit_rate, 2),
                 'cached_files': [os.path.basename(entry['file_path']) for entry in self.cache.values()]
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+XLOOKUP Solver - 解析並靜態化 XLOOKUP 函數
+設計與 OffsetSolver / VLookupSolver 一致：
+- 以原生計算器計算 XLOOKUP，查找經由共用查找索引（所有 match_mode / search_mode）
+- 找到時替換為 return_array 中對應的儲存格（或列 / 欄），找不到時替換為 if_not_found 參數
+- XMATCH 由原生計算器直接支援（例如 INDEX(..., XMATCH(...)) 經由 IndexSolver 解析）
+"""
+
+from utils.formula_evaluator import UnsupportedExpression, ExcelError, CellRange
+
+
+class XLookupSolver:
+    """XLOOKUP 函數解析器"""
+
+    def __init__(self, excel_manager, progress_callback, main_analyzer=None):
+        self.excel_manager = excel_manager
+        self.progress_callback = progress_callback
+        self.main_analyzer = main_analyzer
+
+    def resolve_xlookup(self, formula, workbook_path, sheet_name, cell_address):
+        """
+        將公式中的 XLOOKUP 函數轉換為靜態引用。
+
+        Returns dict:
+            {
+                'success': bool,
+                'resolved_formula': str,
+                'static_references': list[str],
+                'calculation_details': list[dict],
+                'original_formula': str,
+                'internal_references': list[dict],
+                'errors': list[str]
+            }
+        """
+        try:
+            self.progress_callback.update_progress(f"[XLOOKUP] 開始解析: {formula}")
+
+            items = self._extract_all_xlookup_functions(formula)
+            if not items:
+                return {'success': False, 'error': 'No XLOOKUP functions found'}
+
+            evaluator = self.excel_manager.native_evaluator
+            resolved_formula = formula
+            static_references = []
+            calculation_details = []
+            internal_references = []
+            errors = []
+
+            for i, info in enumerate(items):
+                full_fn = info['full_function']
+                content = info['content']
+                self.progress_callback.update_progress(f"[XLOOKUP] 處理第 {i+1} 個: {content}")
+
+                params = self._split_parameters(content)
+                if len(params) < 3:
+                    errors.append(f"XLOOKUP 參數不足，得到 {len(params)} 個")
+                    continue
+
+                # lookup_value 與 lookup_array 的引用（提供給圖譜）
+                if self.main_analyzer:
+                    try:
+                        for param in params[:2]:
+                            internal_references.extend(
+                                self.main_analyzer._parse_formula_references_accurate(f"={param}", workbook_path, sheet_name)
+                            )
+                    except Exception:
+                        pass
+
+                try:
+                    target = evaluator.evaluate_raw(full_fn, workbook_path, sheet_name, cell_address)
+                except UnsupportedExpression as e:
+                    errors.append(f"XLOOKUP 無法以原生方式計算: {e}")
+                    continue
+                except Exception as e:
+                    errors.append(f"XLOOKUP 計算失敗: {e}")
+                    continue
+
+                if isinstance(target, CellRange):
+                    static_ref = target.reference_text(workbook_path, sheet_name)
+                    detail = {
+                        'target_sheet': target.sheet_name,
+                        'target_address': target.address(),
+                        'found': True
+                    }
+                elif len(params) > 3 and params[3].strip() and not isinstance(target, ExcelError):
+                    # 找不到：結果來自 if_not_found 參數，其引用才是真正的前置儲存格
+                    static_ref = f"({params[3].strip()})"
+                    detail = {'found': False, 'if_not_found': params[3].strip()}
+                else:
+                    errors.append(f"XLOOKUP 計算錯誤: {target}")
+                    continue
+
+                resolved_formula = resolved_formula.replace(full_fn, static_ref)
+                static_references.append(static_ref)
+                detail.update({
+                    'original_function': full_fn,
+                    'content': content,
+                    'match_mode': params[4].strip() if len(params) > 4 and params[4].strip() else '0',
+                    'search_mode': params[5].strip() if len(params) > 5 and params[5].strip() else '1',
+                    'final_ref': static_ref
+                })
+                calculation_details.append(detail)
+                self.progress_callback.update_progress(f"[XLOOKUP] {full_fn} -> {static_ref}")
+
+            success = len(static_references) > 0
+            return {
+                'success': success,
+                'resolved_formula': resolved_formula,
+                'static_references': static_references,
+                'calculation_details': calculation_details,
+                'original_formula': formula,
+                'internal_references': internal_references,
+                'errors': errors
+            }
+
+        except Exception as e:
+            self.progress_callback.update_progress(f"[XLOOKUP] 解析異常: {e}")
+            return {'success': False, 'error': str(e), 'original_formula': formula, 'internal_references': [], 'errors': [str(e)]}
+
+    # ---- helpers ----
+
+    def _extract_all_xlookup_functions(self, formula):
+        """
+        提取所有 XLOOKUP(...) 片段（含 _xlfn. 前綴），返回 list[{full_function, content}]
+        巢狀的 XLOOKUP 只取最外層（內層由原生計算器一併計算）
+        """
+        items = []
+        search_start = 0
+        up = formula.upper()
+        while True:
+            pos = up.find('XLOOKUP(', search_start)
+            if pos == -1:
+                break
+            start_pos = pos + len('XLOOKUP(')
+            if up[max(0, pos - 6):pos] == '_XLFN.':
+                pos -= 6
+            elif pos > 0 and (up[pos - 1].isalnum() or up[pos - 1] in '_.'):
+                search_start = start_pos
+                continue
+            bracket = 1
+            i = start_pos
+            in_quotes = False
+            while i < len(formula) and bracket > 0:
+                ch = formula[i]
+                if ch == '"':
+                    in_quotes = not in_quotes
+                elif not in_quotes:
+                    if ch == '(':
+                        bracket += 1
+                    elif ch == ')':
+                        bracket -= 1
+                i += 1
+            if bracket == 0:
+                items.append({'full_function': formula[pos:i], 'content': formula[start_pos:i-1]})
+            search_start = i
+        return items
+
+    def _split_parameters(self, content):
+        """以最外層逗號切分參數（引號與括號內的逗號不計）"""
+        params = []
+        current = ''
+        depth = 0
+        in_quotes = False
+        for ch in content:
+            if ch == '"':
+                in_quotes = not in_quotes
+            elif not in_quotes:
+                if ch in '({':
+                    depth += 1
+                elif ch in ')}':
+                    depth -= 1
+                elif ch == ',' and depth == 0:
+                    params.append(current.strip())
+                    current = ''
+                    continue
+            current += ch
+        params.append(current.strip())
+        return params
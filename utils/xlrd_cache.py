@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+"""
+xlrd Book Pool for legacy .xls files
+Keeps opened xlrd books (on_demand mode) so repeated lookups into the same
+.xls dependency do not re-parse the BIFF stream every time
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+import xlrd
+
+from utils.file_fingerprint import get_fingerprint_service
+
+
+class XlrdBookPool:
+    """
+    Thread-safe LRU pool of xlrd books keyed by content id, so
+    byte-identical copies (confirmed by a full hash) share one opened book.
+    Sheets are loaded one at a time on first use and unloaded on eviction.
+    """
+
+    def __init__(self, max_size=8):
+        """
+        Initialize the book pool
+
+        Args:
+            max_size: Maximum number of .xls books to keep open
+        """
+        self.max_size = max_size
+        self.pool = OrderedDict()
+        self.lock = threading.RLock()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'stale_evictions': 0,
+            'sheet_loads': 0,
+            'errors': 0
+        }
+
+    def get_book(self, file_path):
+        """
+        Get an opened xlrd book from the pool or open it if needed
+
+        Args:
+            file_path: Path to the .xls file
+
+        Returns:
+            xlrd.book.Book: The opened book (on_demand, sheets not yet loaded)
+
+        Raises:
+            FileNotFoundError: If the file doesn't exist
+            Exception: If the file cannot be opened by xlrd
+        """
+        normalized_path = os.path.normpath(os.path.abspath(file_path))
+
+        with self.lock:
+            return self._get_entry(normalized_path)['book']
+
+    def get_sheet(self, file_path, sheet_name):
+        """
+        Get a sheet from a pooled book, loading only that sheet on first use
+
+        Args:
+            file_path: Path to the .xls file
+            sheet_name: Worksheet name (case-insensitive)
+
+        Returns:
+            xlrd.sheet.Sheet or None if the sheet does not exist
+        """
+        normalized_path = os.path.normpath(os.path.abspath(file_path))
+
+        with self.lock:
+            entry = self._get_entry(normalized_path)
+            book = entry['book']
+
+            found_sheet = entry['sheet_names'].get(sheet_name.lower())
+            if found_sheet is None:
+                return None
+
+            if found_sheet not in entry['loaded_sheets']:
+                entry['loaded_sheets'].add(found_sheet)
+                self._stats['sheet_loads'] += 1
+            return book.sheet_by_name(found_sheet)
+
+    def _get_entry(self, normalized_path):
+        """Return a valid pool entry for the path, opening the book if needed"""
+        service = get_fingerprint_service()
+        fingerprint = service.fingerprint(normalized_path)
+        if fingerprint is None:
+            raise FileNotFoundError(f"File not found: {normalized_path}")
+
+        # A saved file gets a new key; release books opened from its older versions
+        for stale_key in [key for key, entry in self.pool.items()
+                          if entry['file_path'] == normalized_path and entry['fingerprint'] != fingerprint]:
+            self._stats['stale_evictions'] += 1
+            self._remove_entry(stale_key)
+
+        pool_key = fingerprint.content_id
+        entry = self.pool.get(pool_key)
+        if entry is not None:
+            if service.fingerprint(entry['file_path']) == entry['fingerprint']:
+                self.pool.move_to_end(pool_key)
+                self._stats['hits'] += 1
+                return entry
+            self._remove_entry(pool_key)
+
+        self._stats['misses'] += 1
+        try:
+            book = xlrd.open_workbook(normalized_path, on_demand=True)
+        except Exception:
+            self._stats['errors'] += 1
+            raise
+
+        entry = {
+            'book': book,
+            'file_path': normalized_path,
+            'fingerprint': fingerprint,
+            'sheet_names': {name.lower(): name for name in book.sheet_names()},
+            'loaded_sheets': set()
+        }
+        self.pool[pool_key] = entry
+        self._enforce_pool_limit()
+        return entry
+
+    def _release_entry(self, entry):
+        """Unload every loaded sheet and release the book's file resources"""
+        book = entry['book']
+        for sheet_name in entry['loaded_sheets']:
+            try:
+                book.unload_sheet(sheet_name)
+            except Exception:
+                pass
+        entry['loaded_sheets'].clear()
+        try:
+            book.release_resources()
+        except Exception:
+            pass
+
+    def _remove_entry(self, pool_key):
+        entry = self.pool.pop(pool_key, None)
+        if entry is not None:
+            self._release_entry(entry)
+
+    def _enforce_pool_limit(self):
+        """
+        Release least recently used books if the pool exceeds its size limit
+        """
+        while len(self.pool) > self.max_size:
+            _, oldest_entry = self.pool.popitem(last=False)
+            self._stats['evictions'] += 1
+            self._release_entry(oldest_entry)
+
+    def remove(self, file_path):
+        """
+        Remove a specific file from the pool
+
+        Args:
+            file_path: Path to the file to release
+        """
+        normalized_path = os.path.normpath(os.path.abspath(file_path))
+        get_fingerprint_service().invalidate(normalized_path)
+        with self.lock:
+            for pool_key in [key for key, entry in self.pool.items() if entry['file_path'] == normalized_path]:
+                self._remove_entry(pool_key)
+
+    def clear(self):
+        """
+        Release all pooled books
+        """
+        with self.lock:
+            for entry in self.pool.values():
+                self._release_entry(entry)
+            self.pool.clear()
+
+    def get_stats(self):
+        """
+        Get pool statistics
+
+        Returns:
+            dict: Pool statistics including hits, misses, etc.
+        """
+        with self.lock:
+            total_requests = self._stats['hits'] + self._stats['misses']
+            hit_rate = (self._stats['hits'] / total_requests * 100) if total_requests > 0 else 0
+
+            return {
+                'pool_size': len(self.pool),
+                'max_size': self.max_size,
+                'hit_rate_percent': round(hit_rate, 2),
+                'stats': self._stats.copy(),
+                'pooled_files': [os.path.basename(entry['file_path']) for entry in self.pool.values()]
+            }
+
+
+# Global pool instance
+_global_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_xlrd_book_pool():
+    """
+    Get the global xlrd book pool instance (singleton pattern)
+
+    Returns:
+        XlrdBookPool: The global pool instance
+    """
+    global _global_pool
+
+    if _global_pool is None:
+        with _pool_lock:
+            if _global_pool is None:
+                _global_pool = XlrdBookPool(max_size=8)
+
+    return _global_pool
+
+
+def get_pooled_xls_sheet(file_path, sheet_name):
+    """
+    Convenience function to get an xlrd sheet using the global pool
+
+    Args:
+        file_path: Path to the .xls file
+        sheet_name: Worksheet name (case-insensitive)
+
+    Returns:
+        xlrd.sheet.Sheet or None if the sheet does not exist
+    """
+    return get_xlrd_book_pool().get_sheet(file_path, sheet_name)
+
+
+def clear_xlrd_book_pool():
+    """
+    Release all books held by the global pool
+    """
+    if _global_pool is not None:
+        _global_pool.clear()